@@ -0,0 +1,76 @@
+import re
+from typing import List, Optional, Tuple, Callable
+import numpy as np
+from .utils import normalize_rows
+
+_TOKEN_SPAN = re.compile(r'\S+')
+
+# Room for the [CLS]/[SEP] tokens the model adds around every text
+SPECIAL_TOKENS = 2
+
+def whitespace_spans(texts: List[str]) -> List[List[Tuple[int, int]]]:
+    """Character spans of whitespace-separated words, for encoders without a tokenizer."""
+    return [[match.span() for match in _TOKEN_SPAN.finditer(text)] for text in texts]
+
+class SectionChunker:
+    """Splits texts into windows that fit the model's sequence length.
+    
+    tokenize returns the (start, end) character span of every token of each
+    text, without special tokens. A text that fits is kept as is (so embedding
+    cache keys do not change); a longer one becomes overlapping windows of at
+    most max_tokens tokens, each sliced from the original text. max_tokens=None
+    only counts tokens.
+    """
+    
+    def __init__(self, tokenize: Callable[[List[str]], List[List[Tuple[int, int]]]],
+                 max_tokens: Optional[int] = None, overlap: int = 32):
+        if max_tokens is not None and not 0 <= overlap < max_tokens:
+            raise ValueError(f"overlap must be between 0 and max_tokens - 1, got {overlap}")
+        self.tokenize = tokenize
+        self.max_tokens = max_tokens
+        self.overlap = overlap
+    
+    def split(self, texts: List[str]) -> Tuple[List[str], np.ndarray, np.ndarray]:
+        """Return the chunk texts, the index of the text each came from and each chunk's token count."""
+        chunks = []
+        owners = []
+        lengths = []
+        for owner, (text, spans) in enumerate(zip(texts, self.tokenize(texts))):
+            if self.max_tokens is None or len(spans) <= self.max_tokens:
+                chunks.append(text)
+                owners.append(owner)
+                lengths.append(len(spans))
+                continue
+            
+            step = self.max_tokens - self.overlap
+            for start in range(0, len(spans) - self.overlap, step):
+                window = spans[start:start + self.max_tokens]
+                chunks.append(text[window[0][0]:window[-1][1]])
+                owners.append(owner)
+                lengths.append(len(window))
+        return chunks, np.array(owners, dtype=np.int64), np.array(lengths, dtype=np.int64)
+
+def length_buckets(lengths: np.ndarray, batch_size: int) -> List[np.ndarray]:
+    """Batches of positions with similar lengths, so each batch pads to little more than its longest text."""
+    order = np.argsort(lengths, kind='stable')
+    return [order[start:start + batch_size] for start in range(0, len(order), batch_size)]
+
+def pool_chunks(embeddings: np.ndarray, owners: np.ndarray, count: int) -> np.ndarray:
+    """One row per text: single-chunk texts keep their embedding, longer ones average their unit chunk vectors.
+    
+    Averaging unit vectors makes a section's dot product with a query the mean
+    of its chunks' cosine scores, before the usual renormalization.
+    """
+    chunk_counts = np.bincount(owners, minlength=count)
+    if len(owners) == count:
+        return embeddings
+    
+    unit = normalize_rows(embeddings)
+    pooled = np.zeros((count, embeddings.shape[1]), dtype=np.float32)
+    np.add.at(pooled, owners, unit)
+    pooled /= np.maximum(chunk_counts, 1)[:, None]
+    
+    single = chunk_counts == 1
+    first_chunk = np.searchsorted(owners, np.arange(count))
+    pooled[single] = embeddings[first_chunk[single]]
+    return pooled
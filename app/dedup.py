@@ -0,0 +1,128 @@
+import hashlib
+import re
+from typing import List, Dict, Any, Iterable, Union
+import numpy as np
+from .section_store import SectionStore
+
+_WORD = re.compile(r'\w+')
+
+class DuplicateGroups:
+    """Assignment of every section to the representative of its duplicate group.
+    
+    labels[i] is the row of the first section in i's group, so representatives
+    are the rows whose label is themselves, in document order.
+    """
+    
+    def __init__(self, labels: np.ndarray):
+        self.labels = np.asarray(labels, dtype=np.int64)
+        self.representatives = np.flatnonzero(self.labels == np.arange(len(self.labels)))
+        self._members = None
+    
+    def __len__(self) -> int:
+        return len(self.labels)
+    
+    @property
+    def unique_count(self) -> int:
+        return len(self.representatives)
+    
+    def members(self, representative: int) -> np.ndarray:
+        """Rows in a representative's group, in document order (the representative first)."""
+        if self._members is None:
+            order = np.argsort(self.labels, kind='stable')
+            starts = np.flatnonzero(np.r_[True, self.labels[order][1:] != self.labels[order][:-1]])
+            self._members = {
+                int(self.labels[order[start]]): order[start:end]
+                for start, end in zip(starts, np.r_[starts[1:], len(order)])
+            }
+        return self._members[int(representative)]
+    
+    def locations(self, sections: Union[SectionStore, List[Dict[str, Any]]],
+                  representative: int) -> List[Dict[str, Any]]:
+        """Document/page of every other section in a representative's group."""
+        if isinstance(sections, SectionStore):
+            return [
+                {'document_name': sections.document_name(row), 'page_number': sections.page_number(row)}
+                for row in self.members(representative)[1:]
+            ]
+        return [
+            {'document_name': sections[row]['document_name'], 'page_number': sections[row]['page_number']}
+            for row in self.members(representative)[1:]
+        ]
+
+class SectionDeduplicator:
+    """Groups exact and near-duplicate section texts.
+    
+    Exact duplicates share a hash of their case- and whitespace-normalized
+    text. Near duplicates are found with 64-bit SimHash fingerprints over word
+    shingles: fingerprints within max_distance bits must agree on at least one
+    of max_distance + 1 bands, so only sections sharing a band are compared.
+    Each section joins the group of the first earlier representative it
+    matches; max_distance=0 keeps exact matching only.
+    """
+    
+    def __init__(self, max_distance: int = 4, shingle_size: int = 2, min_words: int = 8):
+        if not 0 <= max_distance < 64:
+            raise ValueError(f"max_distance must be between 0 and 63, got {max_distance}")
+        self.max_distance = max_distance
+        self.shingle_size = shingle_size
+        self.min_words = min_words
+        bands = max_distance + 1
+        self._band_bits = [(64 * b // bands, 64 * (b + 1) // bands) for b in range(bands)]
+    
+    def group(self, texts: Iterable[str]) -> DuplicateGroups:
+        """Group texts, returned in input order."""
+        labels = []
+        exact = {}
+        buckets = {}
+        fingerprints = {}
+        
+        for row, text in enumerate(texts):
+            words = _WORD.findall(text.lower())
+            digest = hashlib.blake2b(' '.join(words).encode('utf-8'), digest_size=16).digest()
+            representative = exact.get(digest)
+            if representative is not None:
+                labels.append(representative)
+                continue
+            
+            # Too few words and every small edit moves the fingerprint a long way
+            if self.max_distance == 0 or len(words) < self.min_words:
+                exact[digest] = row
+                labels.append(row)
+                continue
+            
+            fingerprint = self._simhash(words)
+            keys = [(band, (fingerprint >> low) & ((1 << (high - low)) - 1))
+                    for band, (low, high) in enumerate(self._band_bits)]
+            representative = self._nearest(fingerprint, keys, buckets, fingerprints)
+            if representative is None:
+                representative = row
+                fingerprints[row] = fingerprint
+                for key in keys:
+                    buckets.setdefault(key, []).append(row)
+            exact[digest] = representative
+            labels.append(representative)
+        
+        return DuplicateGroups(np.array(labels, dtype=np.int64))
+    
+    def _nearest(self, fingerprint: int, keys: List[tuple], buckets: Dict[tuple, List[int]],
+                 fingerprints: Dict[int, int]):
+        """Earliest representative within max_distance bits, or None."""
+        best = None
+        for key in keys:
+            for candidate in buckets.get(key, ()):
+                if best is not None and candidate >= best:
+                    break
+                if bin(fingerprint ^ fingerprints[candidate]).count('1') <= self.max_distance:
+                    best = candidate
+                    break
+        return best
+    
+    def _simhash(self, words: List[str]) -> int:
+        """64-bit SimHash of the text's word shingles."""
+        size = min(self.shingle_size, len(words))
+        shingles = [' '.join(words[i:i + size]) for i in range(len(words) - size + 1)]
+        digests = b''.join(hashlib.blake2b(s.encode('utf-8'), digest_size=8).digest() for s in shingles)
+        bits = np.unpackbits(np.frombuffer(digests, dtype=np.uint8).reshape(len(shingles), 8), axis=1)
+        # Bit j of the fingerprint is set when most shingle hashes have it set
+        majority = bits.sum(axis=0) * 2 > len(shingles)
+        return int.from_bytes(np.packbits(majority).tobytes(), 'big')
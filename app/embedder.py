@@ -1,23 +1,116 @@
+import contextvars
 import logging
+import threading
+import time
 import numpy as np
-from typing import List, Dict, Any
-from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
+from itertools import islice
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Tuple, Iterable, Iterator, Union
+from .chunking import SPECIAL_TOKENS, SectionChunker, length_buckets, pool_chunks, whitespace_spans
+from .embedding_cache import EmbeddingCache
+from .encoders import create_encoder
+from .section_store import SectionStore
+from .profiler import current_profiler
+from .utils import normalize_rows
 
 class EmbeddingGenerator:
     """Generates embeddings for text content using sentence transformers."""
     
-    def __init__(self, model_name: str = 'all-MiniLM-L6-v2'):
+    EMBEDDING_DTYPES = ('float32', 'float16', 'int8')
+    # all-MiniLM-L6-v2's limit, for injected models that do not report one
+    DEFAULT_MAX_SEQ_LENGTH = 256
+    
+    def __init__(self, model_name: str = 'all-MiniLM-L6-v2', cache: Optional[EmbeddingCache] = None,
+                 batch_size: int = 64, dtype: str = 'float32', model: Optional[Any] = None,
+                 backend: str = 'torch', backend_options: Optional[Dict[str, Any]] = None,
+                 background: bool = False, chunking: bool = False, chunk_overlap: int = 32,
+                 bucket_batches: int = 8):
+        if dtype not in self.EMBEDDING_DTYPES:
+            raise ValueError(f"Unsupported embedding dtype: {dtype}")
         self.logger = logging.getLogger(__name__)
         self.model_name = model_name
-        self.model = None
-        self._initialize_model()
-        
+        self.cache = cache
+        self.batch_size = batch_size
+        self.dtype = dtype
+        self.backend = backend
+        self.backend_options = backend_options or {}
+        self.chunking = chunking
+        self.chunk_overlap = chunk_overlap
+        # Sections read per window, in batches, when sorting texts by token length
+        self.bucket_batches = bucket_batches
+        self._chunker = None
+        # An injected model (anything with a SentenceTransformer-style encode) skips loading
+        self._model = model
+        self._loader = None
+        self._load_error = None
+        if self._model is None:
+            if background:
+                self.start_loading()
+            else:
+                self._initialize_model()
+    
+    @property
+    def model(self) -> Any:
+        """The encoder, waiting for a background load to finish if one is running."""
+        if self._model is None:
+            self.wait_for_model()
+        return self._model
+    
+    @model.setter
+    def model(self, model: Any) -> None:
+        self._model = model
+    
+    def start_loading(self) -> None:
+        """Load the model in a background thread so input checks and extraction can overlap it."""
+        if self._model is not None or self._loader is not None:
+            return
+        # The loader reports into the caller's profiler
+        context = contextvars.copy_context()
+        self._loader = threading.Thread(
+            target=context.run, args=(self._load_in_background,), name="model-loader", daemon=True
+        )
+        self._loader.start()
+    
+    def wait_for_model(self) -> None:
+        """Block until the model is available, loading it here if no load was started."""
+        if self._loader is None:
+            self._initialize_model()
+            return
+        if self._loader.is_alive():
+            with current_profiler().stage('model_wait'):
+                self._loader.join()
+        if self._load_error is not None:
+            raise self._load_error
+    
+    def _load_in_background(self) -> None:
+        try:
+            self._initialize_model()
+        except Exception as e:
+            self._load_error = e
+    
+    @property
+    def chunker(self) -> SectionChunker:
+        """Counts section tokens with the model's tokenizer and, with chunking, splits long sections."""
+        if self._chunker is None:
+            max_tokens = None
+            if self.chunking:
+                max_seq_length = getattr(self.model, 'max_seq_length', None) or self.DEFAULT_MAX_SEQ_LENGTH
+                max_tokens = max_seq_length - SPECIAL_TOKENS
+            self._chunker = SectionChunker(self._token_spans, max_tokens, self.chunk_overlap)
+        return self._chunker
+    
+    def _token_spans(self, texts: List[str]) -> List[List[Tuple[int, int]]]:
+        token_spans = getattr(self.model, 'token_spans', None)
+        spans = token_spans(texts) if token_spans is not None else None
+        # Without a tokenizer, words stand in for tokens
+        return spans if spans is not None else whitespace_spans(texts)
+    
     def _initialize_model(self):
-        """Initialize the sentence transformer model."""
+        """Initialize the sentence encoder on the configured backend."""
         try:
-            self.logger.info(f"Loading model: {self.model_name}")
-            self.model = SentenceTransformer(self.model_name)
+            self.logger.info(f"Loading model: {self.model_name} ({self.backend} backend)")
+            with current_profiler().stage('model_loading'):
+                self._model = create_encoder(self.backend, self.model_name, **self.backend_options)
             self.logger.info("Model loaded successfully")
         except Exception as e:
             self.logger.error(f"Failed to load model: {e}")
@@ -25,7 +118,10 @@ class EmbeddingGenerator:
     
     def generate_persona_embedding(self, persona_data: Dict[str, Any]) -> np.ndarray:
         """Generate embedding for persona data."""
-        # Combine all persona information into a single text
+        return self.model.encode(self.build_persona_text(persona_data))
+    
+    def build_persona_text(self, persona_data: Dict[str, Any]) -> str:
+        """Combine all persona information into the string that gets embedded."""
         text_parts = []
         
         # Add raw content
@@ -48,11 +144,14 @@ class EmbeddingGenerator:
         if persona_data.get('keywords'):
             text_parts.append("Keywords: " + " ".join(persona_data['keywords']))
         
-        combined_text = " ".join(text_parts)
-        return self.model.encode(combined_text)
+        return " ".join(text_parts)
     
     def generate_job_embedding(self, job_data: Dict[str, Any]) -> np.ndarray:
         """Generate embedding for job-to-be-done data."""
+        return self.model.encode(self.build_job_text(job_data))
+    
+    def build_job_text(self, job_data: Dict[str, Any]) -> str:
+        """Combine all job-to-be-done information into the string that gets embedded."""
         text_parts = []
         
         # Add raw content
@@ -74,28 +173,196 @@ class EmbeddingGenerator:
         if job_data.get('keywords'):
             text_parts.append("Keywords: " + " ".join(job_data['keywords']))
         
-        combined_text = " ".join(text_parts)
-        return self.model.encode(combined_text)
+        return " ".join(text_parts)
     
-    def generate_section_embeddings(self, sections: List[Dict[str, Any]]) -> List[np.ndarray]:
+    def generate_query_embeddings(self, persona_list: List[Dict[str, Any]],
+                                  job_list: List[Dict[str, Any]]) -> Tuple[np.ndarray, np.ndarray]:
+        """Encode many personas and jobs with a single model call."""
+        texts = [self.build_persona_text(p) for p in persona_list] + [self.build_job_text(j) for j in job_list]
+        embeddings = self.encode_texts(texts)
+        return embeddings[:len(persona_list)], embeddings[len(persona_list):]
+    
+    def encode_texts(self, texts: List[str]) -> np.ndarray:
+        """Encode texts with one model call, bypassing the section cache."""
+        return np.asarray(self.model.encode(texts), dtype=np.float32)
+    
+    def generate_section_embeddings(self, sections: Union[SectionStore, List[Dict[str, Any]]]) -> np.ndarray:
         """Generate embeddings for document sections."""
-        texts = []
-        for section in sections:
-            # Combine section text with title if available
-            text_parts = [section['section_text']]
+        return self.embed_sections_stream(sections, count=len(sections))
+    
+    def embed_sections_stream(self, sections: Union[SectionStore, Iterable[Dict[str, Any]]],
+                              count: Optional[int] = None,
+                              batch_size: Optional[int] = None,
+                              dtype: Optional[str] = None,
+                              out_path: Optional[Path] = None) -> np.ndarray:
+        """Embed sections window by window into a preallocated array or memmap.
+        
+        Only one window of bucket_batches batches is alive at a time; its texts
+        are encoded in batches of similar token length to cut padding. With count
+        known the output is allocated once (as a memmap when out_path is given);
+        otherwise it grows geometrically. int8 output stores unit vectors scaled
+        by 127, which keeps cosine scores intact. With a cache, each window is
+        looked up and stored in one call each.
+        """
+        batch_size = batch_size or self.batch_size
+        dtype = dtype or self.dtype
+        if dtype not in self.EMBEDDING_DTYPES:
+            raise ValueError(f"Unsupported embedding dtype: {dtype}")
+        if out_path is not None and count is None:
+            raise ValueError("count is required when writing embeddings to a memmap")
+        
+        texts = self.iter_section_texts(sections)
+        output = None
+        filled = 0
+        cache_hits = 0
+        batch_number = 0
+        tokens = 0
+        start_time = time.perf_counter()
+        
+        while True:
+            batch = list(islice(texts, batch_size * self.bucket_batches))
+            if not batch:
+                break
             
-            if section.get('section_title'):
-                text_parts.insert(0, section['section_title'])
+            embeddings, hits, window_tokens, window_batches = self._encode_window(batch, batch_size)
+            cache_hits += hits
+            tokens += window_tokens
+            batch_number += window_batches
             
-            if section.get('context_summary'):
-                text_parts.append(section['context_summary'])
+            if output is None:
+                capacity = count if count is not None else max(len(batch) * 16, 1024)
+                output = self._allocate_embeddings(capacity, embeddings.shape[1], dtype, out_path)
+            elif filled + len(batch) > len(output):
+                if count is not None:
+                    raise ValueError(f"Received more than the declared {count} sections")
+                grown = self._allocate_embeddings(len(output) * 2, output.shape[1], dtype, None)
+                grown[:filled] = output[:filled]
+                output = grown
+            
+            output[filled:filled + len(batch)] = self._convert_embeddings(embeddings, dtype)
+            filled += len(batch)
+        
+        if output is None:
+            return np.empty((0, 0), dtype=np.float32 if dtype == 'float32' else dtype)
+        
+        elapsed = time.perf_counter() - start_time
+        self.logger.info(
+            f"Embedded {filled} sections ({tokens} tokens) in {batch_number} batches, {elapsed:.2f}s "
+            f"({tokens / max(elapsed, 1e-9):.0f} tokens/s, {elapsed * 1e6 / max(tokens, 1):.1f} us/token, "
+            f"{cache_hits} from cache)"
+        )
+        
+        if isinstance(output, np.memmap):
+            output.flush()
+        return output if filled == len(output) else output[:filled]
+    
+    def _encode_window(self, texts: List[str], batch_size: int) -> Tuple[np.ndarray, int, int, int]:
+        """Encode texts as float32, a row per text, chunking long ones and batching by token length.
+        
+        The whole window is looked up in the embedding cache at once and only
+        misses reach the model; their vectors are stored, and the hits'
+        recency refreshed, in one cache update before returning.
+        Returns the embeddings, cache hits, tokens and model batches run.
+        """
+        chunks, owners, lengths = self.chunker.split(texts)
+        profiler = current_profiler()
+        keys = [self.cache.make_key(chunk) for chunk in chunks] if self.cache is not None else None
+        cached = self._fetch_cached(keys) if keys else {}
+        missing = np.array([i for i in range(len(chunks)) if i not in cached], dtype=np.int64)
+        
+        embeddings = None
+        if cached:
+            embeddings = np.empty((len(chunks), len(next(iter(cached.values())))), dtype=np.float32)
+            for i, vector in cached.items():
+                embeddings[i] = vector
+        
+        buckets = [missing[bucket] for bucket in length_buckets(lengths[missing], batch_size)]
+        for bucket in buckets:
+            batch_start = time.perf_counter()
+            batch_cpu_start = time.process_time()
+            batch_embeddings = np.asarray(
+                self.model.encode([chunks[i] for i in bucket], batch_size=batch_size), dtype=np.float32
+            )
+            if embeddings is None:
+                embeddings = np.empty((len(chunks), batch_embeddings.shape[1]), dtype=np.float32)
+            embeddings[bucket] = batch_embeddings
             
-            texts.append(" ".join(text_parts))
+            elapsed = time.perf_counter() - batch_start
+            batch_tokens = int(lengths[bucket].sum())
+            profiler.record(
+                'encode_batch', wall=elapsed, cpu=time.process_time() - batch_cpu_start,
+                category='batch', texts=len(bucket), tokens=batch_tokens
+            )
+            self.logger.debug(
+                f"Embedding batch: {len(bucket)} texts, {batch_tokens} tokens in {elapsed:.3f}s "
+                f"({batch_tokens / max(elapsed, 1e-9):.0f} tokens/s)"
+            )
+        
+        if keys is not None:
+            self._store_cached([keys[i] for i in missing], embeddings[missing], [keys[i] for i in cached])
+        return pool_chunks(embeddings, owners, len(texts)), len(cached), int(lengths.sum()), len(buckets)
+    
+    def _allocate_embeddings(self, rows: int, dim: int, dtype: str, out_path: Optional[Path]) -> np.ndarray:
+        """Allocate the output embedding matrix in memory or as a memmap."""
+        if out_path is not None:
+            return np.memmap(out_path, dtype=dtype, mode='w+', shape=(rows, dim))
+        return np.empty((rows, dim), dtype=dtype)
+    
+    def _convert_embeddings(self, embeddings: np.ndarray, dtype: str) -> np.ndarray:
+        """Cast float32 embeddings to the storage dtype."""
+        if dtype == 'int8':
+            return np.round(self.normalize_embeddings(embeddings) * 127).astype(np.int8)
+        return embeddings.astype(dtype, copy=False)
+    
+    def _fetch_cached(self, keys: List[str]) -> Dict[int, np.ndarray]:
+        """Cached vectors by position in keys; a failing cache counts as all misses."""
+        with current_profiler().stage('cache_fetch', category='batch', texts=len(keys)) as stats:
+            try:
+                cached = self.cache.fetch(keys)
+            except Exception as e:
+                self.logger.warning(f"Failed to read embedding cache: {e}")
+                cached = {}
+            stats.update(cache_hits=len(cached))
+        self.logger.debug(f"Embedding cache: {len(cached)} hits, {len(keys) - len(cached)} misses")
+        return cached
+    
+    def _store_cached(self, keys: List[str], embeddings: np.ndarray, touched: List[str]) -> None:
+        """Write new embeddings and refresh recency of hits; a failing cache only logs."""
+        with current_profiler().stage('cache_store', category='batch', texts=len(keys)):
+            try:
+                self.cache.store(keys, embeddings, touched=touched)
+            except Exception as e:
+                self.logger.warning(f"Failed to update embedding cache: {e}")
+    
+    def iter_section_texts(self, sections: Union[SectionStore, Iterable[Dict[str, Any]]]) -> Iterator[str]:
+        """Yield the embedded string for each section, reading stores column-wise."""
+        if isinstance(sections, SectionStore):
+            for i in range(len(sections)):
+                yield self._combine_section_text(sections.title(i), sections.text(i), sections.summary(i))
+        else:
+            for section in sections:
+                yield self.build_section_text(section)
+    
+    def build_section_text(self, section: Dict[str, Any]) -> str:
+        """Combine section title, text and summary into the string that gets embedded."""
+        return self._combine_section_text(
+            section.get('section_title'), section['section_text'], section.get('context_summary')
+        )
+    
+    def _combine_section_text(self, title: Optional[str], text: str, summary: Optional[str]) -> str:
+        text_parts = [text]
         
-        return self.model.encode(texts)
+        if title:
+            text_parts.insert(0, title)
+        
+        if summary:
+            text_parts.append(summary)
+        
+        return " ".join(text_parts)
     
     def compute_similarity(self, embedding1: np.ndarray, embedding2: np.ndarray) -> float:
         """Compute cosine similarity between two embeddings."""
+        from sklearn.metrics.pairwise import cosine_similarity
         return cosine_similarity([embedding1], [embedding2])[0][0]
     
     def compute_combined_similarity(self, section_embedding: np.ndarray, 
@@ -108,4 +375,35 @@ class EmbeddingGenerator:
         job_sim = self.compute_similarity(section_embedding, job_embedding)
         
         combined_score = (persona_weight * persona_sim) + (job_weight * job_sim)
-        return combined_score
\ No newline at end of file
+        return combined_score
+    
+    def normalize_embeddings(self, embeddings: np.ndarray) -> np.ndarray:
+        """L2-normalize embeddings along the last axis, leaving zero vectors as zeros."""
+        return normalize_rows(embeddings)
+    
+    def compute_section_scores(self, section_embeddings: np.ndarray,
+                               persona_embedding: np.ndarray,
+                               job_embedding: np.ndarray,
+                               persona_weight: float = 0.4,
+                               job_weight: float = 0.6) -> Dict[str, np.ndarray]:
+        """Score all sections against persona and job in one vectorized pass.
+        
+        Returns per-section 'persona', 'job' and 'combined' cosine score arrays.
+        """
+        similarities = self.compute_similarity_matrix(
+            section_embeddings, np.stack([persona_embedding, job_embedding])
+        )
+        persona_scores = similarities[:, 0]
+        job_scores = similarities[:, 1]
+        
+        return {
+            'persona': persona_scores,
+            'job': job_scores,
+            'combined': persona_weight * persona_scores + job_weight * job_scores
+        }
+    
+    
+    def compute_similarity_matrix(self, section_embeddings: np.ndarray,
+                                  query_embeddings: np.ndarray) -> np.ndarray:
+        """Cosine similarity of every section against every query, shape (sections, queries)."""
+        return self.normalize_embeddings(section_embeddings) @ self.normalize_embeddings(query_embeddings).T
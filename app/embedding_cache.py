@@ -0,0 +1,259 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import List, Dict, Iterable, Iterator, Optional
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX platforms run without file locks
+    fcntl = None
+
+class EmbeddingCache:
+    """Persistent, content-addressed store of embeddings backed by a float32 memmap.
+    
+    Each model gets its own directory holding a fixed-capacity vector file, a
+    last-use clock per row and an append-only log of key -> row assignments.
+    The log is replayed once per process and the mapping kept in memory; each
+    call then only reads the lines other processes appended since, under a
+    file lock that is shared for reads and exclusive for writes. Rows are
+    handed out in order and, once the cache is full, the least recently used
+    ones are overwritten. Refreshing recency only touches the clock file.
+    Compacting the log bumps the generation in meta.json, which makes every
+    other instance replay the log from the start.
+    """
+    
+    META_FILE = "meta.json"
+    LOG_FILE = "rows.log"
+    VECTORS_FILE = "vectors.f32"
+    CLOCK_FILE = "clock.i64"
+    LOCK_FILE = ".lock"
+    # The log is rewritten once evictions leave it this many times longer than the cache
+    COMPACT_RATIO = 2
+    
+    def __init__(self, cache_dir: Path, model_name: str, max_entries: int = 100000):
+        self.logger = logging.getLogger(__name__)
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.cache_dir = Path(cache_dir) / re.sub(r'[^\w.-]', '_', model_name)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.meta_path = self.cache_dir / self.META_FILE
+        self.log_path = self.cache_dir / self.LOG_FILE
+        self.vectors_path = self.cache_dir / self.VECTORS_FILE
+        self.clock_path = self.cache_dir / self.CLOCK_FILE
+        self.lock_path = self.cache_dir / self.LOCK_FILE
+        
+        self._mutex = threading.RLock()
+        self._meta: Optional[Dict] = None
+        self._vectors: Optional[np.memmap] = None
+        self._clock: Optional[np.memmap] = None
+        self._rows: Dict[str, int] = {}
+        self._row_keys: List[Optional[str]] = []
+        self._next_row = 0
+        self._log_generation = None
+        self._log_offset = 0
+        self._log_lines = 0
+    
+    def make_key(self, text: str) -> str:
+        """Build the content key for a text under this cache's model."""
+        digest = hashlib.sha256()
+        digest.update(self.model_name.encode('utf-8'))
+        digest.update(b'\0')
+        digest.update(text.encode('utf-8'))
+        return digest.hexdigest()
+    
+    def fetch(self, keys: List[str]) -> Dict[int, np.ndarray]:
+        """Return cached vectors keyed by position in keys; misses are omitted."""
+        with self._locked(exclusive=False):
+            self._sync()
+            if self._meta is None:
+                return {}
+            found = {}
+            for position, key in enumerate(keys):
+                row = self._rows.get(key)
+                if row is not None:
+                    found[position] = np.array(self._vectors[row])
+            return found
+    
+    def store(self, keys: List[str], embeddings: np.ndarray, touched: Iterable[str] = ()) -> None:
+        """Write new embeddings and refresh recency of keys that were read."""
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        touched = list(touched)
+        if not keys and not touched:
+            return
+        
+        with self._locked(exclusive=True):
+            self._sync()
+            if keys:
+                if self._meta is None:
+                    self._create(int(embeddings.shape[1]))
+                elif self._meta['dim'] != embeddings.shape[1]:
+                    self.logger.warning(
+                        f"Embedding dimension changed ({self._meta['dim']} -> {embeddings.shape[1]}), "
+                        f"skipping cache write"
+                    )
+                    keys = []
+            if self._meta is None:
+                return
+            
+            capacity = self._meta['capacity']
+            if len(keys) > capacity:
+                # Only the tail of an oversized batch can be kept
+                keys = keys[-capacity:]
+                embeddings = embeddings[-capacity:]
+            
+            # Clock values only need to increase, so the file's maximum is the current time
+            clock = int(self._clock.max()) if capacity else 0
+            for key in touched:
+                row = self._rows.get(key)
+                if row is not None:
+                    clock += 1
+                    self._clock[row] = clock
+            
+            if keys:
+                victims = self._lru_victims(len(keys), clock)
+                log_lines = []
+                for key, embedding in zip(keys, embeddings):
+                    clock += 1
+                    row = self._rows.get(key)
+                    if row is None:
+                        row = self._allocate_row(victims)
+                        self._assign(key, row)
+                        log_lines.append(f"{key} {row}\n")
+                    self._vectors[row] = embedding
+                    self._clock[row] = clock
+                self._vectors.flush()
+                self._append_log(log_lines)
+            self._clock.flush()
+            
+            if self._log_lines > self.COMPACT_RATIO * capacity:
+                self._compact_log()
+    
+    def _allocate_row(self, victims: Iterator[int]) -> int:
+        """The next never-used row, or the least recently used one once the cache is full."""
+        if self._next_row < self._meta['capacity']:
+            self._next_row += 1
+            return self._next_row - 1
+        return next(victims)
+    
+    def _lru_victims(self, needed: int, clock: int) -> Iterator[int]:
+        """Yield rows from least to most recently used, skipping ones written in this batch."""
+        if self._next_row + needed <= self._meta['capacity']:
+            return
+        # The order is only needed once the cache is full
+        order = np.argsort(self._clock[:self._next_row], kind='stable')
+        for row in order:
+            if self._clock[row] <= clock:
+                yield int(row)
+    
+    def _assign(self, key: str, row: int) -> None:
+        """Map key to row, dropping the key that row held before."""
+        previous = self._row_keys[row]
+        if previous is not None and self._rows.get(previous) == row:
+            del self._rows[previous]
+        self._rows[key] = row
+        self._row_keys[row] = key
+        self._next_row = max(self._next_row, row + 1)
+    
+    def _sync(self) -> None:
+        """Apply the log lines appended since this process last looked."""
+        try:
+            with open(self.meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+        except FileNotFoundError:
+            return
+        if self._meta is None or (meta['dim'], meta['capacity']) != (self._meta['dim'], self._meta['capacity']):
+            self._open_arrays(meta)
+            self._log_generation = None
+        self._meta = meta
+        
+        try:
+            size = self.log_path.stat().st_size
+        except FileNotFoundError:
+            size = 0
+        if meta.get('generation', 0) != self._log_generation or size < self._log_offset:
+            # New or compacted log: replay it from the start
+            self._rows = {}
+            self._row_keys = [None] * meta['capacity']
+            self._next_row = 0
+            self._log_generation = meta.get('generation', 0)
+            self._log_offset = 0
+            self._log_lines = 0
+        if size <= self._log_offset:
+            return
+        
+        with open(self.log_path, 'rb') as f:
+            f.seek(self._log_offset)
+            data = f.read(size - self._log_offset)
+        # A crashed writer may leave a partial last line; it is never committed
+        data = data[:data.rfind(b'\n') + 1]
+        for line in data.splitlines():
+            key, row = line.split()
+            self._assign(key.decode('ascii'), int(row))
+            self._log_lines += 1
+        self._log_offset += len(data)
+    
+    def _create(self, dim: int) -> None:
+        """Lay out an empty cache for vectors of dim; the metadata is written last."""
+        meta = {'model_name': self.model_name, 'dim': dim, 'capacity': self.max_entries, 'generation': 0}
+        np.memmap(self.vectors_path, dtype=np.float32, mode='w+', shape=(meta['capacity'], dim)).flush()
+        np.memmap(self.clock_path, dtype=np.int64, mode='w+', shape=(meta['capacity'],)).flush()
+        self.log_path.unlink(missing_ok=True)
+        self._write_atomic(self.meta_path, json.dumps(meta))
+        self._open_arrays(meta)
+        self._log_generation = 0
+        self._log_offset = 0
+        self._log_lines = 0
+    
+    def _open_arrays(self, meta: Dict) -> None:
+        self._meta = meta
+        self._vectors = np.memmap(self.vectors_path, dtype=np.float32, mode='r+',
+                                  shape=(meta['capacity'], meta['dim']))
+        self._clock = np.memmap(self.clock_path, dtype=np.int64, mode='r+', shape=(meta['capacity'],))
+        self._row_keys = [None] * meta['capacity']
+    
+    def _append_log(self, lines: List[str]) -> None:
+        if not lines:
+            return
+        with open(self.log_path, 'a', encoding='ascii') as f:
+            f.write(''.join(lines))
+        self._log_offset = self.log_path.stat().st_size
+        self._log_lines += len(lines)
+    
+    def _compact_log(self) -> None:
+        """Rewrite the log with one line per live entry under a new generation.
+        
+        The generation is bumped first, so a crash before the log is replaced
+        only costs other instances a redundant full replay.
+        """
+        self._meta = dict(self._meta, generation=self._meta.get('generation', 0) + 1)
+        self._write_atomic(self.meta_path, json.dumps(self._meta))
+        self._write_atomic(self.log_path, ''.join(f"{key} {row}\n" for key, row in self._rows.items()))
+        self._log_generation = self._meta['generation']
+        self._log_offset = self.log_path.stat().st_size
+        self._log_lines = len(self._rows)
+    
+    def _write_atomic(self, path: Path, content: str) -> None:
+        tmp_path = path.with_suffix(f".tmp.{os.getpid()}")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+    
+    @contextmanager
+    def _locked(self, exclusive: bool):
+        """Hold a shared (read) or exclusive (write) lock on the cache directory."""
+        with self._mutex:
+            if fcntl is None:
+                yield
+                return
+            with open(self.lock_path, 'a') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
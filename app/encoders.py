@@ -0,0 +1,246 @@
+import json
+import logging
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Tuple, Union
+import numpy as np
+from .utils import normalize_rows
+
+ENCODER_BACKENDS = ('torch', 'onnx')
+
+# Written next to an exported model; describes how token states become sentence embeddings
+ENCODER_CONFIG = "encoder_config.json"
+
+class EncoderBackend:
+    """Sentence encoder with the SentenceTransformer.encode interface.
+    
+    EmbeddingGenerator only calls encode(), so any backend producing the same
+    vectors can replace the PyTorch model.
+    """
+    
+    name = None
+    # Longest input in tokens, including special tokens; longer texts are truncated
+    max_seq_length = None
+    
+    def encode(self, sentences: Union[str, List[str]], batch_size: int = 32, **kwargs) -> np.ndarray:
+        raise NotImplementedError
+    
+    def token_spans(self, texts: List[str]) -> Optional[List[List[Tuple[int, int]]]]:
+        """Character (start, end) of every token of each text, untruncated and without special tokens.
+        
+        None when the backend cannot tokenize on its own.
+        """
+        return None
+    
+    def get_sentence_embedding_dimension(self) -> int:
+        raise NotImplementedError
+
+class SentenceTransformerBackend(EncoderBackend):
+    """Full-precision PyTorch SentenceTransformer on CPU."""
+    
+    name = 'torch'
+    
+    def __init__(self, model_name: str, threads: Optional[int] = None):
+        from sentence_transformers import SentenceTransformer
+        if threads:
+            import torch
+            torch.set_num_threads(threads)
+        self.model = SentenceTransformer(model_name, device='cpu')
+        self.max_seq_length = getattr(self.model, 'max_seq_length', None)
+    
+    def encode(self, sentences: Union[str, List[str]], batch_size: int = 32, **kwargs) -> np.ndarray:
+        return self.model.encode(sentences, batch_size=batch_size, **kwargs)
+    
+    def token_spans(self, texts: List[str]) -> Optional[List[List[Tuple[int, int]]]]:
+        tokenizer = getattr(self.model, 'tokenizer', None)
+        # Offsets need a fast (Rust) tokenizer
+        if not getattr(tokenizer, 'is_fast', False):
+            return None
+        encoded = tokenizer(texts, add_special_tokens=False, truncation=False,
+                            return_offsets_mapping=True, return_attention_mask=False)
+        return [[tuple(span) for span in offsets] for offsets in encoded['offset_mapping']]
+    
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.model.get_sentence_embedding_dimension()
+
+class ONNXBackend(EncoderBackend):
+    """Exported transformer run with ONNX Runtime, pooled like the original model.
+    
+    Loads model.onnx (or model_quantized.onnx), tokenizer.json and
+    encoder_config.json from a local directory written by export_onnx; nothing
+    is downloaded.
+    """
+    
+    name = 'onnx'
+    
+    def __init__(self, model_dir: Path, quantized: bool = False, threads: Optional[int] = None):
+        import onnxruntime
+        from tokenizers import Tokenizer
+        
+        self.logger = logging.getLogger(__name__)
+        model_dir = Path(model_dir)
+        model_file = model_dir / ("model_quantized.onnx" if quantized else "model.onnx")
+        if not model_file.exists():
+            raise FileNotFoundError(f"No exported ONNX model at {model_file}")
+        
+        with open(model_dir / ENCODER_CONFIG, 'r', encoding='utf-8') as f:
+            self.config = json.load(f)
+        
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+            options.inter_op_num_threads = 1
+        self.session = onnxruntime.InferenceSession(
+            str(model_file), sess_options=options, providers=['CPUExecutionProvider']
+        )
+        self.input_names = {node.name for node in self.session.get_inputs()}
+        
+        self.max_seq_length = self.config['max_seq_length']
+        self.tokenizer = Tokenizer.from_file(str(model_dir / "tokenizer.json"))
+        # Chunking measures whole texts, so keep an untruncated, unpadded copy
+        self.span_tokenizer = Tokenizer.from_file(str(model_dir / "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=self.max_seq_length)
+        self.tokenizer.enable_padding(pad_id=self.config.get('pad_token_id', 0))
+        self.logger.info(f"Loaded ONNX encoder {model_file.name} from {model_dir}")
+    
+    def encode(self, sentences: Union[str, List[str]], batch_size: int = 32, **kwargs) -> np.ndarray:
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        embeddings = np.empty((len(texts), self.config['dimension']), dtype=np.float32)
+        
+        # Batching texts of similar length keeps padding (and wasted compute) low
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        for start in range(0, len(order), batch_size):
+            batch = order[start:start + batch_size]
+            embeddings[batch] = self._encode_batch([texts[i] for i in batch])
+        return embeddings[0] if single else embeddings
+    
+    def token_spans(self, texts: List[str]) -> Optional[List[List[Tuple[int, int]]]]:
+        return [encoding.offsets for encoding in self.span_tokenizer.encode_batch(texts, add_special_tokens=False)]
+    
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        inputs = {
+            'input_ids': np.array([e.ids for e in encodings], dtype=np.int64),
+            'attention_mask': np.array([e.attention_mask for e in encodings], dtype=np.int64),
+            'token_type_ids': np.array([e.type_ids for e in encodings], dtype=np.int64)
+        }
+        token_states = self.session.run(None, {k: v for k, v in inputs.items() if k in self.input_names})[0]
+        
+        mask = inputs['attention_mask'][:, :, None].astype(np.float32)
+        if self.config['pooling'] == 'cls':
+            pooled = token_states[:, 0]
+        elif self.config['pooling'] == 'max':
+            pooled = np.where(mask > 0, token_states, -1e9).max(axis=1)
+        else:
+            pooled = (token_states * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        
+        if self.config['normalize']:
+            pooled = pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+        return pooled.astype(np.float32)
+    
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.config['dimension']
+
+def create_encoder(backend: str, model_name: str, model_dir: Optional[Path] = None,
+                   quantized: bool = False, threads: Optional[int] = None) -> EncoderBackend:
+    """Build the requested encoder backend."""
+    if backend == 'torch':
+        return SentenceTransformerBackend(model_name, threads=threads)
+    if backend == 'onnx':
+        if model_dir is None:
+            raise ValueError("The onnx backend needs the directory of an exported model")
+        return ONNXBackend(model_dir, quantized=quantized, threads=threads)
+    raise ValueError(f"Unknown encoder backend: {backend}")
+
+def export_onnx(model_name: str, output_dir: Path, quantize: bool = True, opset: int = 14) -> Path:
+    """Export a SentenceTransformer to ONNX (plus an int8 dynamic-quantized copy).
+    
+    Needs torch and sentence-transformers, so run it once where the model is
+    available; the output directory is all the onnx backend needs afterwards.
+    """
+    import torch
+    from sentence_transformers import SentenceTransformer
+    from sentence_transformers.models import Normalize, Pooling
+    
+    logger = logging.getLogger(__name__)
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    
+    model = SentenceTransformer(model_name, device='cpu')
+    transformer = model[0].auto_model.eval()
+    tokenizer = model.tokenizer
+    
+    pooling = 'mean'
+    for module in model:
+        if isinstance(module, Pooling):
+            config = module.get_config_dict()
+            if config.get('pooling_mode_cls_token'):
+                pooling = 'cls'
+            elif config.get('pooling_mode_max_tokens'):
+                pooling = 'max'
+    
+    sample = tokenizer(["An example sentence to trace the model."], return_tensors='pt')
+    input_names = [name for name in ('input_ids', 'attention_mask', 'token_type_ids') if name in sample]
+    dynamic_axes = {name: {0: 'batch', 1: 'sequence'} for name in input_names}
+    dynamic_axes['last_hidden_state'] = {0: 'batch', 1: 'sequence'}
+    
+    model_file = output_dir / "model.onnx"
+    with torch.no_grad():
+        torch.onnx.export(
+            transformer, tuple(sample[name] for name in input_names), str(model_file),
+            input_names=input_names, output_names=['last_hidden_state'],
+            dynamic_axes=dynamic_axes, opset_version=opset
+        )
+    tokenizer.save_pretrained(str(output_dir))
+    
+    with open(output_dir / ENCODER_CONFIG, 'w', encoding='utf-8') as f:
+        json.dump({
+            'source_model': model_name,
+            'dimension': model.get_sentence_embedding_dimension(),
+            'max_seq_length': model.max_seq_length,
+            'pooling': pooling,
+            'normalize': any(isinstance(module, Normalize) for module in model),
+            'pad_token_id': tokenizer.pad_token_id or 0
+        }, f, indent=2)
+    logger.info(f"Exported {model_name} to {model_file}")
+    
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        quantize_dynamic(str(model_file), str(output_dir / "model_quantized.onnx"), weight_type=QuantType.QInt8)
+        logger.info(f"Wrote int8 dynamic-quantized model to {output_dir / 'model_quantized.onnx'}")
+    
+    return output_dir
+
+def check_parity(reference: EncoderBackend, candidate: EncoderBackend,
+                 texts: List[str], queries: List[str], top_k: int = 10) -> Dict[str, Any]:
+    """Compare a backend's cosine scores with a reference backend on the same inputs.
+    
+    Reports how far query/text scores drift and how many of the reference
+    top_k texts per query the candidate also ranks in its top_k.
+    """
+    ref_texts, cand_texts = normalize_rows(reference.encode(texts)), normalize_rows(candidate.encode(texts))
+    ref_scores = normalize_rows(reference.encode(queries)) @ ref_texts.T
+    cand_scores = normalize_rows(candidate.encode(queries)) @ cand_texts.T
+    
+    k = min(top_k, len(texts))
+    overlap = [
+        len(set(np.argsort(-r)[:k]) & set(np.argsort(-c)[:k])) / k
+        for r, c in zip(ref_scores, cand_scores)
+    ]
+    score_diff = np.abs(ref_scores - cand_scores)
+    return {
+        'texts': len(texts),
+        'queries': len(queries),
+        'embedding_cosine_min': float(np.min(np.sum(ref_texts * cand_texts, axis=1))),
+        'score_diff_max': float(score_diff.max()),
+        'score_diff_mean': float(score_diff.mean()),
+        'top_k': k,
+        'top_k_overlap_mean': float(np.mean(overlap))
+    }
+
+def encoder_id(model_name: str, backend: str = 'torch', quantized: bool = False) -> str:
+    """Name under which a backend's embeddings are cached; backends never share vectors."""
+    if backend == 'torch':
+        return model_name
+    return f"{model_name}@{backend}{'-int8' if quantized else ''}"
@@ -0,0 +1,148 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Tuple
+
+# Bump whenever PDFExtractor output changes so stale entries are re-extracted
+EXTRACTOR_VERSION = 2
+
+class ExtractionCache:
+    """Sidecar store of extracted sections so unchanged PDFs skip parsing.
+    
+    Entries are keyed by the document path and validated against a file
+    fingerprint: size + mtime ('stat', the default) or a content hash ('hash').
+    With per_page enabled every page is stored as its own entry, which lets
+    page-range extraction reuse and fill the cache independently. variant
+    names extractor settings that change the output, so each setting keeps
+    its own entries.
+    """
+    
+    def __init__(self, cache_dir: Path, key_mode: str = 'stat', per_page: bool = False,
+                 variant: Optional[str] = None):
+        if key_mode not in ('stat', 'hash'):
+            raise ValueError(f"Unknown extraction cache key mode: {key_mode}")
+        self.logger = logging.getLogger(__name__)
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.key_mode = key_mode
+        self.per_page = per_page
+        self.variant = variant
+    
+    def fingerprint(self, pdf_path: Path) -> str:
+        """Identify the current contents of a PDF file."""
+        if self.key_mode == 'stat':
+            stat = pdf_path.stat()
+            return f"{stat.st_size}:{stat.st_mtime_ns}"
+        
+        digest = hashlib.sha256()
+        with open(pdf_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+    
+    def get(self, pdf_path: Path,
+            page_range: Optional[Tuple[int, int]] = None) -> Optional[List[Dict[str, Any]]]:
+        """Return cached sections for a document (or page range), or None on a miss."""
+        try:
+            fingerprint = self.fingerprint(pdf_path)
+            if self.per_page:
+                return self._get_pages(pdf_path, fingerprint, page_range)
+            
+            entry = self._read(self._document_path(pdf_path))
+            if not self._valid(entry, fingerprint):
+                return None
+            sections = entry['sections']
+            if page_range:
+                sections = [s for s in sections if page_range[0] <= s['page_number'] <= page_range[1]]
+            return sections
+        except Exception as e:
+            self.logger.warning(f"Ignoring unreadable extraction cache for {pdf_path.name}: {e}")
+            return None
+    
+    def put(self, pdf_path: Path, sections: List[Dict[str, Any]], page_count: int,
+            page_range: Optional[Tuple[int, int]] = None) -> None:
+        """Store sections extracted from a document (or page range)."""
+        try:
+            fingerprint = self.fingerprint(pdf_path)
+            if self.per_page:
+                self._put_pages(pdf_path, fingerprint, sections, page_count, page_range)
+            elif page_range is None:
+                self._write(self._document_path(pdf_path), {
+                    'version': EXTRACTOR_VERSION,
+                    'fingerprint': fingerprint,
+                    'page_count': page_count,
+                    'sections': sections
+                })
+        except Exception as e:
+            self.logger.warning(f"Failed to update extraction cache for {pdf_path.name}: {e}")
+    
+    def _get_pages(self, pdf_path: Path, fingerprint: str,
+                   page_range: Optional[Tuple[int, int]]) -> Optional[List[Dict[str, Any]]]:
+        """Assemble a range from per-page entries; any missing page is a miss."""
+        page_dir = self._page_dir(pdf_path)
+        if page_range is None:
+            first = self._read(page_dir / "1.json")
+            if not self._valid(first, fingerprint):
+                return None
+            page_range = (1, first['page_count'])
+        
+        sections = []
+        for page_number in range(page_range[0], page_range[1] + 1):
+            entry = self._read(page_dir / f"{page_number}.json")
+            if not self._valid(entry, fingerprint):
+                return None
+            sections.extend(entry['sections'])
+        return sections
+    
+    def _put_pages(self, pdf_path: Path, fingerprint: str, sections: List[Dict[str, Any]],
+                   page_count: int, page_range: Optional[Tuple[int, int]]) -> None:
+        """Write one entry per page, including pages that produced no sections."""
+        first, last = page_range or (1, page_count)
+        by_page = {page_number: [] for page_number in range(first, last + 1)}
+        for section in sections:
+            by_page.setdefault(section['page_number'], []).append(section)
+        
+        page_dir = self._page_dir(pdf_path)
+        page_dir.mkdir(parents=True, exist_ok=True)
+        for page_number, page_sections in by_page.items():
+            self._write(page_dir / f"{page_number}.json", {
+                'version': EXTRACTOR_VERSION,
+                'fingerprint': fingerprint,
+                'page_count': page_count,
+                'sections': page_sections
+            })
+    
+    def _valid(self, entry: Optional[Dict[str, Any]], fingerprint: str) -> bool:
+        """Check an entry belongs to the current file and extractor version."""
+        return (entry is not None and entry.get('version') == EXTRACTOR_VERSION
+                and entry.get('fingerprint') == fingerprint)
+    
+    def _entry_key(self, pdf_path: Path) -> str:
+        """Stable key for a document path and extractor variant."""
+        key = str(pdf_path.resolve())
+        if self.variant:
+            key += '\0' + self.variant
+        return hashlib.sha1(key.encode('utf-8')).hexdigest()
+    
+    def _document_path(self, pdf_path: Path) -> Path:
+        return self.cache_dir / f"{self._entry_key(pdf_path)}.json"
+    
+    def _page_dir(self, pdf_path: Path) -> Path:
+        return self.cache_dir / self._entry_key(pdf_path)
+    
+    def _read(self, path: Path) -> Optional[Dict[str, Any]]:
+        """Load a JSON entry if it exists."""
+        if not path.exists():
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    
+    def _write(self, path: Path, entry: Dict[str, Any]) -> None:
+        """Atomically write a JSON entry."""
+        tmp_path = path.with_suffix(f".tmp.{os.getpid()}.{threading.get_ident()}")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
@@ -1,66 +1,213 @@
 import logging
-import pdfplumber
 import re
-from typing import List, Dict, Any
+import time
+from typing import List, Dict, Any, Optional, Tuple, Iterator
 from pathlib import Path
+from .extraction_cache import ExtractionCache
+from .pdf_backends import PDF_BACKENDS, PDFDocumentReader, PdfminerReader, open_pdf
+from .section_store import SectionStore, summarize_section
+from .profiler import current_profiler
+
+# Characters that might interfere (and runs of spaces/tabs) become one space; line breaks survive
+_NOISE = re.compile(r'[^\w\n\.,;:!?\-()[\]{}"]+')
+_BLANK_LINES = re.compile(r'\n\s*\n')
+
+# ALL CAPS, numbered, "Title:", chapter and section headings in one alternation
+_HEADING = re.compile(
+    r'[A-Z][A-Z\s]{2,}$'
+    r'|\d+\.\s*[A-Z]'
+    r'|[A-Z][a-z]*\s*:'
+    r'|Chapter\s+\d+'
+    r'|Section\s+\d+'
+)
 
 class PDFExtractor:
     """Extracts structured content from PDF documents."""
     
-    def __init__(self):
+    # Font-based detection: a heading line is this much larger than body text, or bold in non-bold text
+    HEADING_SIZE_RATIO = 1.15
+    LINE_TOLERANCE = 3.0
+    # backend='auto' reads documents longer than this with the text-only pdfminer backend
+    AUTO_TEXT_ONLY_PAGES = 200
+    
+    def __init__(self, cache: Optional[ExtractionCache] = None, use_font_metadata: bool = False,
+                 backend: str = 'pdfplumber', max_pages: Optional[int] = None,
+                 max_rss_mb: Optional[float] = None):
+        if backend not in PDF_BACKENDS + ('auto',):
+            raise ValueError(f"Unknown PDF backend: {backend}")
         self.logger = logging.getLogger(__name__)
+        self.cache = cache
+        self.use_font_metadata = use_font_metadata
+        self.backend = backend
+        self.max_pages = max_pages
+        self.max_rss_mb = max_rss_mb
+    
+    def options(self) -> Dict[str, Any]:
+        """Constructor arguments (besides the cache) that rebuild this extractor in a worker process."""
+        return {
+            'use_font_metadata': self.use_font_metadata,
+            'backend': self.backend,
+            'max_pages': self.max_pages,
+            'max_rss_mb': self.max_rss_mb
+        }
+    
+    def get_page_count(self, pdf_path: Path) -> int:
+        """Return the number of pages that will be extracted from a PDF file (at most max_pages)."""
+        with PdfminerReader(pdf_path) as reader:
+            return self._limit_pages(reader.page_count)
+    
+    def _limit_pages(self, page_count: int) -> int:
+        return min(page_count, self.max_pages) if self.max_pages else page_count
+    
+    def _open(self, pdf_path: Path) -> PDFDocumentReader:
+        """Open a PDF with the configured backend, choosing one per document for 'auto'."""
+        if self.backend != 'auto':
+            return open_pdf(self.backend, pdf_path, self.max_rss_mb)
         
-    def extract_sections(self, pdf_path: Path) -> List[Dict[str, Any]]:
-        """Extract sections from a PDF file."""
-        sections = []
+        reader = open_pdf('pdfminer', pdf_path, self.max_rss_mb)
+        # Font headings need pdfplumber's character metadata
+        if reader.page_count > self.AUTO_TEXT_ONLY_PAGES and not self.use_font_metadata:
+            return reader
+        reader.close()
+        return open_pdf('pdfplumber', pdf_path, self.max_rss_mb)
+    
+    def extract_sections(self, pdf_path: Path,
+                         page_range: Optional[Tuple[int, int]] = None) -> List[Dict[str, Any]]:
+        """Extract sections from a PDF file as dicts.
         
-        try:
-            with pdfplumber.open(pdf_path) as pdf:
-                for page_num, page in enumerate(pdf.pages, 1):
-                    text = page.extract_text()
-                    if not text:
-                        continue
-                    
-                    # Clean and split text into sections
-                    page_sections = self._split_into_sections(text, pdf_path.name, page_num)
-                    sections.extend(page_sections)
-                    
-        except Exception as e:
-            self.logger.error(f"Error extracting from {pdf_path}: {e}")
-            raise
+        page_range is an optional 1-based inclusive (first, last) page window.
+        """
+        store = SectionStore()
+        self.extract_into(pdf_path, store, page_range)
+        return store.to_dicts()
+    
+    def extract_into(self, pdf_path: Path, store: SectionStore,
+                     page_range: Optional[Tuple[int, int]] = None) -> int:
+        """Append sections from a PDF file to a SectionStore and return how many were added."""
+        profiler = current_profiler()
+        with profiler.stage('extract_document', category='document', document=pdf_path.name) as stats:
+            if self.cache:
+                cached = self.cache.get(pdf_path, page_range)
+                if cached is not None:
+                    self.logger.debug(f"Extraction cache hit for {pdf_path.name}")
+                    store.extend_dicts(cached)
+                    stats.update(sections=len(cached), cache_hits=1)
+                    return len(cached)
             
-        return sections
+            start = len(store)
+            
+            try:
+                with self._open(pdf_path) as reader:
+                    page_count = self._limit_pages(reader.page_count)
+                    stats['backend'] = reader.name
+                    for page_num, page_sections in self._iter_pages(reader, pdf_path, page_range):
+                        stats['pages'] = stats.get('pages', 0) + 1
+                        for title, section_text in page_sections:
+                            store.append(pdf_path.name, page_num, section_text, title)
+            
+            except Exception as e:
+                self.logger.error(f"Error extracting from {pdf_path}: {e}")
+                raise
+            
+            if self.cache and (page_range is None or self.cache.per_page):
+                self.cache.put(pdf_path, store.to_dicts(range(start, len(store))), page_count, page_range)
+            
+            stats['sections'] = len(store) - start
+            return len(store) - start
+    
+    def iter_page_sections(self, pdf_path: Path, page_range: Optional[Tuple[int, int]] = None
+                           ) -> Iterator[Tuple[int, List[Tuple[Optional[str], str]]]]:
+        """Lazily yield (page_number, [(title, text), ...]) one page at a time.
+        
+        Pages without text yield an empty list. The extraction cache is not
+        consulted; extract_into handles caching for whole documents.
+        """
+        with self._open(pdf_path) as reader:
+            yield from self._iter_pages(reader, pdf_path, page_range)
+    
+    def _iter_pages(self, reader: PDFDocumentReader, pdf_path: Path, page_range: Optional[Tuple[int, int]]
+                    ) -> Iterator[Tuple[int, List[Tuple[Optional[str], str]]]]:
+        """Extract and segment the pages of an open PDF in order, stopping at max_pages."""
+        profiler = current_profiler()
+        first_page, last_page = page_range or (1, reader.page_count)
+        last_page = self._limit_pages(last_page)
+        if first_page > last_page:
+            return
+        
+        page_start = time.perf_counter()
+        page_cpu_start = time.process_time()
+        for page_num, text, page in reader.pages(first_page, last_page):
+            if not text:
+                yield page_num, []
+                page_start = time.perf_counter()
+                page_cpu_start = time.process_time()
+                continue
+            
+            # Clean and split text into sections (text-only backends have no page to read fonts from)
+            if self.use_font_metadata and page is not None:
+                page_sections = self._segment_page_with_fonts(page, text, page_num)
+            else:
+                page_sections = self._segment_page(text, page_num)
+            
+            profiler.record(
+                'extract_page', wall=time.perf_counter() - page_start,
+                cpu=time.process_time() - page_cpu_start, category='page',
+                document=pdf_path.name, page=page_num,
+                chars=len(text), sections=len(page_sections)
+            )
+            yield page_num, page_sections
+            page_start = time.perf_counter()
+            page_cpu_start = time.process_time()
     
     def _split_into_sections(self, text: str, document_name: str, page_number: int) -> List[Dict[str, Any]]:
         """Split page text into logical sections."""
-        sections = []
-        
-        # Clean text
+        return [
+            {
+                'document_name': document_name,
+                'page_number': page_number,
+                'section_text': section_text,
+                'section_title': title,
+                'context_summary': self._generate_context_summary(section_text)
+            }
+            for title, section_text in self._segment_page(text, page_number)
+        ]
+    
+    def _segment_page(self, text: str, page_number: int) -> List[Tuple[Optional[str], str]]:
+        """Split page text into (title, text) pairs."""
         cleaned_text = self._clean_text(text)
+        return self._segment_lines(cleaned_text.split('\n'), page_number, cleaned_text)
+    
+    def _segment_page_with_fonts(self, page, text: str, page_number: int) -> List[Tuple[Optional[str], str]]:
+        """Split a page using word font sizes and weights to find headings.
+        
+        Pages set in a single style carry no signal, so they fall back to the text patterns.
+        """
+        lines, flags = self._font_lines(page)
+        if not any(flags):
+            return self._segment_page(text, page_number)
         
-        # Split by potential headings (lines that are short, capitalized, or have specific patterns)
-        lines = cleaned_text.split('\n')
+        lines = [_NOISE.sub(' ', line).strip() for line in lines]
+        return self._segment_lines(lines, page_number, '\n'.join(line for line in lines if line), flags)
+    
+    def _segment_lines(self, lines: List[str], page_number: int, cleaned_text: str,
+                       heading_flags: Optional[List[bool]] = None) -> List[Tuple[Optional[str], str]]:
+        """Group lines into sections in one pass, starting a new section at each heading."""
+        sections = []
         current_section = []
         current_title = None
         
-        for line in lines:
+        for i, line in enumerate(lines):
             line = line.strip()
             if not line:
                 continue
-                
-            # Check if line looks like a heading
-            if self._is_heading(line):
+            
+            is_heading = heading_flags[i] if heading_flags is not None else self._is_heading(line)
+            if is_heading:
                 # Save previous section if it exists
                 if current_section:
-                    section_text = '\n'.join(current_section).strip()
+                    section_text = '\n'.join(current_section)
                     if len(section_text) > 50:  # Minimum section length
-                        sections.append({
-                            'document_name': document_name,
-                            'page_number': page_number,
-                            'section_text': section_text,
-                            'section_title': current_title,
-                            'context_summary': self._generate_context_summary(section_text)
-                        })
+                        sections.append((current_title, section_text))
                 
                 # Start new section
                 current_title = line
@@ -70,67 +217,75 @@ class PDFExtractor:
         
         # Add final section
         if current_section:
-            section_text = '\n'.join(current_section).strip()
+            section_text = '\n'.join(current_section)
             if len(section_text) > 50:
-                sections.append({
-                    'document_name': document_name,
-                    'page_number': page_number,
-                    'section_text': section_text,
-                    'section_title': current_title,
-                    'context_summary': self._generate_context_summary(section_text)
-                })
+                sections.append((current_title, section_text))
         
         # If no sections found, treat entire page as one section
         if not sections and len(cleaned_text) > 50:
-            sections.append({
-                'document_name': document_name,
-                'page_number': page_number,
-                'section_text': cleaned_text,
-                'section_title': f"Page {page_number}",
-                'context_summary': self._generate_context_summary(cleaned_text)
-            })
-            
+            sections.append((f"Page {page_number}", cleaned_text))
+        
         return sections
     
+    def _font_lines(self, page) -> Tuple[List[str], List[bool]]:
+        """Rebuild page lines from words and flag those set larger or bolder than the body text."""
+        words = page.extract_words(extra_attrs=['size', 'fontname'])
+        if not words:
+            return [], []
+        
+        # Body style is the one covering the most characters
+        size_chars = {}
+        bold_chars = 0
+        for word in words:
+            size = round(word['size'], 1)
+            size_chars[size] = size_chars.get(size, 0) + len(word['text'])
+            if 'bold' in word['fontname'].lower():
+                bold_chars += len(word['text'])
+        body_size = max(size_chars, key=size_chars.get)
+        body_bold = bold_chars * 2 > sum(size_chars.values())
+        
+        lines, flags = [], []
+        line_words = []
+        line_top = None
+        for word in sorted(words, key=lambda w: (w['top'], w['x0'])):
+            if line_top is not None and word['top'] - line_top > self.LINE_TOLERANCE:
+                lines.append(' '.join(w['text'] for w in line_words))
+                flags.append(self._is_heading_style(line_words, body_size, body_bold))
+                line_words = []
+                line_top = None
+            if line_top is None:
+                line_top = word['top']
+            line_words.append(word)
+        lines.append(' '.join(w['text'] for w in line_words))
+        flags.append(self._is_heading_style(line_words, body_size, body_bold))
+        return lines, flags
+    
+    def _is_heading_style(self, words: List[Dict[str, Any]], body_size: float, body_bold: bool) -> bool:
+        """Check whether a line's words are styled as a heading."""
+        chars = sum(len(w['text']) for w in words)
+        if chars > 100:  # Too long to be a heading
+            return False
+        size = sum(w['size'] * len(w['text']) for w in words) / max(chars, 1)
+        if size >= body_size * self.HEADING_SIZE_RATIO:
+            return True
+        return not body_bold and all('bold' in w['fontname'].lower() for w in words)
+    
     def _clean_text(self, text: str) -> str:
-        """Clean and normalize text."""
-        # Remove excessive whitespace
-        text = re.sub(r'\s+', ' ', text)
-        # Remove special characters that might interfere
-        text = re.sub(r'[^\w\s\.,;:!?\-()[\]{}"]', ' ', text)
-        # Normalize line breaks
-        text = re.sub(r'\n\s*\n', '\n', text)
-        return text.strip()
+        """Clean and normalize text, keeping one line per non-empty line."""
+        text = _NOISE.sub(' ', text)
+        return _BLANK_LINES.sub('\n', text).strip()
     
     def _is_heading(self, line: str) -> bool:
         """Determine if a line is likely a heading."""
         if len(line) > 100:  # Too long to be a heading
             return False
         
-        # Check various heading patterns
-        heading_patterns = [
-            r'^[A-Z][A-Z\s]{2,}$',  # ALL CAPS
-            r'^\d+\.\s*[A-Z]',      # Numbered headings
-            r'^[A-Z][a-z]*\s*:',    # Title with colon
-            r'^Chapter\s+\d+',      # Chapter headings
-            r'^Section\s+\d+',      # Section headings
-        ]
+        if _HEADING.match(line):
+            return True
         
-        for pattern in heading_patterns:
-            if re.match(pattern, line):
-                return True
-                
         # Check if mostly uppercase and short
-        if len(line) < 50 and line.isupper() and len(line.split()) > 1:
-            return True
-            
-        return False
+        return len(line) < 50 and line.isupper() and len(line.split()) > 1
     
     def _generate_context_summary(self, text: str) -> str:
         """Generate a brief context summary for the section."""
-        # Take first sentence or first 100 characters
-        sentences = text.split('.')
-        if sentences and len(sentences[0]) < 200:
-            return sentences[0].strip() + '.'
-        else:
-            return text[:100].strip() + '...'
\ No newline at end of file
+        return summarize_section(text)
\ No newline at end of file
@@ -0,0 +1,58 @@
+import re
+from typing import List, Iterable, Set, Tuple
+
+# Reasoning labels and the words that trigger them, in output order
+CONTENT_INDICATORS = {
+    "Contains practical examples": ('example', 'case study', 'implementation'),
+    "Contains process information": ('process', 'step', 'procedure', 'method'),
+    "Contains analytical content": ('analysis', 'data', 'research', 'study'),
+}
+
+class KeywordMatcher:
+    """Finds which of many keywords occur as substrings of a text in one regex pass.
+    
+    The alternation is tried longest term first at every position (a lookahead,
+    so overlapping matches are seen). Only the longest term starting at a
+    position is reported, so each match also credits every term it contains;
+    the result equals checking `term in text` for each term separately.
+    """
+    
+    def __init__(self, terms: Iterable[str]):
+        terms = sorted({term.lower() for term in terms if term}, key=lambda term: (-len(term), term))
+        self._pattern = None
+        if terms:
+            self._pattern = re.compile('(?=(' + '|'.join(re.escape(term) for term in terms) + '))')
+        self._contained = {term: [other for other in terms if other in term] for term in terms}
+    
+    def find(self, text_lower: str) -> Set[str]:
+        """Return the (lowercased) terms occurring in an already lowercased text."""
+        found = set()
+        if self._pattern is None:
+            return found
+        seen = set()
+        for match in self._pattern.finditer(text_lower):
+            term = match.group(1)
+            if term not in seen:
+                seen.add(term)
+                found.update(self._contained[term])
+        return found
+
+class ReasoningMatcher:
+    """Persona keywords, job keywords and content indicators for one query, matched together."""
+    
+    def __init__(self, persona_keywords: List[str], job_keywords: List[str]):
+        self.persona_keywords = [(kw, kw.lower()) for kw in persona_keywords if kw]
+        self.job_keywords = [(kw, kw.lower()) for kw in job_keywords if kw]
+        indicator_words = [word for words in CONTENT_INDICATORS.values() for word in words]
+        self._matcher = KeywordMatcher(
+            [lower for _, lower in self.persona_keywords + self.job_keywords] + indicator_words
+        )
+    
+    def match(self, text: str) -> Tuple[List[str], List[str], List[str]]:
+        """Return (persona keywords, job keywords, indicator labels) found in text, in list order."""
+        found = self._matcher.find(text.lower())
+        return (
+            [kw for kw, lower in self.persona_keywords if lower in found],
+            [kw for kw, lower in self.job_keywords if lower in found],
+            [label for label, words in CONTENT_INDICATORS.items() if any(word in found for word in words)]
+        )
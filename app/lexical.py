@@ -0,0 +1,88 @@
+import math
+import re
+from array import array
+from typing import List, Dict, Any, Iterable, Tuple, Union
+import numpy as np
+from .section_store import SectionStore
+
+_TOKEN = re.compile(r'[a-z]{3,}')
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase alphabetic terms of 3+ letters, matching the persona/job keyword extractors."""
+    return _TOKEN.findall(text.lower())
+
+class LexicalIndex:
+    """BM25 inverted index over section titles and text.
+    
+    Postings are appended as sections are added, so the index can be filled
+    while sections are extracted; search scores only sections that share at
+    least one term with the query.
+    """
+    
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, Tuple[array, array]] = {}
+        self._lengths = array('i')
+        self._total_length = 0
+    
+    @classmethod
+    def from_sections(cls, sections: Union[SectionStore, Iterable[Dict[str, Any]]],
+                      **params) -> 'LexicalIndex':
+        """Index every section, in order, so ids match section positions."""
+        index = cls(**params)
+        if isinstance(sections, SectionStore):
+            for i in range(len(sections)):
+                index.add(f"{sections.title(i) or ''} {sections.text(i)}")
+        else:
+            for section in sections:
+                index.add(f"{section.get('section_title') or ''} {section['section_text']}")
+        return index
+    
+    def __len__(self) -> int:
+        return len(self._lengths)
+    
+    def add(self, text: str) -> int:
+        """Index one section and return its id."""
+        section_id = len(self._lengths)
+        counts = {}
+        for term in tokenize(text):
+            counts[term] = counts.get(term, 0) + 1
+        
+        for term, count in counts.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = (array('i'), array('i'))
+            postings[0].append(section_id)
+            postings[1].append(count)
+        
+        length = sum(counts.values())
+        self._lengths.append(length)
+        self._total_length += length
+        return section_id
+    
+    def search(self, terms: Iterable[str], k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (ids, scores) of up to k sections matching any term, best first."""
+        if not len(self) or k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        
+        lengths = np.array(self._lengths, dtype=np.float32)
+        average_length = max(self._total_length / len(self), 1e-9)
+        length_norm = self.k1 * (1 - self.b + self.b * lengths / average_length)
+        scores = np.zeros(len(self), dtype=np.float32)
+        
+        # Sorted so float accumulation (and therefore tie order) is reproducible
+        for term in sorted(set(terms)):
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            ids = np.array(postings[0], dtype=np.int64)
+            tf = np.array(postings[1], dtype=np.float32)
+            idf = math.log(1 + (len(self) - len(ids) + 0.5) / (len(ids) + 0.5))
+            scores[ids] += idf * tf * (self.k1 + 1) / (tf + length_norm[ids])
+        
+        matched = np.flatnonzero(scores > 0)
+        if k < len(matched):
+            matched = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+        order = np.lexsort((matched, -scores[matched]))
+        return matched[order], scores[matched[order]]
@@ -0,0 +1,60 @@
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Iterable, Dict, Any, Optional
+
+OUTPUT_FORMATS = ('json', 'jsonl')
+
+def write_results(results: Iterable[Dict[str, Any]], output_file: Path, output_format: str = 'json',
+                  metadata: Optional[Dict[str, Any]] = None) -> int:
+    """Stream ranked sections to disk one record at a time and return the count.
+    
+    'json' produces the same indented list as json.dump(..., indent=2);
+    'jsonl' writes one compact record per line. With metadata, 'json' writes
+    {"metadata": ..., "ranked_sections": [...]} and 'jsonl' starts with a
+    {"metadata": ...} line. The file is written to a temporary path and
+    moved into place, so readers never see partial output.
+    """
+    logger = logging.getLogger(__name__)
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format: {output_format}")
+    
+    output_file = Path(output_file)
+    tmp_file = output_file.with_name(f".{output_file.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    count = 0
+    
+    try:
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            if output_format == 'jsonl':
+                if metadata is not None:
+                    f.write(json.dumps({'metadata': metadata}, ensure_ascii=False))
+                    f.write('\n')
+                for result in results:
+                    f.write(json.dumps(result, ensure_ascii=False))
+                    f.write('\n')
+                    count += 1
+            else:
+                # Records nest one level deeper inside the metadata wrapper
+                indent = '\n    ' if metadata is not None else '\n  '
+                if metadata is not None:
+                    header = json.dumps(metadata, indent=2, ensure_ascii=False).replace('\n', '\n  ')
+                    f.write(f'{{\n  "metadata": {header},\n  "ranked_sections": ')
+                f.write('[')
+                for result in results:
+                    record = json.dumps(result, indent=2, ensure_ascii=False).replace('\n', indent)
+                    f.write(',' + indent if count else indent)
+                    f.write(record)
+                    count += 1
+                f.write(indent[:-2] + ']' if count else ']')
+                if metadata is not None:
+                    f.write('\n}')
+        os.replace(tmp_file, output_file)
+    except Exception:
+        logger.error(f"Failed to write results to {output_file}")
+        if tmp_file.exists():
+            tmp_file.unlink()
+        raise
+    
+    return count
@@ -0,0 +1,161 @@
+import logging
+import multiprocessing
+import os
+import time
+from multiprocessing import TimeoutError as PoolTimeoutError
+from multiprocessing.pool import Pool
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Tuple
+from .extractor import PDFExtractor
+from .extraction_cache import ExtractionCache
+from .section_store import SectionStore
+from .profiler import Profiler, current_profiler
+
+# One extractor per worker process, created lazily on the first task
+_worker_extractor = None
+
+def process_pool(processes: int) -> Pool:
+    """A worker pool whose processes are not forked from this one.
+    
+    The embedding model may still be importing on its loader thread when a
+    pool starts, and a child forked mid-import can hang on the import lock,
+    so workers come from a forkserver (spawned where there is none).
+    """
+    method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+    return multiprocessing.get_context(method).Pool(processes=processes)
+
+def _extract_task(pdf_path: str, page_range: Optional[Tuple[int, int]],
+                  cache: Optional[ExtractionCache] = None,
+                  profile: bool = False,
+                  extractor_options: Optional[Dict[str, Any]] = None) -> Tuple[SectionStore, List[Dict[str, Any]]]:
+    """Extract one document or page range inside a worker process.
+    
+    extractor_options are PDFExtractor.options() of the parent's extractor.
+    Returns the sections and any profiling events recorded in the worker.
+    """
+    global _worker_extractor
+    if _worker_extractor is None:
+        _worker_extractor = PDFExtractor(cache=cache, **(extractor_options or {}))
+    store = SectionStore()
+    profiler = Profiler(enabled=profile)
+    with profiler.activate():
+        _worker_extractor.extract_into(Path(pdf_path), store, page_range)
+    return store, profiler.events
+
+class ParallelExtractor:
+    """Fans PDF extraction across a process pool with ordered, per-file fault isolation."""
+    
+    def __init__(self, pdf_extractor: Optional[PDFExtractor] = None,
+                 workers: Optional[int] = None,
+                 timeout: Optional[float] = 300.0,
+                 pages_per_task: int = 50):
+        self.logger = logging.getLogger(__name__)
+        self.extractor = pdf_extractor or PDFExtractor()
+        self.workers = workers or os.cpu_count() or 1
+        self.timeout = timeout
+        self.pages_per_task = pages_per_task
+    
+    def extract_all(self, pdf_files: List[Path]) -> SectionStore:
+        """Extract sections from all PDFs in document/page order, skipping failed files."""
+        if self.workers <= 1 or len(pdf_files) == 0:
+            return self._extract_sequential(pdf_files)
+        
+        cache = self.extractor.cache
+        cached = self._cached_documents(pdf_files)
+        all_sections = SectionStore()
+        tasks = self._plan_tasks([pdf_file for pdf_file in pdf_files if pdf_file not in cached])
+        profiler = current_profiler()
+        
+        # Leaving the pool terminates workers, so hung or crashed tasks cannot block shutdown
+        with process_pool(self.workers) as pool:
+            pending = {
+                pdf_file: [
+                    pool.apply_async(_extract_task, (
+                        str(pdf_file), page_range, cache, profiler.enabled, self.extractor.options()
+                    ))
+                    for page_range in ranges
+                ]
+                for pdf_file, ranges, _ in tasks
+            }
+            page_counts = {pdf_file: page_count for pdf_file, _, page_count in tasks}
+            
+            # Collect in document order so output is deterministic
+            for pdf_file in pdf_files:
+                self.logger.info(f"Processing {pdf_file.name}...")
+                if pdf_file in cached:
+                    all_sections.extend_dicts(cached[pdf_file])
+                    continue
+                
+                doc_results = pending[pdf_file]
+                deadline = time.monotonic() + self.timeout if self.timeout else None
+                try:
+                    # Wait for every part before adding any, so a failed file contributes nothing
+                    parts = []
+                    for result in doc_results:
+                        remaining = max(deadline - time.monotonic(), 0) if deadline else None
+                        parts.append(result.get(timeout=remaining))
+                    
+                    start = len(all_sections)
+                    for part, events in parts:
+                        all_sections.extend_store(part)
+                        profiler.merge(events)
+                    
+                    # Page-range tasks only fill per-page entries, so store split documents whole here
+                    if cache and not cache.per_page and len(doc_results) > 1:
+                        cache.put(pdf_file, all_sections.to_dicts(range(start, len(all_sections))),
+                                  page_counts[pdf_file])
+                except PoolTimeoutError:
+                    self.logger.warning(f"Failed to process {pdf_file.name}: timed out after {self.timeout}s")
+                except Exception as e:
+                    self.logger.warning(f"Failed to process {pdf_file.name}: {e}")
+        
+        return all_sections
+    
+    def _extract_sequential(self, pdf_files: List[Path]) -> SectionStore:
+        """Extract sections in-process, one file at a time."""
+        all_sections = SectionStore()
+        for pdf_file in pdf_files:
+            self.logger.info(f"Processing {pdf_file.name}...")
+            try:
+                doc_sections = SectionStore()
+                self.extractor.extract_into(pdf_file, doc_sections)
+                all_sections.extend_store(doc_sections)
+            except Exception as e:
+                self.logger.warning(f"Failed to process {pdf_file.name}: {e}")
+                continue
+        return all_sections
+    
+    def _cached_documents(self, pdf_files: List[Path]) -> Dict[Path, List[Dict[str, Any]]]:
+        """Cached sections of unchanged documents, which never need to reach the pool."""
+        cache = self.extractor.cache
+        if not cache:
+            return {}
+        cached = {}
+        for pdf_file in pdf_files:
+            sections = cache.get(pdf_file)
+            if sections is not None:
+                cached[pdf_file] = sections
+        self.logger.info(f"Extraction cache: {len(cached)} of {len(pdf_files)} documents unchanged")
+        return cached
+    
+    def _plan_tasks(self, pdf_files: List[Path]) -> List[Tuple[Path, List[Optional[Tuple[int, int]]], int]]:
+        """Split large PDFs into page-range tasks; small ones stay whole."""
+        tasks = []
+        for pdf_file in pdf_files:
+            try:
+                page_count = self.extractor.get_page_count(pdf_file)
+            except Exception:
+                # Let the worker surface the real error for this file
+                tasks.append((pdf_file, [None], 0))
+                continue
+            
+            if page_count <= self.pages_per_task:
+                tasks.append((pdf_file, [None], page_count))
+                continue
+            
+            ranges = [
+                (start, min(start + self.pages_per_task - 1, page_count))
+                for start in range(1, page_count + 1, self.pages_per_task)
+            ]
+            tasks.append((pdf_file, ranges, page_count))
+        return tasks
@@ -0,0 +1,179 @@
+import gc
+import io
+import logging
+from pathlib import Path
+from typing import Any, Optional, Tuple, Iterator
+from .profiler import get_rss_mb
+
+PDF_BACKENDS = ('pdfplumber', 'pdfminer')
+
+class PDFMemoryError(MemoryError):
+    """Extraction pushed the process past its RSS ceiling even after releasing caches."""
+
+class PDFDocumentReader:
+    """An open PDF; iterate its pages with pages(), then close() it (or use it as a context manager)."""
+    
+    name = None
+    page_count = 0
+    max_rss_mb = None
+    
+    def pages(self, first: int = 1, last: Optional[int] = None) -> Iterator[Tuple[int, str, Any]]:
+        """Yield (page_number, text, page) for 1-based pages first..last.
+        
+        page is the backend's page object for layout-aware callers, or None
+        for text-only backends.
+        """
+        raise NotImplementedError
+    
+    def close(self) -> None:
+        pass
+    
+    def _within_ceiling(self) -> bool:
+        """Whether RSS is under max_rss_mb, collecting garbage once before giving up."""
+        if self.max_rss_mb is None or get_rss_mb() <= self.max_rss_mb:
+            return True
+        gc.collect()
+        return get_rss_mb() <= self.max_rss_mb
+    
+    def _memory_error(self, pdf_path: Path, page_num: int) -> PDFMemoryError:
+        return PDFMemoryError(
+            f"{pdf_path.name}: RSS {get_rss_mb():.0f} MB stays over the "
+            f"{self.max_rss_mb:.0f} MB ceiling at page {page_num}"
+        )
+    
+    def __enter__(self) -> 'PDFDocumentReader':
+        return self
+    
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+class PlumberReader(PDFDocumentReader):
+    """pdfplumber pages, released as soon as they are read.
+    
+    pdfplumber keeps every page's parsed layout objects, and pdfminer every
+    decoded content stream, until the document is closed, so both are dropped
+    once a page's text is out. With
+    max_rss_mb, a process above the ceiling collects garbage and then reopens
+    the document to drop pdfminer's document-level caches; if it is still
+    above, extraction fails with PDFMemoryError rather than growing further.
+    """
+    
+    name = 'pdfplumber'
+    
+    def __init__(self, pdf_path: Path, max_rss_mb: Optional[float] = None):
+        import pdfplumber
+        self._open = pdfplumber.open
+        self.logger = logging.getLogger(__name__)
+        self.pdf_path = Path(pdf_path)
+        self.max_rss_mb = max_rss_mb
+        self.pdf = self._open(self.pdf_path)
+        self.page_count = len(self.pdf.pages)
+    
+    def pages(self, first: int = 1, last: Optional[int] = None) -> Iterator[Tuple[int, str, Any]]:
+        last = min(last or self.page_count, self.page_count)
+        for page_num in range(first, last + 1):
+            page = self.pdf.pages[page_num - 1]
+            try:
+                yield page_num, page.extract_text(), page
+            finally:
+                self._release(page)
+            self._check_memory(page_num)
+    
+    def _release(self, page) -> None:
+        page.flush_cache()
+        # Per-page memo of the character map (an lru_cache on newer pdfplumber versions)
+        cache_clear = getattr(page.get_textmap, 'cache_clear', None)
+        if cache_clear is not None:
+            cache_clear()
+        # Parsed PDF objects are cached for the life of the document; re-parsing the few shared ones is cheaper
+        cached_objects = getattr(self.pdf.doc, '_cached_objs', None)
+        if cached_objects is not None:
+            cached_objects.clear()
+    
+    def _check_memory(self, page_num: int) -> None:
+        if self._within_ceiling():
+            return
+        
+        self.logger.warning(
+            f"{self.pdf_path.name}: RSS {get_rss_mb():.0f} MB over {self.max_rss_mb:.0f} MB "
+            f"after page {page_num}, reopening the document"
+        )
+        self.pdf.close()
+        self.pdf = None
+        if not self._within_ceiling():
+            raise self._memory_error(self.pdf_path, page_num)
+        self.pdf = self._open(self.pdf_path)
+    
+    def close(self) -> None:
+        if self.pdf is not None:
+            self.pdf.close()
+            self.pdf = None
+
+class PdfminerReader(PDFDocumentReader):
+    """Text-only extraction straight through pdfminer.six.
+    
+    Skips pdfplumber's character objects and word clustering, so it is faster
+    and lighter on large documents, at the cost of font metadata (no page
+    object) and slightly different line grouping. Pages are interpreted one
+    at a time and only shared fonts are kept between them, so exceeding
+    max_rss_mb fails with PDFMemoryError straight away.
+    """
+    
+    name = 'pdfminer'
+    
+    def __init__(self, pdf_path: Path, max_rss_mb: Optional[float] = None):
+        from pdfminer.layout import LAParams
+        from pdfminer.pdfdocument import PDFDocument
+        from pdfminer.pdfinterp import PDFResourceManager
+        from pdfminer.pdfpage import PDFPage
+        from pdfminer.pdfparser import PDFParser
+        from pdfminer.pdftypes import resolve1
+        
+        self.pdf_path = Path(pdf_path)
+        self.max_rss_mb = max_rss_mb
+        self.file = open(pdf_path, 'rb')
+        try:
+            self.document = PDFDocument(PDFParser(self.file))
+            self.resources = PDFResourceManager(caching=True)
+            self.laparams = LAParams()
+            # The page tree's Count avoids walking every page just to size the document
+            try:
+                self.page_count = int(resolve1(resolve1(self.document.catalog['Pages'])['Count']))
+            except Exception:
+                self.page_count = sum(1 for _ in PDFPage.create_pages(self.document))
+        except Exception:
+            self.file.close()
+            raise
+    
+    def pages(self, first: int = 1, last: Optional[int] = None) -> Iterator[Tuple[int, str, Any]]:
+        from pdfminer.converter import TextConverter
+        from pdfminer.pdfinterp import PDFPageInterpreter
+        from pdfminer.pdfpage import PDFPage
+        
+        last = min(last or self.page_count, self.page_count)
+        for page_num, page in enumerate(PDFPage.create_pages(self.document), 1):
+            if page_num < first:
+                continue
+            if page_num > last:
+                break
+            output = io.StringIO()
+            device = TextConverter(self.resources, output, laparams=self.laparams)
+            try:
+                PDFPageInterpreter(self.resources, device).process_page(page)
+            finally:
+                device.close()
+            # pdfminer ends every page with a form feed
+            yield page_num, output.getvalue().replace('\x0c', '').strip(), None
+            if not self._within_ceiling():
+                raise self._memory_error(self.pdf_path, page_num)
+    
+    def close(self) -> None:
+        self.file.close()
+
+def open_pdf(backend: str, pdf_path: Path, max_rss_mb: Optional[float] = None) -> PDFDocumentReader:
+    """Open a PDF with the named backend."""
+    if backend == 'pdfplumber':
+        return PlumberReader(pdf_path, max_rss_mb=max_rss_mb)
+    if backend == 'pdfminer':
+        return PdfminerReader(pdf_path, max_rss_mb=max_rss_mb)
+    raise ValueError(f"Unknown PDF backend: {backend}")
@@ -0,0 +1,268 @@
+import hashlib
+import json
+import logging
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Tuple
+import numpy as np
+from .parallel import ParallelExtractor
+from .persona_parser import PersonaParser
+from .job_parser import JobParser
+from .embedder import EmbeddingGenerator
+from .ranker import DocumentRanker
+from .pipelined import PipelinedRunner
+from .dedup import DuplicateGroups, SectionDeduplicator
+from .lexical import LexicalIndex
+from .query_cache import QueryCache
+from .section_store import SectionStore
+from .profiler import Profiler, current_profiler
+
+class DocumentPipeline:
+    """Runs PDF extraction, persona/job parsing and ranking with long-lived components."""
+    
+    def __init__(self, pdf_extractor: ParallelExtractor,
+                 persona_parser: PersonaParser,
+                 job_parser: JobParser,
+                 embedding_generator: EmbeddingGenerator,
+                 ranker: Optional[DocumentRanker] = None,
+                 pipelined: bool = False,
+                 queue_size: int = 32,
+                 query_cache: Optional[QueryCache] = None,
+                 deduplicator: Optional[SectionDeduplicator] = None):
+        self.logger = logging.getLogger(__name__)
+        self.pdf_extractor = pdf_extractor
+        self.persona_parser = persona_parser
+        self.job_parser = job_parser
+        self.embedder = embedding_generator
+        self.ranker = ranker or DocumentRanker(embedding_generator)
+        self.pipelined = pipelined
+        self.queue_size = queue_size
+        self.query_cache = query_cache
+        self.deduplicator = deduplicator
+    
+    def parse_queries(self, persona_file: Path, job_file: Path) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """Parse the persona and job-to-be-done files."""
+        persona_data, job_data, _ = self._parse_queries(persona_file, job_file)
+        return persona_data, job_data
+    
+    def load_queries(self, query_files: List[Tuple[Path, Path]]
+                     ) -> Tuple[List[Tuple[Dict[str, Any], Dict[str, Any]]], List[Tuple[Optional[str], Optional[str]]]]:
+        """Parse (persona_file, job_file) pairs, returning them with their query cache keys.
+        
+        Parsing never needs the model, so callers can do it before waiting for one.
+        """
+        parsed = [self._parse_queries(persona_file, job_file) for persona_file, job_file in query_files]
+        return [(persona_data, job_data) for persona_data, job_data, _ in parsed], [keys for _, _, keys in parsed]
+    
+    def embed_queries(self, queries: List[Tuple[Dict[str, Any], Dict[str, Any]]],
+                      keys: List[Tuple[Optional[str], Optional[str]]]) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """Look up (persona, job) embeddings, a row per query, in the query cache.
+        
+        Misses are encoded in one call. Returns None without a query cache, leaving
+        the ranker to encode the queries itself.
+        """
+        if self.query_cache is None:
+            return None
+        
+        with current_profiler().stage('query_embedding', queries=len(queries)) as stats:
+            hits = self.query_cache.embedding_hits
+            embeddings = self.query_cache.embeddings(
+                [persona_key for persona_key, _ in keys] + [job_key for _, job_key in keys],
+                [self.embedder.build_persona_text(p) for p, _ in queries] +
+                [self.embedder.build_job_text(j) for _, j in queries],
+                self.embedder.encode_texts
+            )
+            stats.update(cached=self.query_cache.embedding_hits - hits)
+        return embeddings[:len(queries)], embeddings[len(queries):]
+    
+    def _parse_queries(self, persona_file: Path, job_file: Path
+                       ) -> Tuple[Dict[str, Any], Dict[str, Any], Tuple[Optional[str], Optional[str]]]:
+        """Parse both query files through the query cache, returning their cache keys too."""
+        profiler = current_profiler()
+        self.logger.info("Parsing persona...")
+        with profiler.stage('persona_parsing'):
+            persona_key, persona_data = self._parse('persona', persona_file, self.persona_parser.parse)
+        
+        self.logger.info("Parsing job to be done...")
+        with profiler.stage('jtbd_processing'):
+            job_key, job_data = self._parse('job', job_file, self.job_parser.parse)
+        return persona_data, job_data, (persona_key, job_key)
+    
+    def _parse(self, kind: str, path: Path, parser) -> Tuple[Optional[str], Dict[str, Any]]:
+        if self.query_cache is None:
+            return None, parser(path)
+        return self.query_cache.parse(kind, path, parser)
+    
+    def extract(self, pdf_files: List[Path]) -> SectionStore:
+        """Extract sections from all PDFs, skipping files that fail."""
+        self.logger.info("Extracting content from PDFs...")
+        with current_profiler().stage('pdf_extraction', documents=len(pdf_files)) as stats:
+            sections = self.pdf_extractor.extract_all(pdf_files)
+            stats.update(sections=len(sections), documents_extracted=len(sections.document_names))
+        self.logger.info(f"Extracted {len(sections)} sections from {len(pdf_files)} PDFs")
+        return sections
+    
+    def build_lexical_index(self, sections: SectionStore) -> Optional[LexicalIndex]:
+        """Index extracted sections for the ranker's BM25 pre-filter, if it is enabled."""
+        if not self.ranker.lexical_candidates:
+            return None
+        with current_profiler().stage('lexical_indexing', sections=len(sections)):
+            return LexicalIndex.from_sections(sections)
+    
+    def deduplicate(self, sections: SectionStore) -> Optional[DuplicateGroups]:
+        """Group exact and near-duplicate sections, if deduplication is enabled."""
+        if self.deduplicator is None:
+            return None
+        with current_profiler().stage('deduplication', sections=len(sections)) as stats:
+            duplicates = self.deduplicator.group(self.embedder.iter_section_texts(sections))
+            stats.update(unique=duplicates.unique_count)
+        self.logger.info(f"Found {duplicates.unique_count} distinct sections among {len(sections)}")
+        return duplicates
+    
+    def extract_and_embed(self, pdf_files: List[Path]) -> Tuple[SectionStore, np.ndarray]:
+        """Extract sections and encode them as pages arrive instead of in separate phases."""
+        self.logger.info("Extracting and embedding PDFs as pages arrive...")
+        runner = PipelinedRunner(self.pdf_extractor, self.embedder, queue_size=self.queue_size)
+        with current_profiler().stage('pdf_extraction', documents=len(pdf_files), pipelined=True) as stats:
+            sections, embeddings = runner.run(pdf_files)
+            stats.update(sections=len(sections), documents_extracted=len(sections.document_names))
+        return sections, embeddings
+    
+    def rank(self, sections: SectionStore,
+             persona_data: Dict[str, Any],
+             job_data: Dict[str, Any],
+             top_k: Optional[int] = None,
+             min_score: Optional[float] = None,
+             section_embeddings: Optional[np.ndarray] = None,
+             lexical_index: Optional[LexicalIndex] = None,
+             query_embeddings: Optional[Tuple[np.ndarray, np.ndarray]] = None,
+             duplicates: Optional[DuplicateGroups] = None,
+             corpus_key: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Rank extracted sections against the persona and job.
+        
+        query_embeddings may hold a row per query, as returned by load_queries;
+        corpus_key (from corpus_key()) lets the ranker reuse a saved vector index.
+        """
+        self.logger.info("Ranking sections based on persona and job relevance...")
+        if query_embeddings is not None:
+            query_embeddings = (query_embeddings[0][0], query_embeddings[1][0])
+        return self.ranker.rank_sections(
+            sections, persona_data, job_data, top_k=top_k, min_score=min_score,
+            section_embeddings=section_embeddings, lexical_index=lexical_index,
+            query_embeddings=query_embeddings, duplicates=duplicates, corpus_key=corpus_key
+        )
+    
+    def document_signatures(self, pdf_files: List[Path]) -> Dict[str, Tuple[int, int]]:
+        """(size, mtime_ns) of each PDF by file name; take them before extracting."""
+        signatures = {}
+        for pdf_file in pdf_files:
+            try:
+                stat = pdf_file.stat()
+            except OSError:
+                continue
+            signatures[pdf_file.name] = (stat.st_size, stat.st_mtime_ns)
+        return signatures
+    
+    def corpus_key(self, signatures: Dict[str, Tuple[int, int]], sections: SectionStore) -> Optional[str]:
+        """Identity of extracted sections and their embeddings, built without reading either.
+        
+        Covers the name and signature of every document that contributed
+        sections, the section count, and the extractor and encoder settings.
+        None when a contributing document has no signature.
+        """
+        if any(name not in signatures for name in sections.document_names):
+            return None
+        embedder = self.embedder
+        identity = json.dumps([
+            [[name, list(signatures[name])] for name in sections.document_names],
+            len(sections),
+            self.pdf_extractor.extractor.options(),
+            [embedder.model_name, embedder.backend, embedder.backend_options, embedder.dtype,
+             embedder.chunking, embedder.chunk_overlap]
+        ], sort_keys=True, default=str)
+        return hashlib.sha1(identity.encode('utf-8')).hexdigest()
+    
+    def run(self, persona_file: Path, job_file: Path, pdf_files: List[Path],
+            top_k: Optional[int] = None,
+            min_score: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Run the full pipeline for one persona/job and document set."""
+        queries, query_keys = self.load_queries([(persona_file, job_file)])
+        persona_data, job_data = queries[0]
+        
+        signatures = self.document_signatures(pdf_files)
+        section_embeddings = None
+        if self.pipelined:
+            sections, section_embeddings = self.extract_and_embed(pdf_files)
+        else:
+            sections = self.extract(pdf_files)
+        if not sections:
+            self.logger.error("No sections extracted from PDFs")
+            return []
+        
+        return self.rank(
+            sections, persona_data, job_data, top_k=top_k, min_score=min_score,
+            section_embeddings=section_embeddings, lexical_index=self.build_lexical_index(sections),
+            query_embeddings=self.embed_queries(queries, query_keys), duplicates=self.deduplicate(sections),
+            corpus_key=self.corpus_key(signatures, sections)
+        )
+    
+    def run_batch(self, query_files: List[Tuple[Path, Path]], pdf_files: List[Path],
+                  top_k: Optional[int] = None,
+                  min_score: Optional[float] = None) -> List[List[Dict[str, Any]]]:
+        """Rank one document set against many (persona_file, job_file) pairs."""
+        queries, query_keys = self.load_queries(query_files)
+        
+        sections = self.extract(pdf_files)
+        if not sections:
+            self.logger.error("No sections extracted from PDFs")
+            return [[] for _ in queries]
+        
+        self.logger.info(f"Ranking sections against {len(queries)} persona/job pairs...")
+        return self.ranker.rank_sections_batch(
+            sections, queries, top_k=top_k, min_score=min_score,
+            lexical_index=self.build_lexical_index(sections), query_embeddings=self.embed_queries(queries, query_keys),
+            duplicates=self.deduplicate(sections)
+        )
+    
+    def build_metadata(self, profiler: Profiler, ranked_sections: List[Dict[str, Any]],
+                       processing_time: float) -> Dict[str, Any]:
+        """Summarize a profiled run for the result metadata block."""
+        stages = profiler.summary()
+        extraction = stages.get('pdf_extraction', {})
+        scores = [section['relevance_score'] for section in ranked_sections]
+        
+        metadata = {
+            'total_documents_processed': extraction.get('documents_extracted', 0),
+            'total_sections_analyzed': extraction.get('sections', 0),
+            'total_sections_returned': len(ranked_sections),
+            'processing_time_seconds': round(processing_time, 3)
+        }
+        for name in ('persona_parsing', 'jtbd_processing', 'pdf_extraction',
+                     'embedding_generation', 'ranking_computation'):
+            metadata[f"{name}_time"] = round(stages.get(name, {}).get('wall_time', 0.0), 3)
+        if 'embedding_generation' not in stages and 'encode_batch' in stages:
+            # Pipelined runs encode inside extraction; report the time spent in encode batches
+            metadata['embedding_generation_time'] = round(stages['encode_batch']['wall_time'], 3)
+        metadata['average_relevance_score'] = round(sum(scores) / len(scores), 4) if scores else None
+        metadata['model_version'] = self.embedder.model_name
+        metadata['encoder_backend'] = self.embedder.backend
+        if self.embedder.backend_options.get('quantized'):
+            metadata['encoder_backend'] += '-int8'
+        metadata['peak_rss_mb'] = round(max(
+            (stage.get('peak_rss_mb', 0.0) for stage in stages.values()), default=0.0
+        ), 1)
+        metadata['stages'] = {
+            name: {key: round(value, 4) if isinstance(value, float) else value for key, value in stage.items()}
+            for name, stage in stages.items()
+        }
+        return metadata
+    
+    def close(self) -> None:
+        """Stop the sharded scorer's worker pool, if ranking started one."""
+        if self.ranker.scorer is not None:
+            self.ranker.scorer.close()
+    
+    def __enter__(self) -> 'DocumentPipeline':
+        return self
+    
+    def __exit__(self, *exc_info) -> None:
+        self.close()
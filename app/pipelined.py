@@ -0,0 +1,268 @@
+import contextvars
+import logging
+import queue
+import threading
+import time
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Tuple, Iterator, Callable
+import numpy as np
+from .embedder import EmbeddingGenerator
+from .parallel import ParallelExtractor, _extract_task, process_pool
+from .profiler import current_profiler
+from .section_store import SectionStore
+
+class PipelinedRunner:
+    """Overlaps PDF extraction with batched section encoding.
+    
+    Producers push extracted chunks (one page, or a page range when a process
+    pool is used) through a bounded queue; the consumer feeds them to
+    EmbeddingGenerator.embed_sections_stream, which encodes a batch as soon as
+    enough sections have arrived. At most queue_size chunks wait between the
+    two sides. Results are reordered into document/page order at the end, and
+    a document that fails contributes nothing.
+    """
+    
+    def __init__(self, pdf_extractor: ParallelExtractor,
+                 embedder: EmbeddingGenerator,
+                 queue_size: int = 32):
+        self.logger = logging.getLogger(__name__)
+        # Workers, timeout, page-range splitting and the cache pre-check are the parallel extractor's
+        self.parallel = pdf_extractor
+        self.extractor = pdf_extractor.extractor
+        self.embedder = embedder
+        self.workers = max(pdf_extractor.workers, 1)
+        self.queue_size = queue_size
+        self.timeout = pdf_extractor.timeout
+    
+    def run(self, pdf_files: List[Path]) -> Tuple[SectionStore, np.ndarray]:
+        """Extract and embed all PDFs, returning sections and their embeddings in document order."""
+        # The semaphore bounds queued chunks; the queue itself never blocks producers
+        messages = queue.Queue()
+        slots = threading.BoundedSemaphore(self.queue_size)
+        stop = threading.Event()
+        split_documents = {}
+        
+        # Producer threads report into the caller's profiler
+        context = contextvars.copy_context()
+        if self.workers > 1:
+            target = self._produce_with_pool
+        else:
+            target = self._produce_in_thread
+        producer = threading.Thread(
+            target=context.run, args=(target, pdf_files, messages, slots, stop, split_documents),
+            name="pdf-producer", daemon=True
+        )
+        producer.start()
+        
+        chunks = {}
+        failed = set()
+        arrived = []
+        try:
+            embeddings = self.embedder.embed_sections_stream(
+                self._consume(pdf_files, messages, slots, chunks, failed, arrived)
+            )
+        finally:
+            stop.set()
+            producer.join()
+        
+        return self._reorder(pdf_files, chunks, failed, arrived, embeddings, split_documents)
+    
+    def _consume(self, pdf_files: List[Path], messages: queue.Queue, slots: threading.BoundedSemaphore,
+                 chunks: Dict[Tuple[int, int], int], failed: set,
+                 arrived: List[SectionStore]) -> Iterator[Dict[str, Any]]:
+        """Yield sections as chunks arrive, recording where each chunk landed.
+        
+        With a pool, as in ParallelExtractor, the oldest unfinished document
+        gets timeout seconds once it becomes the oldest; past that it is
+        dropped and later documents carry on. In-process extraction cannot
+        skip a stuck document, so there the timeout is for any progress at all.
+        """
+        finished = set()
+        oldest = 0
+        deadline = self._deadline()
+        while len(finished) < len(pdf_files):
+            if self.workers > 1 and oldest in finished:
+                while oldest in finished:
+                    oldest += 1
+                deadline = self._deadline()
+            
+            try:
+                remaining = None if deadline is None else max(deadline - time.monotonic(), 0)
+                kind, doc_index, seq, payload = messages.get(timeout=remaining)
+            except queue.Empty:
+                if self.workers > 1:
+                    self.logger.warning(
+                        f"Failed to process {pdf_files[oldest].name}: timed out after {self.timeout}s"
+                    )
+                    failed.add(oldest)
+                    finished.add(oldest)
+                    continue
+                self.logger.warning(f"No extraction progress for {self.timeout}s, giving up on remaining documents")
+                failed.update(i for i in range(len(pdf_files)) if i not in finished)
+                return
+            if self.workers <= 1:
+                deadline = self._deadline()
+            
+            if kind == 'chunk':
+                slots.release()
+                if doc_index in finished:
+                    # Arrived after its document timed out
+                    continue
+                chunks[(doc_index, seq)] = len(arrived)
+                arrived.append(payload)
+                for i in range(len(payload)):
+                    yield payload[i]
+            elif kind == 'failed':
+                slots.release()
+                if doc_index not in failed:
+                    failed.add(doc_index)
+                    self.logger.warning(f"Failed to process {pdf_files[doc_index].name}: {payload}")
+            else:
+                finished.add(doc_index)
+    
+    def _deadline(self) -> Optional[float]:
+        return time.monotonic() + self.timeout if self.timeout else None
+    
+    def _produce_in_thread(self, pdf_files: List[Path], messages: queue.Queue,
+                           slots: threading.BoundedSemaphore, stop: threading.Event,
+                           split_documents: Dict[int, int]) -> None:
+        """Stream pages from each PDF in turn."""
+        cache = self.extractor.cache
+        for doc_index, pdf_file in enumerate(pdf_files):
+            self.logger.info(f"Processing {pdf_file.name}...")
+            try:
+                cached = cache.get(pdf_file) if cache else None
+                if cached is not None:
+                    if not self._put(messages, slots, stop, 'chunk', doc_index, 0, SectionStore.from_dicts(cached)):
+                        return
+                else:
+                    document = []
+                    pages = 0
+                    for page_num, page_sections in self.extractor.iter_page_sections(pdf_file):
+                        pages += 1
+                        if not page_sections:
+                            continue
+                        chunk = SectionStore()
+                        for title, section_text in page_sections:
+                            chunk.append(pdf_file.name, page_num, section_text, title)
+                        if not self._put(messages, slots, stop, 'chunk', doc_index, page_num, chunk):
+                            return
+                        if cache:
+                            document.extend(chunk.to_dicts())
+                    if cache:
+                        cache.put(pdf_file, document, pages)
+            except Exception as e:
+                if not self._put(messages, slots, stop, 'failed', doc_index, None, e):
+                    return
+            messages.put(('done', doc_index, None, None))
+    
+    def _produce_with_pool(self, pdf_files: List[Path], messages: queue.Queue,
+                           slots: threading.BoundedSemaphore, stop: threading.Event,
+                           split_documents: Dict[int, int]) -> None:
+        """Extract page-range chunks in worker processes, submitting only as queue slots free up."""
+        cache = self.extractor.cache
+        profiler = current_profiler()
+        doc_indices = {pdf_file: doc_index for doc_index, pdf_file in enumerate(pdf_files)}
+        cached = self.parallel._cached_documents(pdf_files)
+        for pdf_file, sections in cached.items():
+            doc_index = doc_indices[pdf_file]
+            if not self._put(messages, slots, stop, 'chunk', doc_index, 0, SectionStore.from_dicts(sections)):
+                return
+            messages.put(('done', doc_index, None, None))
+        
+        tasks = []
+        for pdf_file, ranges, page_count in self.parallel._plan_tasks(
+                [pdf_file for pdf_file in pdf_files if pdf_file not in cached]):
+            if len(ranges) > 1:
+                # Workers only cache whole documents, so split ones are stored after reordering
+                split_documents[doc_indices[pdf_file]] = page_count
+            tasks.append((doc_indices[pdf_file], pdf_file, ranges))
+        
+        # A document is done once its last task has reported, whatever the others are doing
+        outstanding = {doc_index: len(ranges) for doc_index, _, ranges in tasks}
+        outstanding_lock = threading.Lock()
+        
+        def task_finished(doc_index: int) -> None:
+            with outstanding_lock:
+                outstanding[doc_index] -= 1
+                done = outstanding[doc_index] == 0
+            if done:
+                messages.put(('done', doc_index, None, None))
+        
+        # Leaving the pool terminates workers, so hung tasks cannot block shutdown
+        with process_pool(self.workers) as pool:
+            for doc_index, pdf_file, ranges in tasks:
+                self.logger.info(f"Processing {pdf_file.name}...")
+                for page_range in ranges:
+                    if not self._acquire(slots, stop):
+                        return
+                    pool.apply_async(
+                        _extract_task,
+                        (str(pdf_file), page_range, cache, profiler.enabled, self.extractor.options()),
+                        callback=self._chunk_callback(messages, profiler, doc_index, page_range, task_finished),
+                        error_callback=self._error_callback(messages, doc_index, task_finished)
+                    )
+            
+            # Keep the pool alive until the consumer has stopped reading
+            stop.wait()
+    
+    def _chunk_callback(self, messages: queue.Queue, profiler, doc_index: int,
+                        page_range: Optional[Tuple[int, int]], task_finished: Callable[[int], None]):
+        def callback(result):
+            store, events = result
+            profiler.merge(events)
+            messages.put(('chunk', doc_index, page_range[0] if page_range else 0, store))
+            task_finished(doc_index)
+        return callback
+    
+    def _error_callback(self, messages: queue.Queue, doc_index: int, task_finished: Callable[[int], None]):
+        def callback(error):
+            messages.put(('failed', doc_index, None, error))
+            task_finished(doc_index)
+        return callback
+    
+    def _acquire(self, slots: threading.BoundedSemaphore, stop: threading.Event) -> bool:
+        """Wait for a free queue slot; False once the consumer has stopped."""
+        while not slots.acquire(timeout=0.1):
+            if stop.is_set():
+                return False
+        return True
+    
+    def _put(self, messages: queue.Queue, slots: threading.BoundedSemaphore, stop: threading.Event,
+             kind: str, doc_index: int, seq: Optional[int], payload: Any) -> bool:
+        """Block until the consumer has room for another chunk; False once it has stopped."""
+        if not self._acquire(slots, stop):
+            return False
+        messages.put((kind, doc_index, seq, payload))
+        return True
+    
+    def _reorder(self, pdf_files: List[Path], chunks: Dict[Tuple[int, int], int], failed: set,
+                 arrived: List[SectionStore], embeddings: np.ndarray,
+                 split_documents: Dict[int, int]) -> Tuple[SectionStore, np.ndarray]:
+        """Put sections from successful documents back into document/page order."""
+        cache = self.extractor.cache
+        offsets = np.cumsum([0] + [len(chunk) for chunk in arrived])
+        sections = SectionStore()
+        rows = []
+        doc_ranges = {}
+        for key in sorted(chunks):
+            if key[0] in failed:
+                continue
+            position = chunks[key]
+            start = doc_ranges.get(key[0], (len(sections),))[0]
+            sections.extend_store(arrived[position])
+            rows.extend(range(offsets[position], offsets[position + 1]))
+            doc_ranges[key[0]] = (start, len(sections))
+        
+        if cache and not cache.per_page:
+            for doc_index, page_count in split_documents.items():
+                if doc_index in doc_ranges:
+                    cache.put(pdf_files[doc_index], sections.to_dicts(range(*doc_ranges[doc_index])), page_count)
+        
+        self.logger.info(
+            f"Extracted {len(sections)} sections from "
+            f"{len(pdf_files) - len(failed)} of {len(pdf_files)} PDFs while encoding"
+        )
+        if not rows:
+            return sections, embeddings[:0]
+        return sections, embeddings[np.asarray(rows)]
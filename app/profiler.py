@@ -0,0 +1,197 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import List, Dict, Any, Optional
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - not available on Windows
+    resource = None
+
+def get_rss_mb() -> float:
+    """Current resident set size of this process in MB."""
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        return get_peak_rss_mb()
+
+def get_peak_rss_mb() -> float:
+    """Peak resident set size of this process in MB."""
+    if resource is None:
+        return 0.0
+    # ru_maxrss is KB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+class Profiler:
+    """Records wall/CPU time, memory and counters for pipeline stages.
+    
+    Components report through current_profiler(), so one profiler can be
+    activated per run (or per request) without threading it through every
+    constructor. A disabled profiler makes every call a no-op. While stages
+    are open a background thread samples RSS, so each stage reports the peak
+    reached during it rather than the process's lifetime peak.
+    """
+    
+    # Seconds between RSS samples while any stage is open
+    RSS_SAMPLE_INTERVAL = 0.01
+    
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.events: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._start = time.time()
+        # One single-element [peak MB] list per open stage
+        self._open_peaks: List[List[float]] = []
+        self._sampler: Optional[threading.Thread] = None
+    
+    @contextmanager
+    def activate(self):
+        """Make this the profiler returned by current_profiler() in this context."""
+        token = _current.set(self)
+        try:
+            yield self
+        finally:
+            _current.reset(token)
+    
+    @contextmanager
+    def stage(self, name: str, category: str = 'stage', **args):
+        """Time a block; the yielded dict collects counters for it."""
+        if not self.enabled:
+            yield {}
+            return
+        
+        counters = dict(args)
+        start = time.time()
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        peak = self._track_peak() if category in ('stage', 'document') else None
+        try:
+            yield counters
+        finally:
+            if peak is not None:
+                self._untrack_peak(peak)
+            self.record(
+                name,
+                wall=time.perf_counter() - wall_start,
+                cpu=time.process_time() - cpu_start,
+                start=start,
+                category=category,
+                peak_rss_mb=peak[0] if peak is not None else None,
+                **counters
+            )
+    
+    def record(self, name: str, wall: float, cpu: Optional[float] = None,
+               start: Optional[float] = None, category: str = 'stage',
+               peak_rss_mb: Optional[float] = None, **args) -> None:
+        """Add an event measured elsewhere (e.g. in a worker process).
+        
+        peak_rss_mb is the highest RSS seen while the event ran, when it was sampled.
+        """
+        if not self.enabled:
+            return
+        event = {
+            'name': name,
+            'category': category,
+            'start': start if start is not None else time.time() - wall,
+            'wall': wall,
+            'cpu': cpu,
+            'pid': os.getpid(),
+            'tid': threading.get_ident(),
+            'args': args
+        }
+        if category in ('stage', 'document'):
+            event['rss_mb'] = get_rss_mb()
+            if peak_rss_mb is not None:
+                event['peak_rss_mb'] = max(peak_rss_mb, event['rss_mb'])
+        with self._lock:
+            self.events.append(event)
+    
+    def _track_peak(self) -> List[float]:
+        """Start following the RSS peak of a stage, starting the sampler if it is idle."""
+        peak = [get_rss_mb()]
+        with self._lock:
+            self._open_peaks.append(peak)
+            if self._sampler is None:
+                self._sampler = threading.Thread(target=self._sample_rss, name="rss-sampler", daemon=True)
+                self._sampler.start()
+        return peak
+    
+    def _untrack_peak(self, peak: List[float]) -> None:
+        with self._lock:
+            self._open_peaks = [open_peak for open_peak in self._open_peaks if open_peak is not peak]
+    
+    def _sample_rss(self) -> None:
+        """Raise the peak of every open stage to the current RSS until none are open."""
+        while True:
+            time.sleep(self.RSS_SAMPLE_INTERVAL)
+            rss = get_rss_mb()
+            with self._lock:
+                if not self._open_peaks:
+                    self._sampler = None
+                    return
+                for peak in self._open_peaks:
+                    peak[0] = max(peak[0], rss)
+    
+    def merge(self, events: List[Dict[str, Any]]) -> None:
+        """Add events collected by another profiler."""
+        if self.enabled and events:
+            with self._lock:
+                self.events.extend(events)
+    
+    def summary(self) -> Dict[str, Any]:
+        """Aggregate events by name: counts, time totals, summed counters and rates."""
+        summary = {}
+        with self._lock:
+            events = list(self.events)
+        
+        for event in events:
+            entry = summary.setdefault(event['name'], {'count': 0, 'wall_time': 0.0, 'cpu_time': 0.0})
+            entry['count'] += 1
+            entry['wall_time'] += event['wall']
+            entry['cpu_time'] += event['cpu'] or 0.0
+            if 'peak_rss_mb' in event:
+                entry['peak_rss_mb'] = max(entry.get('peak_rss_mb', 0.0), event['peak_rss_mb'])
+            for key, value in event['args'].items():
+                # Page numbers identify an event rather than count anything
+                if key != 'page' and isinstance(value, (int, float)) and not isinstance(value, bool):
+                    entry[key] = entry.get(key, 0) + value
+        
+        for entry in summary.values():
+            for key in ('documents', 'pages', 'sections', 'texts', 'tokens'):
+                if key in entry and entry['wall_time'] > 0:
+                    entry[f"{key}_per_sec"] = entry[key] / entry['wall_time']
+            # Encode cost scales with tokens, not sections
+            if entry.get('tokens'):
+                entry['us_per_token'] = entry['wall_time'] * 1e6 / entry['tokens']
+        return summary
+    
+    def write_chrome_trace(self, path: Path) -> None:
+        """Write events in Chrome trace format (chrome://tracing, Perfetto)."""
+        with self._lock:
+            events = list(self.events)
+        trace_events = [
+            {
+                'name': event['name'],
+                'cat': event['category'],
+                'ph': 'X',
+                'ts': (event['start'] - self._start) * 1e6,
+                'dur': event['wall'] * 1e6,
+                'pid': event['pid'],
+                'tid': event['tid'],
+                'args': dict(event['args'], cpu_time=event['cpu'])
+            }
+            for event in events
+        ]
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': trace_events, 'displayTimeUnit': 'ms'}, f)
+
+_current: ContextVar[Profiler] = ContextVar('profiler', default=Profiler(enabled=False))
+
+def current_profiler() -> Profiler:
+    """Profiler active in the current context (a disabled one by default)."""
+    return _current.get()
@@ -0,0 +1,175 @@
+import copy
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Tuple, Callable
+import numpy as np
+
+class QueryCache:
+    """Parsed persona/job files and their query embeddings, keyed by normalized file content.
+    
+    Entries are kept in an in-memory LRU, so a long-lived process (the HTTP
+    service) parses and encodes each distinct query once, and, with a
+    cache_dir, as one JSON file per parsed query plus one .npy per query and
+    model, so CLI runs share them. Embeddings live under a directory per model,
+    so switching models re-encodes but still reuses the parsed data.
+    """
+    
+    # Bump when the persona or job parser output changes
+    PARSER_VERSION = 1
+    
+    def __init__(self, cache_dir: Optional[Path], model_name: str, max_entries: int = 256):
+        self.logger = logging.getLogger(__name__)
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.cache_dir = Path(cache_dir) if cache_dir is not None else None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.embedding_hits = 0
+    
+    def make_key(self, kind: str, path: Path) -> str:
+        """Hash the file content after normalizing away differences the parsers ignore.
+        
+        Line endings are unified like text-mode reads do, and JSON files are
+        re-serialized (keeping key order, which the parsers depend on) so
+        formatting-only edits still hit.
+        """
+        content = Path(path).read_bytes().decode('utf-8')
+        content = content.replace('\r\n', '\n').replace('\r', '\n')
+        if Path(path).suffix == '.json':
+            content = json.dumps(json.loads(content), separators=(',', ':'), ensure_ascii=False)
+        
+        digest = hashlib.sha256()
+        digest.update(f"{kind}\0{Path(path).suffix}\0{self.PARSER_VERSION}\0".encode('utf-8'))
+        digest.update(content.encode('utf-8'))
+        return digest.hexdigest()
+    
+    def parse(self, kind: str, path: Path, parser: Callable[[Path], Dict[str, Any]]) -> Tuple[str, Dict[str, Any]]:
+        """Return (key, parsed) for a query file, running parser only on a miss."""
+        key = self.make_key(kind, path)
+        entry = self._get_entry(key)
+        if entry is None:
+            entry = self._load_entry(key)
+        if entry is None:
+            self.misses += 1
+            parsed = parser(path)
+            entry = {'parsed': parsed, 'keywords': sorted({str(kw).lower() for kw in parsed.get('keywords', [])}),
+                     'embeddings': {}}
+            self._save_entry(key, entry)
+        else:
+            self.hits += 1
+        self._put_entry(key, entry)
+        # Callers may modify what they get back
+        return key, copy.deepcopy(entry['parsed'])
+    
+    def keywords(self, key: str) -> List[str]:
+        """Lowercased, de-duplicated keywords of a parsed query."""
+        entry = self._get_entry(key) or self._load_entry(key)
+        return list(entry['keywords']) if entry else []
+    
+    def embeddings(self, keys: List[str], texts: List[str],
+                   encode: Callable[[List[str]], np.ndarray]) -> np.ndarray:
+        """Embeddings of the parsed queries under the current model, encoding misses in one call."""
+        found = {}
+        for position, key in enumerate(keys):
+            embedding = self._get_embedding(key)
+            if embedding is not None:
+                found[position] = embedding
+        self.embedding_hits += len(found)
+        
+        missing = [position for position in range(len(keys)) if position not in found]
+        if missing:
+            encoded = np.asarray(encode([texts[position] for position in missing]), dtype=np.float32)
+            for position, embedding in zip(missing, encoded):
+                found[position] = embedding
+                self._store_embedding(keys[position], embedding)
+        
+        return np.stack([found[position] for position in range(len(keys))])
+    
+    def _get_embedding(self, key: str) -> Optional[np.ndarray]:
+        entry = self._get_entry(key)
+        if entry is not None and self.model_name in entry['embeddings']:
+            return entry['embeddings'][self.model_name]
+        
+        path = self._embedding_path(key)
+        if path is None or not path.exists():
+            return None
+        try:
+            embedding = np.load(path)
+        except Exception as e:
+            self.logger.warning(f"Ignoring unreadable query embedding {path}: {e}")
+            return None
+        if entry is not None:
+            entry['embeddings'][self.model_name] = embedding
+        return embedding
+    
+    def _store_embedding(self, key: str, embedding: np.ndarray) -> None:
+        entry = self._get_entry(key)
+        if entry is not None:
+            entry['embeddings'][self.model_name] = embedding
+        
+        path = self._embedding_path(key)
+        if path is None:
+            return
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(f".tmp.{os.getpid()}.{threading.get_ident()}")
+        with open(tmp_path, 'wb') as f:
+            np.save(f, embedding)
+        os.replace(tmp_path, path)
+    
+    def _get_entry(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+    
+    def _put_entry(self, key: str, entry: Dict[str, Any]) -> None:
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def _load_entry(self, key: str) -> Optional[Dict[str, Any]]:
+        """Read a parsed query from disk, if this cache has a directory and the entry is valid."""
+        if self.cache_dir is None:
+            return None
+        path = self.cache_dir / "parsed" / f"{key}.json"
+        if not path.exists():
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                stored = json.load(f)
+        except Exception as e:
+            self.logger.warning(f"Ignoring unreadable query cache entry {path}: {e}")
+            return None
+        return {'parsed': stored['parsed'], 'keywords': stored['keywords'], 'embeddings': {}}
+    
+    def _save_entry(self, key: str, entry: Dict[str, Any]) -> None:
+        """Atomically write a parsed query to disk."""
+        if self.cache_dir is None:
+            return
+        path = self.cache_dir / "parsed" / f"{key}.json"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(f".tmp.{os.getpid()}.{threading.get_ident()}")
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'parsed': entry['parsed'], 'keywords': entry['keywords']}, f)
+            os.replace(tmp_path, path)
+        except (TypeError, ValueError) as e:
+            # Parsed data that is not JSON-serializable stays in memory only
+            self.logger.warning(f"Not persisting query cache entry {key[:12]}: {e}")
+            tmp_path.unlink(missing_ok=True)
+    
+    def _embedding_path(self, key: str) -> Optional[Path]:
+        if self.cache_dir is None:
+            return None
+        return self.cache_dir / "embeddings" / re.sub(r'[^\w.-]', '_', self.model_name) / f"{key}.npy"
@@ -1,79 +1,387 @@
+import hashlib
 import logging
 import numpy as np
-from typing import List, Dict, Any, Tuple
+from pathlib import Path
+from typing import List, Dict, Any, Tuple, Optional, Union
+from .dedup import DuplicateGroups
 from .embedder import EmbeddingGenerator
+from .keyword_matcher import ReasoningMatcher
+from .lexical import LexicalIndex, tokenize
+from .section_store import SectionStore
+from .sharded_scoring import ShardedScorer, select_top
+from .profiler import current_profiler
+from .vector_index import VectorIndex, create_index, load_index
 
 class DocumentRanker:
     """Ranks document sections based on persona and job relevance."""
     
-    def __init__(self, embedding_generator: EmbeddingGenerator):
+    def __init__(self, embedding_generator: EmbeddingGenerator,
+                 persona_weight: float = 0.4,
+                 job_weight: float = 0.6,
+                 index_type: Optional[str] = None,
+                 index_params: Optional[Dict[str, Any]] = None,
+                 index_dir: Optional[Path] = None,
+                 candidate_factor: int = 4,
+                 lexical_candidates: Optional[int] = None,
+                 collapse_duplicates: bool = False,
+                 scorer: Optional[ShardedScorer] = None):
         self.logger = logging.getLogger(__name__)
         self.embedder = embedding_generator
-        
-    def rank_sections(self, sections: List[Dict[str, Any]], 
+        self.persona_weight = persona_weight
+        self.job_weight = job_weight
+        self.index_type = index_type
+        self.index_params = index_params or {}
+        self.index_dir = index_dir
+        self.candidate_factor = candidate_factor
+        self.lexical_candidates = lexical_candidates
+        self.collapse_duplicates = collapse_duplicates
+        self.scorer = scorer
+        self._index = None
+        self._index_source = None
+    
+    def rank_sections(self, sections: Union[SectionStore, List[Dict[str, Any]]], 
                      persona_data: Dict[str, Any], 
-                     job_data: Dict[str, Any]) -> List[Dict[str, Any]]:
-        """Rank sections based on relevance to persona and job."""
+                     job_data: Dict[str, Any],
+                     top_k: Optional[int] = None,
+                     min_score: Optional[float] = None,
+                     section_embeddings: Optional[np.ndarray] = None,
+                     lexical_index: Optional[LexicalIndex] = None,
+                     query_embeddings: Optional[Tuple[np.ndarray, np.ndarray]] = None,
+                     duplicates: Optional[DuplicateGroups] = None,
+                     corpus_key: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Rank sections based on relevance to persona and job.
+        
+        top_k and min_score limit the output; only selected sections are materialized.
+        Precomputed section_embeddings (row per section) skip section encoding, and
+        precomputed (persona, job) query_embeddings skip query encoding.
+        With lexical_candidates set, only the best BM25 matches for the persona and
+        job keywords are embedded and scored. With duplicates, one section per group
+        is encoded and shares its embedding with the rest of the group; with
+        collapse_duplicates only representatives are ranked, listing the other
+        locations of their content. corpus_key identifies sections and their
+        embeddings (see DocumentPipeline.corpus_key) so a saved vector index
+        can be reused; without it the index lives only as long as the array.
+        """
         
         if not sections:
             return []
         
         self.logger.info("Generating embeddings...")
+        profiler = current_profiler()
         
         # Generate embeddings
-        persona_embedding = self.embedder.generate_persona_embedding(persona_data)
-        job_embedding = self.embedder.generate_job_embedding(job_data)
-        section_embeddings = self.embedder.generate_section_embeddings(sections)
+        if query_embeddings is not None:
+            persona_embedding, job_embedding = query_embeddings
+        else:
+            with profiler.stage('query_embedding'):
+                persona_embedding = self.embedder.generate_persona_embedding(persona_data)
+                job_embedding = self.embedder.generate_job_embedding(job_data)
+        # Row i of section_embeddings belongs to section row_ids[i] (or i when None)
+        row_ids = self._lexical_candidates(sections, lexical_index, [(persona_data, job_data)], top_k)
+        row_ids = self._collapse_rows(row_ids, duplicates)
+        if section_embeddings is None:
+            section_embeddings = self._embed_rows(sections, row_ids, duplicates)
+        elif row_ids is not None:
+            section_embeddings = section_embeddings[row_ids]
         
         self.logger.info("Computing relevance scores...")
         
-        # Compute scores and generate explanations
-        scored_sections = []
-        for i, section in enumerate(sections):
-            section_embedding = section_embeddings[i]
-            
-            # Compute individual similarities
-            persona_sim = self.embedder.compute_similarity(section_embedding, persona_embedding)
-            job_sim = self.embedder.compute_similarity(section_embedding, job_embedding)
-            
-            # Compute combined score
-            relevance_score = self.embedder.compute_combined_similarity(
-                section_embedding, persona_embedding, job_embedding
+        with profiler.stage('ranking_computation') as stats:
+            # With an index and a top_k, only sections near either query are scored
+            candidates = self._search_candidates(
+                section_embeddings, persona_embedding, job_embedding, top_k,
+                self._subset_key(corpus_key, row_ids)
             )
+            if candidates is not None:
+                section_embeddings = section_embeddings[candidates]
+                row_ids = candidates if row_ids is None else row_ids[candidates]
             
-            # Generate reasoning
-            reasoning = self._generate_reasoning(
-                section, persona_data, job_data, persona_sim, job_sim, relevance_score
-            )
+            if self.scorer is not None and self.scorer.should_shard(len(section_embeddings)):
+                # Worker processes score shards of a shared matrix and return their local winners
+                selected, scores = self.scorer.select(
+                    section_embeddings, persona_embedding, job_embedding,
+                    persona_weight=self.persona_weight, job_weight=self.job_weight,
+                    top_k=top_k, min_score=min_score
+                )
+                stats.update(shards=self.scorer.workers)
+            else:
+                # Score every section in one batched pass
+                scores = self.embedder.compute_section_scores(
+                    section_embeddings, persona_embedding, job_embedding,
+                    persona_weight=self.persona_weight, job_weight=self.job_weight
+                )
+                
+                # Pick winners before building any output
+                selected = self._select_top_indices(scores['combined'], top_k, min_score)
+                scores = {name: values[selected] for name, values in scores.items()}
             
-            # Create scored section
-            scored_section = {
-                'document_name': section['document_name'],
-                'page_number': section['page_number'],
-                'section_text': section['section_text'][:1000] + '...' if len(section['section_text']) > 1000 else section['section_text'],
-                'relevance_score': float(relevance_score),
-                'reasoning': reasoning,
-                'section_title': section.get('section_title', ''),
-                'context_summary': section.get('context_summary', '')
-            }
+            matcher = self._reasoning_matcher(persona_data, job_data)
+            scored_sections = [
+                self._build_scored_section(
+                    sections[i if row_ids is None else row_ids[i]], persona_data, job_data,
+                    scores['persona'][n], scores['job'][n], scores['combined'][n], matcher
+                )
+                for n, i in enumerate(selected)
+            ]
+            self._add_duplicate_locations(
+                scored_sections, sections, duplicates, selected if row_ids is None else row_ids[selected]
+            )
+            stats.update(sections=len(section_embeddings), selected=len(scored_sections))
+        
+        self.logger.info(f"Ranked {len(sections)} sections, kept {len(scored_sections)}")
+        
+        return scored_sections
+    
+    def rank_sections_batch(self, sections: Union[SectionStore, List[Dict[str, Any]]],
+                            queries: List[Tuple[Dict[str, Any], Dict[str, Any]]],
+                            top_k: Optional[int] = None,
+                            min_score: Optional[float] = None,
+                            query_chunk_size: int = 64,
+                            lexical_index: Optional[LexicalIndex] = None,
+                            query_embeddings: Optional[Tuple[np.ndarray, np.ndarray]] = None,
+                            duplicates: Optional[DuplicateGroups] = None) -> List[List[Dict[str, Any]]]:
+        """Rank the same sections against many (persona_data, job_data) pairs.
+        
+        Sections are embedded once, all queries share one encode call (skipped when
+        (persona, job) query_embeddings with a row per query are given), and scores
+        come from one (sections x queries) product per chunk of queries. With
+        lexical_candidates set, the union of every query's BM25 pool is embedded.
+        duplicates are handled as in rank_sections.
+        """
+        if not sections or not queries:
+            return [[] for _ in queries]
+        
+        # Row i of section_embeddings belongs to section row_ids[i] (or i when None)
+        row_ids = self._lexical_candidates(sections, lexical_index, queries, top_k)
+        row_ids = self._collapse_rows(row_ids, duplicates)
+        row_count = len(sections) if row_ids is None else len(row_ids)
+        
+        self.logger.info(f"Generating embeddings for {row_count} sections and {len(queries)} queries...")
+        profiler = current_profiler()
+        section_embeddings = self._embed_rows(sections, row_ids, duplicates)
+        if query_embeddings is not None:
+            persona_embeddings, job_embeddings = query_embeddings
+        else:
+            with profiler.stage('query_embedding', queries=len(queries)):
+                persona_embeddings, job_embeddings = self.embedder.generate_query_embeddings(
+                    [persona_data for persona_data, _ in queries],
+                    [job_data for _, job_data in queries]
+                )
+        
+        self.logger.info("Computing relevance scores...")
+        results = []
+        with profiler.stage('ranking_computation', sections=row_count, queries=len(queries)):
+            sections_normed = self.embedder.normalize_embeddings(section_embeddings)
+            for start in range(0, len(queries), query_chunk_size):
+                end = min(start + query_chunk_size, len(queries))
+                # Columns are [persona_start..persona_end, job_start..job_end]
+                query_matrix = self.embedder.normalize_embeddings(
+                    np.concatenate([persona_embeddings[start:end], job_embeddings[start:end]])
+                )
+                similarities = sections_normed @ query_matrix.T
+                persona_scores = similarities[:, :end - start]
+                job_scores = similarities[:, end - start:]
+                combined_scores = self.persona_weight * persona_scores + self.job_weight * job_scores
+                
+                for column, (persona_data, job_data) in enumerate(queries[start:end]):
+                    selected = self._select_top_indices(combined_scores[:, column], top_k, min_score)
+                    matcher = self._reasoning_matcher(persona_data, job_data)
+                    scored_sections = [
+                        self._build_scored_section(
+                            sections[i if row_ids is None else row_ids[i]], persona_data, job_data,
+                            persona_scores[i, column], job_scores[i, column], combined_scores[i, column], matcher
+                        )
+                        for i in selected
+                    ]
+                    self._add_duplicate_locations(
+                        scored_sections, sections, duplicates, selected if row_ids is None else row_ids[selected]
+                    )
+                    results.append(scored_sections)
+        
+        self.logger.info(f"Ranked {row_count} sections against {len(queries)} queries")
+        return results
+    
+    def _lexical_candidates(self, sections: Union[SectionStore, List[Dict[str, Any]]],
+                            lexical_index: Optional[LexicalIndex],
+                            queries: List[Tuple[Dict[str, Any], Dict[str, Any]]],
+                            top_k: Optional[int]) -> Optional[np.ndarray]:
+        """Sorted ids of the BM25 candidate pool over all queries; None means score all.
+        
+        Falls back to full scoring when any query matches fewer sections than it needs.
+        """
+        pool = self.lexical_candidates
+        if not pool or pool >= len(sections):
+            return None
+        
+        if lexical_index is None or len(lexical_index) != len(sections):
+            with current_profiler().stage('lexical_indexing', sections=len(sections)):
+                lexical_index = LexicalIndex.from_sections(sections)
+        
+        needed = min(top_k, pool) if top_k else 1
+        pools = []
+        for persona_data, job_data in queries:
+            ids, _ = lexical_index.search(self._query_terms(persona_data, job_data), pool)
+            if len(ids) < needed:
+                self.logger.info(f"Lexical pre-filter matched {len(ids)} sections, scoring all {len(sections)}")
+                return None
+            pools.append(ids)
+        
+        candidates = np.unique(np.concatenate(pools))
+        self.logger.info(f"Lexical pre-filter selected {len(candidates)} of {len(sections)} sections")
+        return candidates
+    
+    def _collapse_rows(self, row_ids: Optional[np.ndarray],
+                       duplicates: Optional[DuplicateGroups]) -> Optional[np.ndarray]:
+        """When collapsing duplicates, replace the rows to rank by their group representatives."""
+        if duplicates is None or not self.collapse_duplicates:
+            return row_ids
+        if row_ids is None:
+            return duplicates.representatives
+        return np.unique(duplicates.labels[row_ids])
+    
+    def _embed_rows(self, sections: Union[SectionStore, List[Dict[str, Any]]],
+                    row_ids: Optional[np.ndarray],
+                    duplicates: Optional[DuplicateGroups]) -> np.ndarray:
+        """Embed the given rows (all when None), encoding each duplicate group only once."""
+        rows = np.arange(len(sections)) if row_ids is None else row_ids
+        with current_profiler().stage('embedding_generation', sections=len(rows)) as stats:
+            if duplicates is None:
+                return self.embedder.generate_section_embeddings(
+                    sections if row_ids is None else self._subset(sections, row_ids)
+                )
             
-            scored_sections.append(scored_section)
+            # Fan each representative's embedding back out to its duplicates
+            representatives, inverse = np.unique(duplicates.labels[rows], return_inverse=True)
+            stats.update(encoded=len(representatives))
+            self.logger.info(f"Encoding {len(representatives)} distinct sections for {len(rows)} ranked rows")
+            embeddings = self.embedder.generate_section_embeddings(self._subset(sections, representatives))
+            return embeddings[inverse.ravel()]
+    
+    def _add_duplicate_locations(self, scored_sections: List[Dict[str, Any]],
+                                 sections: Union[SectionStore, List[Dict[str, Any]]],
+                                 duplicates: Optional[DuplicateGroups],
+                                 rows: np.ndarray) -> None:
+        """List where else a collapsed section's content appears."""
+        if duplicates is None or not self.collapse_duplicates:
+            return
+        for scored_section, row in zip(scored_sections, rows):
+            locations = duplicates.locations(sections, row)
+            if locations:
+                scored_section['duplicate_locations'] = locations
+    
+    def _query_terms(self, persona_data: Dict[str, Any], job_data: Dict[str, Any]) -> List[str]:
+        """Terms of the persona and job keywords (their full text when there are none)."""
+        keywords = list(persona_data.get('keywords') or []) + list(job_data.get('keywords') or [])
+        if not keywords:
+            keywords = [self.embedder.build_persona_text(persona_data), self.embedder.build_job_text(job_data)]
+        return [term for keyword in keywords for term in tokenize(keyword)]
+    
+    def _subset(self, sections: Union[SectionStore, List[Dict[str, Any]]],
+                ids: np.ndarray) -> Union[SectionStore, List[Dict[str, Any]]]:
+        if isinstance(sections, SectionStore):
+            return sections.subset(ids)
+        return [sections[i] for i in ids]
+    
+    def _search_candidates(self, section_embeddings: np.ndarray,
+                           persona_embedding: np.ndarray,
+                           job_embedding: np.ndarray,
+                           top_k: Optional[int],
+                           corpus_key: Optional[str] = None) -> Optional[np.ndarray]:
+        """Ask the vector index for sections near the persona or job; None means score all."""
+        if not self.index_type or top_k is None or top_k * self.candidate_factor >= len(section_embeddings):
+            return None
         
-        # Sort by relevance score (descending)
-        scored_sections.sort(key=lambda x: x['relevance_score'], reverse=True)
+        index = self._get_index(section_embeddings, corpus_key)
+        ids, _ = index.search(np.stack([persona_embedding, job_embedding]), top_k * self.candidate_factor)
+        candidates = np.unique(ids[ids >= 0])
+        self.logger.info(f"Vector index ({index.kind}) selected {len(candidates)} of {len(section_embeddings)} sections")
+        return candidates
+    
+    def _subset_key(self, corpus_key: Optional[str], row_ids: Optional[np.ndarray]) -> Optional[str]:
+        """Key for the rows of a corpus that are being scored."""
+        if corpus_key is None or row_ids is None:
+            return corpus_key
+        return hashlib.sha1(corpus_key.encode('utf-8') + np.asarray(row_ids, dtype=np.int64).tobytes()).hexdigest()
+    
+    def _get_index(self, section_embeddings: np.ndarray, corpus_key: Optional[str] = None) -> VectorIndex:
+        """Reuse the in-memory or persisted index for these embeddings, or build one.
         
-        self.logger.info(f"Ranked {len(scored_sections)} sections")
+        Indexes are matched by corpus key, never by hashing the embeddings;
+        without a key only an index built from this very array is reused.
+        """
+        index = self._index
+        if corpus_key is None:
+            if index is not None and self._index_source is section_embeddings:
+                return index
+        else:
+            corpus_key = f"{self.index_type}:{corpus_key}"
+            if (index is None or index.corpus_key != corpus_key) and self.index_dir is not None:
+                try:
+                    index = load_index(self.index_dir)
+                except Exception as e:
+                    self.logger.warning(f"Ignoring unreadable vector index in {self.index_dir}: {e}")
+                    index = None
         
-        return scored_sections
+        if corpus_key is None or index is None or index.corpus_key != corpus_key \
+                or len(index) != len(section_embeddings):
+            index = create_index(self.index_type, **self.index_params).build(section_embeddings, corpus_key)
+            if self.index_dir is not None and corpus_key is not None:
+                index.save(self.index_dir)
+        
+        # Search settings come from the current run, not the saved index
+        if 'nprobe' in self.index_params:
+            index.nprobe = self.index_params['nprobe']
+        
+        self._index = index
+        self._index_source = section_embeddings
+        return index
+    
+    def _select_top_indices(self, combined_scores: np.ndarray,
+                            top_k: Optional[int] = None,
+                            min_score: Optional[float] = None) -> np.ndarray:
+        """Return indices of the best sections, highest score first, ties in input order."""
+        return select_top(combined_scores, top_k, min_score)
+    
+    def _build_scored_section(self, section: Dict[str, Any],
+                              persona_data: Dict[str, Any],
+                              job_data: Dict[str, Any],
+                              persona_sim: float,
+                              job_sim: float,
+                              relevance_score: float,
+                              matcher: Optional[ReasoningMatcher] = None) -> Dict[str, Any]:
+        """Build the output record for one ranked section."""
+        reasoning = self._generate_reasoning(
+            section, persona_data, job_data, persona_sim, job_sim, relevance_score, matcher
+        )
+        
+        return {
+            'document_name': section['document_name'],
+            'page_number': section['page_number'],
+            'section_text': section['section_text'][:1000] + '...' if len(section['section_text']) > 1000 else section['section_text'],
+            'relevance_score': float(relevance_score),
+            'reasoning': reasoning,
+            'section_title': section.get('section_title', ''),
+            'context_summary': section.get('context_summary', '')
+        }
+    
+    def _reasoning_matcher(self, persona_data: Dict[str, Any], job_data: Dict[str, Any]) -> ReasoningMatcher:
+        """Keyword matcher for one query, built once and shared by all its selected sections."""
+        return ReasoningMatcher(persona_data.get('keywords', []), job_data.get('keywords', []))
     
     def _generate_reasoning(self, section: Dict[str, Any], 
                           persona_data: Dict[str, Any], 
                           job_data: Dict[str, Any],
                           persona_sim: float, 
                           job_sim: float, 
-                          combined_score: float) -> str:
+                          combined_score: float,
+                          matcher: Optional[ReasoningMatcher] = None) -> str:
         """Generate explanation for why a section received its score."""
         
+        if matcher is None:
+            matcher = self._reasoning_matcher(persona_data, job_data)
+        section_text = section['section_text']
+        matched_keywords, matched_job_keywords, indicators = matcher.match(section_text)
+        
         reasoning_parts = []
         
         # Overall score assessment
@@ -87,10 +395,6 @@ class DocumentRanker:
         # Persona alignment
         if persona_sim > 0.6:
             reasoning_parts.append("Strong persona alignment")
-            # Check for specific persona keyword matches
-            persona_keywords = persona_data.get('keywords', [])
-            section_text_lower = section['section_text'].lower()
-            matched_keywords = [kw for kw in persona_keywords if kw.lower() in section_text_lower]
             if matched_keywords:
                 reasoning_parts.append(f"(matches persona keywords: {', '.join(matched_keywords[:3])})")
         elif persona_sim > 0.4:
@@ -99,30 +403,18 @@ class DocumentRanker:
         # Job alignment
         if job_sim > 0.6:
             reasoning_parts.append("Strong job relevance")
-            # Check for job keyword matches
-            job_keywords = job_data.get('keywords', [])
-            section_text_lower = section['section_text'].lower()
-            matched_job_keywords = [kw for kw in job_keywords if kw.lower() in section_text_lower]
             if matched_job_keywords:
                 reasoning_parts.append(f"(addresses job needs: {', '.join(matched_job_keywords[:3])})")
         elif job_sim > 0.4:
             reasoning_parts.append("Some job relevance")
         
         # Content type assessment
-        section_text = section['section_text']
         if len(section_text) > 500:
             reasoning_parts.append("Detailed content")
         elif len(section_text) < 100:
             reasoning_parts.append("Brief content")
         
-        # Check for specific content indicators
-        if any(word in section_text.lower() for word in ['example', 'case study', 'implementation']):
-            reasoning_parts.append("Contains practical examples")
-        
-        if any(word in section_text.lower() for word in ['process', 'step', 'procedure', 'method']):
-            reasoning_parts.append("Contains process information")
-        
-        if any(word in section_text.lower() for word in ['analysis', 'data', 'research', 'study']):
-            reasoning_parts.append("Contains analytical content")
+        # Specific content indicators, found in the same pass as the keywords
+        reasoning_parts.extend(indicators)
         
-        return ". ".join(reasoning_parts) + "."
\ No newline at end of file
+        return ". ".join(reasoning_parts) + "."
@@ -0,0 +1,173 @@
+from array import array
+from bisect import bisect_right
+from typing import List, Dict, Any, Optional, Iterable, Iterator
+import numpy as np
+
+def summarize_section(text: str) -> str:
+    """Generate a brief context summary for a section."""
+    # Take first sentence or first 100 characters
+    sentences = text.split('.')
+    if sentences and len(sentences[0]) < 200:
+        return sentences[0].strip() + '.'
+    else:
+        return text[:100].strip() + '...'
+
+class _StringColumn:
+    """Append-only strings kept in large buffers addressed by an offset array.
+    
+    Pending appends are joined into a new buffer on the next read, so
+    alternating appends and reads never re-copy earlier text.
+    """
+    
+    def __init__(self):
+        self.offsets = array('q', [0])
+        self._parts = []
+        self._buffers = []
+        self._buffer_starts = []
+    
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+    
+    def append(self, value: str) -> None:
+        self._parts.append(value)
+        self.offsets.append(self.offsets[-1] + len(value))
+    
+    def __getitem__(self, i: int) -> str:
+        if self._parts:
+            self._freeze()
+        start = self.offsets[i]
+        # A value never spans buffers, so its start picks the buffer
+        b = bisect_right(self._buffer_starts, start) - 1
+        base = self._buffer_starts[b]
+        return self._buffers[b][start - base:self.offsets[i + 1] - base]
+    
+    def _freeze(self) -> None:
+        """Fold pending appends into a new buffer."""
+        start = self.offsets[-1] - sum(len(part) for part in self._parts)
+        self._buffers.append(''.join(self._parts))
+        self._buffer_starts.append(start)
+        self._parts = []
+    
+    def __getstate__(self):
+        # Pickle as one contiguous buffer
+        buffer = ''.join(self._buffers + self._parts)
+        return {'offsets': self.offsets, 'buffer': buffer}
+    
+    def __setstate__(self, state):
+        self.offsets = state['offsets']
+        self._buffers = [state['buffer']]
+        self._buffer_starts = [0]
+        self._parts = []
+
+class SectionStore:
+    """Columnar storage for extracted sections.
+    
+    Document names are interned to int32 ids, page numbers live in an int32
+    array and section text and titles in single string buffers addressed by
+    offsets. Context summaries are derived on access. Indexing returns the
+    familiar section dict, so code written against lists of dicts keeps
+    working; bulk consumers should use the column accessors instead.
+    """
+    
+    def __init__(self):
+        self.document_names: List[str] = []
+        self._document_ids: Dict[str, int] = {}
+        self._doc_ids = array('i')
+        self._pages = array('i')
+        self._texts = _StringColumn()
+        self._titles = _StringColumn()
+        self._title_missing = array('b')
+    
+    @classmethod
+    def from_dicts(cls, sections: Iterable[Dict[str, Any]]) -> 'SectionStore':
+        """Build a store from section dicts."""
+        store = cls()
+        store.extend_dicts(sections)
+        return store
+    
+    def __len__(self) -> int:
+        return len(self._pages)
+    
+    def __getitem__(self, i: int) -> Dict[str, Any]:
+        """Dict view of one section."""
+        i = int(i)
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        text = self.text(i)
+        return {
+            'document_name': self.document_name(i),
+            'page_number': self._pages[i],
+            'section_text': text,
+            'section_title': self.title(i),
+            'context_summary': summarize_section(text)
+        }
+    
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for i in range(len(self)):
+            yield self[i]
+    
+    def append(self, document_name: str, page_number: int, section_text: str,
+               section_title: Optional[str] = None) -> None:
+        """Add one section."""
+        doc_id = self._document_ids.get(document_name)
+        if doc_id is None:
+            doc_id = len(self.document_names)
+            self._document_ids[document_name] = doc_id
+            self.document_names.append(document_name)
+        
+        self._doc_ids.append(doc_id)
+        self._pages.append(page_number)
+        self._texts.append(section_text)
+        self._titles.append(section_title or '')
+        self._title_missing.append(section_title is None)
+    
+    def extend_dicts(self, sections: Iterable[Dict[str, Any]]) -> None:
+        """Add sections given as dicts; summaries are recomputed on access."""
+        for section in sections:
+            self.append(section['document_name'], section['page_number'],
+                        section['section_text'], section.get('section_title'))
+    
+    def extend_store(self, other: 'SectionStore') -> None:
+        """Append every section of another store."""
+        for i in range(len(other)):
+            self.append(other.document_name(i), other._pages[i], other.text(i), other.title(i))
+    
+    def subset(self, indices: Iterable[int]) -> 'SectionStore':
+        """New store holding the given sections, in the given order."""
+        store = SectionStore()
+        for i in indices:
+            store.append(self.document_name(i), self._pages[i], self.text(i), self.title(i))
+        return store
+    
+    def text(self, i: int) -> str:
+        return self._texts[i]
+    
+    def title(self, i: int) -> Optional[str]:
+        return None if self._title_missing[i] else self._titles[i]
+    
+    def summary(self, i: int) -> str:
+        return summarize_section(self._texts[i])
+    
+    def document_name(self, i: int) -> str:
+        return self.document_names[self._doc_ids[i]]
+    
+    def page_number(self, i: int) -> int:
+        return self._pages[i]
+    
+    @property
+    def document_ids(self) -> np.ndarray:
+        """int32 document id per section (index into document_names)."""
+        return np.array(self._doc_ids, dtype=np.int32)
+    
+    @property
+    def page_numbers(self) -> np.ndarray:
+        """int32 page number per section."""
+        return np.array(self._pages, dtype=np.int32)
+    
+    def to_dicts(self, indices: Optional[Iterable[int]] = None) -> List[Dict[str, Any]]:
+        """Materialize section dicts, for output and cache boundaries."""
+        if indices is None:
+            indices = range(len(self))
+        return [self[i] for i in indices]
@@ -0,0 +1,226 @@
+import json
+import logging
+import math
+import queue
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Any, Optional
+import numpy as np
+from .pipeline import DocumentPipeline
+from .profiler import Profiler
+from .utils import find_persona_file
+
+class EncodeBatcher:
+    """Coalesces concurrent encode calls into single model.encode batches.
+    
+    Drop-in replacement for the model held by EmbeddingGenerator: callers block
+    in encode() while one background thread merges whatever requests arrived
+    within max_wait seconds and encodes them together.
+    """
+    
+    def __init__(self, model: Any, max_wait: float = 0.01, max_batch_texts: int = 1024):
+        self.logger = logging.getLogger(__name__)
+        self.model = model
+        self.max_wait = max_wait
+        self.max_batch_texts = max_batch_texts
+        self._requests = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="encode-batcher", daemon=True)
+        self._thread.start()
+    
+    def __getattr__(self, name: str) -> Any:
+        # Expose the wrapped model's other attributes (tokenizer, dimensions, ...)
+        if name == 'model':
+            raise AttributeError(name)
+        return getattr(self.model, name)
+    
+    def encode(self, sentences, batch_size: int = 32, **kwargs) -> np.ndarray:
+        """Encode like SentenceTransformer.encode, sharing the model call with other threads."""
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        if not texts:
+            return self.model.encode(texts, batch_size=batch_size, **kwargs)
+        
+        request = {'texts': texts, 'batch_size': batch_size, 'done': threading.Event()}
+        self._requests.put(request)
+        request['done'].wait()
+        
+        if 'error' in request:
+            raise request['error']
+        embeddings = request['embeddings']
+        return embeddings[0] if single else embeddings
+    
+    def _run(self):
+        """Collect requests into batches and encode them."""
+        while True:
+            batch = [self._requests.get()]
+            text_count = len(batch[0]['texts'])
+            deadline = time.monotonic() + self.max_wait
+            
+            while text_count < self.max_batch_texts:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    request = self._requests.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                batch.append(request)
+                text_count += len(request['texts'])
+            
+            texts = [text for request in batch for text in request['texts']]
+            try:
+                embeddings = np.asarray(
+                    self.model.encode(texts, batch_size=max(r['batch_size'] for r in batch))
+                )
+                self.logger.debug(f"Encoded {len(texts)} texts for {len(batch)} requests")
+                offset = 0
+                for request in batch:
+                    request['embeddings'] = embeddings[offset:offset + len(request['texts'])]
+                    offset += len(request['texts'])
+            except Exception as e:
+                for request in batch:
+                    request['error'] = e
+            finally:
+                for request in batch:
+                    request['done'].set()
+
+class PipelineRequestHandler(BaseHTTPRequestHandler):
+    """HTTP front end for a shared DocumentPipeline.
+    
+    POST /rank with a JSON body:
+        {"input_dir": "...", "persona_file": "...", "job_file": "...",
+         "documents": ["a.pdf", ...], "top_k": 10, "min_score": 0.3}
+    input_dir supplies defaults for the other paths using the usual layout.
+    GET /health reports readiness.
+    """
+    
+    pipeline: DocumentPipeline = None
+    
+    def do_GET(self):
+        if self.path == '/health':
+            self._send_json(200, {'status': 'ok', 'model': self.pipeline.embedder.model_name})
+        else:
+            self._send_json(404, {'error': f"Unknown endpoint: {self.path}"})
+    
+    def do_POST(self):
+        if self.path != '/rank':
+            self._send_json(404, {'error': f"Unknown endpoint: {self.path}"})
+            return
+        
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            payload = json.loads(self.rfile.read(length) or b'{}')
+            persona_file, job_file, pdf_files, top_k, min_score = self._resolve_inputs(payload)
+        except (ValueError, KeyError, TypeError) as e:
+            self._send_json(400, {'error': str(e)})
+            return
+        
+        try:
+            start_time = time.time()
+            # Each request thread profiles only its own stages
+            profiler = Profiler()
+            with profiler.activate():
+                ranked_sections = self.pipeline.run(
+                    persona_file, job_file, pdf_files,
+                    top_k=top_k, min_score=min_score
+                )
+            processing_time = time.time() - start_time
+            self._send_json(200, {
+                'metadata': self.pipeline.build_metadata(profiler, ranked_sections, processing_time),
+                'ranked_sections': ranked_sections,
+                'processing_time': processing_time
+            })
+        except Exception as e:
+            logging.getLogger(__name__).error(f"Request failed: {e}", exc_info=True)
+            self._send_json(500, {'error': str(e)})
+    
+    def _resolve_inputs(self, payload: Dict[str, Any]):
+        """Turn a request body into persona, job and PDF paths, top_k and min_score."""
+        if not isinstance(payload, dict):
+            raise ValueError("Request body must be a JSON object")
+        input_dir = Path(payload['input_dir']) if payload.get('input_dir') else None
+        
+        persona_file = Path(payload['persona_file']) if payload.get('persona_file') else None
+        if persona_file is None and input_dir is not None:
+            persona_file = find_persona_file(input_dir)
+        if persona_file is None or not persona_file.exists():
+            raise ValueError("Persona file not found")
+        
+        job_file = Path(payload['job_file']) if payload.get('job_file') else None
+        if job_file is None and input_dir is not None:
+            job_file = input_dir / "job_to_be_done.txt"
+        if job_file is None or not job_file.exists():
+            raise ValueError("Job file not found")
+        
+        if payload.get('documents'):
+            if not isinstance(payload['documents'], list):
+                raise ValueError("documents must be a list of PDF paths")
+            pdf_files = [Path(p) for p in payload['documents']]
+            missing = [str(pdf_file) for pdf_file in pdf_files if not pdf_file.is_file()]
+            if missing:
+                raise ValueError(f"PDF files not found: {', '.join(missing)}")
+        elif input_dir is not None:
+            pdf_files = sorted((input_dir / "documents").glob("*.pdf"))
+        else:
+            pdf_files = []
+        if not pdf_files:
+            raise ValueError("No PDF files given")
+        
+        return persona_file, job_file, pdf_files, self._top_k(payload), self._min_score(payload)
+    
+    def _top_k(self, payload: Dict[str, Any]) -> Optional[int]:
+        """top_k as a non-negative int (integral floats and numeric strings accepted), or None."""
+        value = payload.get('top_k')
+        if value is None:
+            return None
+        try:
+            number = float(value)
+            if isinstance(value, bool) or not number.is_integer() or number < 0:
+                raise ValueError
+        except (TypeError, ValueError):
+            raise ValueError(f"top_k must be a non-negative integer, got {value!r}")
+        return int(number)
+    
+    def _min_score(self, payload: Dict[str, Any]) -> Optional[float]:
+        """min_score as a finite float, or None."""
+        value = payload.get('min_score')
+        if value is None:
+            return None
+        try:
+            number = float(value)
+            if isinstance(value, bool) or not math.isfinite(number):
+                raise ValueError
+        except (TypeError, ValueError):
+            raise ValueError(f"min_score must be a number, got {value!r}")
+        return number
+    
+    def _send_json(self, status: int, body: Dict[str, Any]):
+        data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+    
+    def log_message(self, format, *args):
+        logging.getLogger(__name__).info("%s - %s" % (self.address_string(), format % args))
+
+def serve(pipeline: DocumentPipeline, host: str = '127.0.0.1', port: int = 8080,
+          batch_wait: float = 0.01) -> None:
+    """Serve the pipeline over HTTP, keeping the model loaded between requests."""
+    logger = logging.getLogger(__name__)
+    
+    # Concurrent requests share model.encode calls through the batcher
+    pipeline.embedder.model = EncodeBatcher(pipeline.embedder.model, max_wait=batch_wait)
+    
+    handler = type('BoundPipelineRequestHandler', (PipelineRequestHandler,), {'pipeline': pipeline})
+    server = ThreadingHTTPServer((host, port), handler)
+    logger.info(f"Serving on http://{host}:{port} (POST /rank, GET /health)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("Shutting down")
+    finally:
+        server.server_close()
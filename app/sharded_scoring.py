@@ -0,0 +1,171 @@
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import uuid
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+import numpy as np
+from .parallel import process_pool
+from .utils import normalize_rows
+
+def select_top(scores: np.ndarray, top_k: Optional[int] = None,
+               min_score: Optional[float] = None) -> np.ndarray:
+    """Indices of the best scores, highest first, ties in index order."""
+    candidates = np.arange(len(scores))
+    
+    if min_score is not None:
+        candidates = np.flatnonzero(scores >= min_score)
+    
+    # Partial selection keeps this O(n) instead of sorting everything
+    if top_k is not None and top_k < len(candidates):
+        if top_k <= 0:
+            return candidates[:0]
+        partition = np.argpartition(-scores[candidates], top_k - 1)[:top_k]
+        candidates = candidates[partition]
+    
+    order = np.lexsort((candidates, -scores[candidates]))
+    return candidates[order]
+
+def _score_rows(matrix: np.ndarray, start: int, end: int, queries: np.ndarray,
+                weights: Tuple[float, float], top_k: Optional[int], min_score: Optional[float],
+                chunk_rows: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Score rows [start, end) in chunks and keep each chunk's best, then the range's best."""
+    parts = []
+    for chunk_start in range(start, end, chunk_rows):
+        chunk_end = min(chunk_start + chunk_rows, end)
+        similarities = normalize_rows(matrix[chunk_start:chunk_end]) @ queries.T
+        combined = weights[0] * similarities[:, 0] + weights[1] * similarities[:, 1]
+        keep = select_top(combined, top_k, min_score)
+        parts.append((keep + chunk_start, similarities[keep, 0], similarities[keep, 1], combined[keep]))
+    
+    ids, persona, job, combined = _merge(parts)
+    keep = select_top(combined, top_k)
+    return ids[keep], persona[keep], job[keep], combined[keep]
+
+def _merge(parts):
+    """Concatenate (ids, persona, job, combined) parts in id order, so select_top breaks ties by id."""
+    ids, persona, job, combined = (np.concatenate(column) for column in zip(*parts))
+    order = np.argsort(ids, kind='stable')
+    return ids[order], persona[order], job[order], combined[order]
+
+def _score_shard(path: str, shape: Tuple[int, int], dtype: str, start: int, end: int,
+                 queries: np.ndarray, weights: Tuple[float, float], top_k: Optional[int],
+                 min_score: Optional[float], chunk_rows: int):
+    """Worker task: map the shared matrix read-only and score one shard of it."""
+    matrix = np.memmap(path, dtype=dtype, mode='r', shape=shape)
+    return _score_rows(matrix, start, end, queries, weights, top_k, min_score, chunk_rows)
+
+class ShardedScorer:
+    """Scores a large section embedding matrix across worker processes.
+    
+    The matrix lives in one memory-mapped file (on /dev/shm when it has room,
+    so it never touches disk, otherwise in the temp directory) that every
+    worker maps read-only; embeddings that are already a file-backed memmap
+    are used in place. Each worker scores its
+    row range against the persona and job vectors in bounded chunks and returns
+    only its local top_k, and the shards' candidates are merged with the same
+    ordering as single-process selection. The worker pool is started on first
+    use and kept until close().
+    """
+    
+    # Space left free on /dev/shm, whose size Docker caps at 64 MB by default
+    SHM_HEADROOM = 16 * 1024 * 1024
+    
+    def __init__(self, workers: Optional[int] = None, min_rows: int = 100000,
+                 chunk_rows: int = 65536, shared_dir: Optional[Path] = None):
+        self.logger = logging.getLogger(__name__)
+        self.workers = workers or os.cpu_count() or 1
+        self.min_rows = min_rows
+        self.chunk_rows = chunk_rows
+        # Without an explicit directory, /dev/shm is chosen per matrix by free space
+        self.shared_dir = Path(shared_dir) if shared_dir is not None else None
+        self._pool = None
+        self._pool_lock = threading.Lock()
+    
+    def __enter__(self) -> 'ShardedScorer':
+        return self
+    
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+    
+    def close(self) -> None:
+        """Stop the worker pool; a later select() starts a new one."""
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.close()
+            pool.join()
+    
+    def should_shard(self, rows: int) -> bool:
+        """Whether a matrix of this many rows is worth spreading over processes."""
+        return self.workers > 1 and rows >= max(self.min_rows, 1)
+    
+    def select(self, section_embeddings: np.ndarray,
+               persona_embedding: np.ndarray,
+               job_embedding: np.ndarray,
+               persona_weight: float = 0.4,
+               job_weight: float = 0.6,
+               top_k: Optional[int] = None,
+               min_score: Optional[float] = None) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+        """Return the selected row indices and their 'persona', 'job' and 'combined' scores."""
+        queries = normalize_rows(np.stack([persona_embedding, job_embedding]))
+        rows = len(section_embeddings)
+        shards = min(self.workers, max(rows, 1))
+        bounds = [rows * i // shards for i in range(shards + 1)]
+        
+        path, owned = self._share(section_embeddings)
+        try:
+            pool = self._get_pool()
+            results = [
+                pool.apply_async(_score_shard, (
+                    str(path), section_embeddings.shape, section_embeddings.dtype.str,
+                    bounds[i], bounds[i + 1], queries, (persona_weight, job_weight),
+                    top_k, min_score, self.chunk_rows
+                ))
+                for i in range(shards) if bounds[i] < bounds[i + 1]
+            ]
+            parts = [result.get() for result in results]
+        finally:
+            if owned:
+                os.unlink(path)
+        
+        ids, persona, job, combined = _merge(parts)
+        keep = select_top(combined, top_k)
+        self.logger.info(f"Scored {rows} sections in {len(parts)} shards, {len(ids)} shard candidates")
+        return ids[keep], {'persona': persona[keep], 'job': job[keep], 'combined': combined[keep]}
+    
+    def _share(self, section_embeddings: np.ndarray) -> Tuple[Path, bool]:
+        """File workers can map the matrix from, and whether it was created (and must be removed) here."""
+        if isinstance(section_embeddings, np.memmap) and section_embeddings.filename \
+                and section_embeddings.offset == 0 and section_embeddings.flags['C_CONTIGUOUS'] \
+                and os.path.getsize(section_embeddings.filename) == section_embeddings.nbytes:
+            section_embeddings.flush()
+            return Path(section_embeddings.filename), False
+        
+        path = self._shared_dir(section_embeddings.nbytes) / f"sections-{os.getpid()}-{uuid.uuid4().hex}.mat"
+        shared = np.memmap(path, dtype=section_embeddings.dtype, mode='w+', shape=section_embeddings.shape)
+        shared[:] = section_embeddings
+        shared.flush()
+        del shared
+        return path, True
+    
+    def _get_pool(self):
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = process_pool(self.workers)
+            return self._pool
+    
+    def _shared_dir(self, nbytes: int) -> Path:
+        """/dev/shm if the matrix fits with room to spare, since running out there is a SIGBUS, not an error."""
+        if self.shared_dir is not None:
+            return self.shared_dir
+        shm = Path("/dev/shm")
+        try:
+            if shm.is_dir() and shutil.disk_usage(shm).free >= nbytes + self.SHM_HEADROOM:
+                return shm
+        except OSError:
+            pass
+        self.logger.info(f"Not enough room in {shm} for {nbytes} bytes, sharing sections through a temp file")
+        return Path(tempfile.gettempdir())
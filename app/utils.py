@@ -1,7 +1,10 @@
+import json
 import logging
+import re
 import sys
 from pathlib import Path
-from typing import List
+from typing import List, Dict, Any, Optional
+import numpy as np
 
 def setup_logging():
     """Set up logging configuration."""
@@ -13,8 +16,19 @@ def setup_logging():
         ]
     )
 
-def validate_inputs(input_dir: Path, documents_dir: Path) -> bool:
-    """Validate that required input files exist."""
+def normalize_rows(embeddings: np.ndarray) -> np.ndarray:
+    """L2-normalize embeddings along the last axis as float32, leaving zero vectors as zeros."""
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(embeddings, axis=-1, keepdims=True)
+    return embeddings / np.where(norms == 0, 1.0, norms)
+
+def validate_inputs(input_dir: Path, documents_dir: Path, require_queries: bool = True,
+                    require_documents: bool = True) -> bool:
+    """Validate that required input files exist.
+    
+    require_queries=False skips the persona and job checks (batch mode supplies its own);
+    require_documents=False allows an empty documents directory (watch mode waits for PDFs).
+    """
     logger = logging.getLogger(__name__)
     
     # Check input directory
@@ -29,13 +43,17 @@ def validate_inputs(input_dir: Path, documents_dir: Path) -> bool:
     
     # Check for PDF files
     pdf_files = list(documents_dir.glob("*.pdf"))
-    if not pdf_files:
+    if not pdf_files and require_documents:
         logger.error("No PDF files found in documents directory")
         return False
     
     if len(pdf_files) > 10:
         logger.warning(f"Found {len(pdf_files)} PDF files, processing may take longer")
     
+    if not require_queries:
+        logger.info(f"Validation passed: {len(pdf_files)} PDFs found")
+        return True
+    
     # Check for persona file
     persona_files = list(input_dir.glob("persona.*"))
     if not persona_files:
@@ -51,6 +69,45 @@ def validate_inputs(input_dir: Path, documents_dir: Path) -> bool:
     logger.info(f"Validation passed: {len(pdf_files)} PDFs, persona file, and job file found")
     return True
 
+def find_persona_file(input_dir: Path) -> Optional[Path]:
+    """Return the persona file in an input directory, preferring JSON over text."""
+    for ext in ['.json', '.txt']:
+        persona_path = input_dir / f"persona{ext}"
+        if persona_path.exists():
+            return persona_path
+    return None
+
+def load_batch_manifest(manifest_path: Path) -> List[Dict[str, Any]]:
+    """Load persona/job pairs for batch mode.
+    
+    The manifest is a JSON list (or {"queries": [...]}) of objects with
+    "persona" and "job" paths, relative to the manifest, and an optional
+    "name" used for the output file.
+    """
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    
+    entries = data.get('queries', []) if isinstance(data, dict) else data
+    base_dir = manifest_path.parent
+    
+    queries = []
+    seen_names = set()
+    for i, entry in enumerate(entries):
+        name = re.sub(r'[^\w.-]', '_', str(entry.get('name') or f"result_{i:03d}"))
+        if name in seen_names:
+            raise ValueError(f"Duplicate query name in manifest: {name}")
+        seen_names.add(name)
+        
+        persona_file = base_dir / entry['persona']
+        job_file = base_dir / entry['job']
+        for path in (persona_file, job_file):
+            if not path.exists():
+                raise ValueError(f"Manifest entry {name}: file not found: {path}")
+        
+        queries.append({'name': name, 'persona_file': persona_file, 'job_file': job_file})
+    
+    return queries
+
 def create_sample_inputs():
     """Create sample input files for testing."""
     input_dir = Path("input")
@@ -0,0 +1,210 @@
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Dict, Any, Optional, Tuple
+import numpy as np
+from .utils import normalize_rows
+
+class VectorIndex:
+    """Cosine-similarity index over section embeddings."""
+    
+    kind = None
+    
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+        self.vectors = None
+        self.corpus_key = None
+    
+    def __len__(self) -> int:
+        return 0 if self.vectors is None else len(self.vectors)
+    
+    def build(self, embeddings: np.ndarray, corpus_key: Optional[str] = None) -> 'VectorIndex':
+        """Index a (sections, dim) embedding matrix."""
+        raise NotImplementedError
+    
+    def search(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (ids, scores) of the k best sections per query, best first."""
+        raise NotImplementedError
+    
+    def params(self) -> Dict[str, Any]:
+        """Settings stored alongside the index."""
+        return {}
+    
+    def arrays(self) -> Dict[str, np.ndarray]:
+        """Arrays stored alongside the index."""
+        return {'vectors': self.vectors}
+    
+    def save(self, index_dir: Path) -> None:
+        """Persist the index to a directory.
+        
+        Both files are replaced atomically, and the arrays carry the corpus key
+        too, so a crash between the two replacements is caught by load_index.
+        """
+        index_dir = Path(index_dir)
+        index_dir.mkdir(parents=True, exist_ok=True)
+        suffix = f".tmp.{os.getpid()}"
+        npz_path = index_dir / "index.npz"
+        with open(npz_path.with_suffix(suffix), 'wb') as f:
+            np.savez(f, corpus_key=np.array(self.corpus_key or ''), **self.arrays())
+        os.replace(npz_path.with_suffix(suffix), npz_path)
+        
+        meta_path = index_dir / "index.json"
+        with open(meta_path.with_suffix(suffix), 'w', encoding='utf-8') as f:
+            json.dump({'kind': self.kind, 'corpus_key': self.corpus_key, 'params': self.params()}, f)
+        os.replace(meta_path.with_suffix(suffix), meta_path)
+    
+    def _top_k(self, ids: np.ndarray, scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Pick the k best (id, score) pairs, best first."""
+        if k < len(scores):
+            part = np.argpartition(-scores, k - 1)[:k]
+            ids, scores = ids[part], scores[part]
+        order = np.argsort(-scores, kind='stable')
+        return ids[order], scores[order]
+
+class FlatIndex(VectorIndex):
+    """Exact search: scores every section."""
+    
+    kind = 'flat'
+    
+    def build(self, embeddings: np.ndarray, corpus_key: Optional[str] = None) -> 'FlatIndex':
+        self.vectors = normalize_rows(embeddings)
+        self.corpus_key = corpus_key
+        return self
+    
+    def search(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        queries = normalize_rows(np.atleast_2d(queries))
+        k = min(k, len(self))
+        all_ids = np.arange(len(self))
+        ids = np.empty((len(queries), k), dtype=np.int64)
+        scores = np.empty((len(queries), k), dtype=np.float32)
+        for row, query_scores in enumerate(queries @ self.vectors.T):
+            ids[row], scores[row] = self._top_k(all_ids, query_scores, k)
+        return ids, scores
+
+class IVFIndex(VectorIndex):
+    """Inverted-file index: k-means partitions, searching only the nprobe closest lists.
+    
+    Raising nprobe trades latency for recall; nprobe == n_lists is exact.
+    """
+    
+    kind = 'ivf'
+    
+    def __init__(self, n_lists: Optional[int] = None, nprobe: int = 8,
+                 n_iter: int = 10, train_size: int = 20000, seed: int = 0):
+        super().__init__()
+        self.n_lists = n_lists
+        self.nprobe = nprobe
+        self.n_iter = n_iter
+        self.train_size = train_size
+        self.seed = seed
+        self.centroids = None
+        self.list_offsets = None
+        self.ids = None
+    
+    def build(self, embeddings: np.ndarray, corpus_key: Optional[str] = None) -> 'IVFIndex':
+        vectors = normalize_rows(embeddings)
+        n_lists = self.n_lists or max(1, int(np.sqrt(len(vectors))))
+        n_lists = min(n_lists, len(vectors))
+        
+        self.centroids = self._train(vectors, n_lists)
+        assignments = self._assign(vectors)
+        
+        # Store vectors grouped by list so each probe reads one contiguous slice
+        order = np.argsort(assignments, kind='stable')
+        self.ids = order.astype(np.int64)
+        self.vectors = vectors[order]
+        self.list_offsets = np.searchsorted(assignments[order], np.arange(n_lists + 1)).astype(np.int64)
+        self.n_lists = n_lists
+        self.corpus_key = corpus_key
+        self.logger.info(f"Built IVF index: {len(vectors)} vectors in {n_lists} lists")
+        return self
+    
+    def search(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        queries = normalize_rows(np.atleast_2d(queries))
+        nprobe = min(self.nprobe, self.n_lists)
+        k = min(k, len(self))
+        ids = np.full((len(queries), k), -1, dtype=np.int64)
+        scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        
+        for row, query in enumerate(queries):
+            centroid_scores = self.centroids @ query
+            probes = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+            slices = [slice(self.list_offsets[p], self.list_offsets[p + 1]) for p in probes]
+            candidate_ids = np.concatenate([self.ids[s] for s in slices])
+            candidate_scores = np.concatenate([self.vectors[s] @ query for s in slices])
+            found_ids, found_scores = self._top_k(candidate_ids, candidate_scores, min(k, len(candidate_ids)))
+            ids[row, :len(found_ids)] = found_ids
+            scores[row, :len(found_scores)] = found_scores
+        return ids, scores
+    
+    def params(self) -> Dict[str, Any]:
+        return {'n_lists': self.n_lists, 'nprobe': self.nprobe}
+    
+    def arrays(self) -> Dict[str, np.ndarray]:
+        return {
+            'vectors': self.vectors,
+            'ids': self.ids,
+            'centroids': self.centroids,
+            'list_offsets': self.list_offsets
+        }
+    
+    def _train(self, vectors: np.ndarray, n_lists: int) -> np.ndarray:
+        """Spherical k-means on a sample of the vectors."""
+        rng = np.random.default_rng(self.seed)
+        sample = vectors
+        if len(vectors) > self.train_size:
+            sample = vectors[rng.choice(len(vectors), self.train_size, replace=False)]
+        
+        centroids = sample[rng.choice(len(sample), n_lists, replace=False)].copy()
+        for _ in range(self.n_iter):
+            assignments = np.argmax(sample @ centroids.T, axis=1)
+            order = np.argsort(assignments, kind='stable')
+            counts = np.bincount(assignments, minlength=n_lists)
+            starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+            
+            sums = np.zeros_like(centroids)
+            filled = counts > 0
+            sums[filled] = np.add.reduceat(sample[order], starts[filled], axis=0)
+            # Reseed empty lists from random points so every list stays usable
+            sums[~filled] = sample[rng.choice(len(sample), int((~filled).sum()))]
+            centroids = normalize_rows(sums)
+        return centroids
+    
+    def _assign(self, vectors: np.ndarray, chunk_size: int = 65536) -> np.ndarray:
+        """Nearest centroid for every vector, computed in chunks."""
+        assignments = np.empty(len(vectors), dtype=np.int64)
+        for start in range(0, len(vectors), chunk_size):
+            chunk = vectors[start:start + chunk_size]
+            assignments[start:start + chunk_size] = np.argmax(chunk @ self.centroids.T, axis=1)
+        return assignments
+
+INDEX_TYPES = {'flat': FlatIndex, 'ivf': IVFIndex}
+
+def create_index(kind: str, **params) -> VectorIndex:
+    """Create an empty index of the given kind."""
+    if kind not in INDEX_TYPES:
+        raise ValueError(f"Unknown vector index type: {kind}")
+    if kind == 'flat':
+        return FlatIndex()
+    return INDEX_TYPES[kind](**params)
+
+def load_index(index_dir: Path) -> Optional[VectorIndex]:
+    """Load a saved index, or return None if there is none."""
+    index_dir = Path(index_dir)
+    meta_path = index_dir / "index.json"
+    if not meta_path.exists():
+        return None
+    
+    with open(meta_path, 'r', encoding='utf-8') as f:
+        meta = json.load(f)
+    index = create_index(meta['kind'], **meta.get('params', {}))
+    index.corpus_key = meta.get('corpus_key')
+    
+    with np.load(index_dir / "index.npz") as data:
+        if str(data['corpus_key']) != (index.corpus_key or ''):
+            raise ValueError("index.npz and index.json belong to different corpora")
+        for name in data.files:
+            if name != 'corpus_key':
+                setattr(index, name, data[name])
+    return index
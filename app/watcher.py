@@ -0,0 +1,133 @@
+import logging
+import threading
+import time
+from pathlib import Path
+from typing import List, Dict, Optional, Tuple, Callable
+import numpy as np
+from .pipeline import DocumentPipeline
+from .section_store import SectionStore
+from .profiler import current_profiler
+
+class DocumentWatcher:
+    """Keeps a ranked corpus current as PDFs are added to, changed in or removed from a directory.
+    
+    The directory is polled for *.pdf size and mtime changes (no inotify or
+    external service). Once it has been quiet for the debounce window, only
+    new and changed files are extracted and encoded, deleted files' sections
+    are dropped, and the callback receives the whole corpus in file-name
+    order, as a full run over the directory would see it. Each document's
+    sections and embeddings are kept in memory between updates.
+    """
+    
+    def __init__(self, pipeline: DocumentPipeline, documents_dir: Path,
+                 poll_interval: float = 1.0, debounce: float = 2.0):
+        self.logger = logging.getLogger(__name__)
+        self.pipeline = pipeline
+        self.documents_dir = Path(documents_dir)
+        self.poll_interval = poll_interval
+        self.debounce = debounce
+        # file name -> ((size, mtime_ns), sections, embeddings or None when nothing was extracted)
+        self._documents: Dict[str, Tuple[Tuple[int, int], SectionStore, Optional[np.ndarray]]] = {}
+    
+    def scan(self) -> Dict[str, Tuple[int, int]]:
+        """Current (size, mtime_ns) of every PDF in the directory, by file name."""
+        signatures = {}
+        for path in self.documents_dir.glob("*.pdf"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                # Deleted between listing and stat
+                continue
+            signatures[path.name] = (stat.st_size, stat.st_mtime_ns)
+        return signatures
+    
+    def changes(self, signatures: Dict[str, Tuple[int, int]]) -> Tuple[List[str], List[str]]:
+        """(new or changed, deleted) file names relative to the indexed documents."""
+        changed = sorted(name for name, signature in signatures.items()
+                         if name not in self._documents or self._documents[name][0] != signature)
+        deleted = sorted(name for name in self._documents if name not in signatures)
+        return changed, deleted
+    
+    def update(self, signatures: Dict[str, Tuple[int, int]]) -> bool:
+        """Bring the index in line with a scan; returns whether anything changed.
+        
+        The index is replaced only once every changed file has been processed,
+        so an error leaves it as it was.
+        """
+        changed, deleted = self.changes(signatures)
+        if not changed and not deleted:
+            return False
+        self.logger.info(f"Updating index: {len(changed)} new or changed, {len(deleted)} deleted documents")
+        
+        documents = dict(self._documents)
+        for name in deleted:
+            del documents[name]
+        if changed:
+            with current_profiler().stage('incremental_update', documents=len(changed)) as stats:
+                pdf_files = [self.documents_dir / name for name in changed]
+                if self.pipeline.pipelined:
+                    sections, embeddings = self.pipeline.extract_and_embed(pdf_files)
+                else:
+                    sections = self.pipeline.extract(pdf_files)
+                    embeddings = self.pipeline.embedder.generate_section_embeddings(sections) if sections else None
+                stats.update(sections=len(sections))
+            
+            document_ids = sections.document_ids
+            for name in changed:
+                # Failed files are indexed empty, so they are retried only once they change again
+                if name not in sections.document_names:
+                    documents[name] = (signatures[name], SectionStore(), None)
+                    continue
+                rows = np.flatnonzero(document_ids == sections.document_names.index(name))
+                documents[name] = (signatures[name], sections.subset(rows), embeddings[rows])
+        self._documents = documents
+        return True
+    
+    def indexed_signatures(self) -> Dict[str, Tuple[int, int]]:
+        """(size, mtime_ns) of every indexed document as it was when extracted."""
+        return {name: signature for name, (signature, _, _) in self._documents.items()}
+    
+    def corpus(self) -> Tuple[SectionStore, np.ndarray]:
+        """All indexed sections and their embeddings, in file-name order."""
+        sections = SectionStore()
+        parts = []
+        for name in sorted(self._documents):
+            _, document_sections, embeddings = self._documents[name]
+            if embeddings is None:
+                continue
+            sections.extend_store(document_sections)
+            parts.append(embeddings)
+        if not parts:
+            return sections, np.zeros((0, 0), dtype=np.float32)
+        return sections, np.concatenate(parts)
+    
+    def run(self, on_update: Callable[[SectionStore, np.ndarray], None],
+            stop: Optional[threading.Event] = None) -> None:
+        """Poll until stop is set, calling on_update with the corpus after each settled change.
+        
+        The initial contents count as a change, so the first update indexes the
+        whole directory. If the update or the callback fails, the previous index
+        is kept and the change is retried on the next poll.
+        """
+        stop = stop or threading.Event()
+        last_scan = None
+        last_change = 0.0
+        
+        while not stop.is_set():
+            signatures = self.scan()
+            if signatures != last_scan:
+                last_scan = signatures
+                last_change = time.monotonic()
+            
+            # Wait out the debounce window so files still being copied are read once, complete
+            settled = time.monotonic() - last_change >= self.debounce
+            if settled:
+                previous = self._documents
+                try:
+                    if self.update(signatures):
+                        on_update(*self.corpus())
+                except Exception as e:
+                    self._documents = previous
+                    self.logger.error(f"Update failed: {e}", exc_info=True)
+            
+            stop.wait(self.poll_interval)
@@ -0,0 +1,322 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Tuple
+import numpy as np
+from .embedder import EmbeddingGenerator
+from .extractor import PDFExtractor
+from .section_store import SectionStore
+from .profiler import current_profiler
+
+class WorkQueue:
+    """Per-document claims and shard outputs in a directory shared by workers on any host.
+    
+    A worker owns a document while its claims/<key>.claim file exists; the
+    file is created with O_EXCL, so only one worker wins it, and the owner
+    touches it every heartbeat. A claim untouched for longer than the lease
+    belongs to a crashed worker and is taken over. Finished documents leave
+    shards/<key>.npy (embeddings), shards/<key>.json (sections) and, written
+    last, shards/<key>.done holding the source file's size and mtime, so a
+    document is done once its marker matches the current file and polling
+    never reads the shards themselves. No broker is involved; hosts' clocks
+    only need to agree to well within the lease.
+    """
+    
+    def __init__(self, queue_dir: Path, encoder: str, worker_id: Optional[str] = None,
+                 lease: float = 60.0, heartbeat: Optional[float] = None):
+        self.logger = logging.getLogger(__name__)
+        self.queue_dir = Path(queue_dir)
+        self.claims_dir = self.queue_dir / "claims"
+        self.shards_dir = self.queue_dir / "shards"
+        self.claims_dir.mkdir(parents=True, exist_ok=True)
+        self.shards_dir.mkdir(parents=True, exist_ok=True)
+        self.encoder = encoder
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.lease = lease
+        self.heartbeat = heartbeat or lease / 4
+        self._owned: Dict[Path, str] = {}
+        self._lock = threading.Lock()
+    
+    def key(self, pdf_file: Path) -> str:
+        """File-system safe, collision-free name for a document's claim and shard."""
+        name = Path(pdf_file).name
+        digest = hashlib.sha1(name.encode('utf-8')).hexdigest()[:8]
+        stem = re.sub(r'[^\w.-]', '_', Path(name).stem)
+        return f"{stem}-{digest}"
+    
+    def is_done(self, pdf_file: Path) -> bool:
+        """Whether a shard exists for the current contents of a document."""
+        path = self.shards_dir / f"{self.key(pdf_file)}.done"
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                done = json.load(f)
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"Ignoring unreadable marker {path.name}: {e}")
+            return False
+        return done == self.fingerprint(pdf_file)
+    
+    def claim(self, pdf_file: Path) -> bool:
+        """Try to take a document; False when another live worker holds it."""
+        path = self.claims_dir / f"{self.key(pdf_file)}.claim"
+        token = f"{self.worker_id}:{time.time_ns()}"
+        # Once to create, once more after taking over an expired claim
+        for _ in range(2):
+            try:
+                fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+            except FileExistsError:
+                if not self._expire(path):
+                    return False
+                continue
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump({'token': token, 'worker': self.worker_id, 'document': Path(pdf_file).name}, f)
+            with self._lock:
+                self._owned[path] = token
+            return True
+        return False
+    
+    def release(self, pdf_file: Path) -> None:
+        """Give up a claim, if this worker still holds it."""
+        path = self.claims_dir / f"{self.key(pdf_file)}.claim"
+        with self._lock:
+            token = self._owned.pop(path, None)
+        if token is not None and self._claim_token(path) == token:
+            path.unlink(missing_ok=True)
+    
+    def _expire(self, path: Path) -> bool:
+        """Remove a claim whose lease ran out; True when the claim is gone."""
+        try:
+            if time.time() - path.stat().st_mtime < self.lease:
+                return False
+        except FileNotFoundError:
+            return True
+        
+        # Renaming is atomic, so only one worker moves the stale claim aside
+        moved = path.with_name(f"{path.name}.expired.{self.worker_id}")
+        try:
+            os.rename(path, moved)
+        except FileNotFoundError:
+            return False
+        try:
+            live = time.time() - moved.stat().st_mtime < self.lease
+        except OSError:
+            live = False
+        if live:
+            # Another worker replaced the stale claim in between; give its live one back.
+            # Unlike rename, link never overwrites, so a claim made since then is kept instead
+            try:
+                os.link(moved, path)
+            except FileExistsError:
+                pass
+            moved.unlink(missing_ok=True)
+            return False
+        try:
+            with open(moved, 'r', encoding='utf-8') as f:
+                previous = json.load(f).get('worker')
+        except (OSError, ValueError):
+            previous = None
+        moved.unlink(missing_ok=True)
+        self.logger.warning(f"Lease of {previous or 'unknown worker'} on {path.stem} expired, taking it over")
+        return True
+    
+    def _claim_token(self, path: Path) -> Optional[str]:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f).get('token')
+        except (OSError, ValueError):
+            return None
+    
+    @contextmanager
+    def heartbeats(self):
+        """Keep this worker's claims fresh from a background thread while the block runs."""
+        stop = threading.Event()
+        
+        def beat():
+            while not stop.wait(self.heartbeat):
+                with self._lock:
+                    owned = list(self._owned.items())
+                for path, token in owned:
+                    # Never refresh a claim that was taken over
+                    if self._claim_token(path) == token:
+                        try:
+                            os.utime(path)
+                        except FileNotFoundError:
+                            pass
+        
+        thread = threading.Thread(target=beat, name="queue-heartbeat", daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            thread.join()
+    
+    def write_shard(self, pdf_file: Path, sections: SectionStore, embeddings: Optional[np.ndarray],
+                    fingerprint: List[int], error: Optional[str] = None) -> None:
+        """Atomically publish a document's sections and embeddings (or the error that stopped it).
+        
+        fingerprint is the file's, taken before it was read, so a file changed
+        mid-extraction is not mistaken for done.
+        """
+        key = self.key(pdf_file)
+        suffix = f".tmp.{os.getpid()}.{threading.get_ident()}"
+        if embeddings is not None:
+            npy_path = self.shards_dir / f"{key}.npy"
+            with open(npy_path.with_suffix(suffix), 'wb') as f:
+                np.save(f, embeddings)
+            os.replace(npy_path.with_suffix(suffix), npy_path)
+        
+        json_path = self.shards_dir / f"{key}.json"
+        with open(json_path.with_suffix(suffix), 'w', encoding='utf-8') as f:
+            json.dump({
+                'document': Path(pdf_file).name,
+                'fingerprint': fingerprint,
+                'encoder': self.encoder,
+                'worker': self.worker_id,
+                'error': error,
+                'sections': [
+                    {field: value for field, value in section.items() if field != 'context_summary'}
+                    for section in sections
+                ]
+            }, f, ensure_ascii=False)
+        os.replace(json_path.with_suffix(suffix), json_path)
+        
+        done_path = self.shards_dir / f"{key}.done"
+        with open(done_path.with_suffix(suffix), 'w', encoding='utf-8') as f:
+            json.dump(fingerprint, f)
+        os.replace(done_path.with_suffix(suffix), done_path)
+    
+    def read_shard(self, pdf_file: Path) -> Tuple[SectionStore, Optional[np.ndarray]]:
+        """A finished document's sections and embeddings (None when it has no sections)."""
+        shard = self._read_shard_meta(pdf_file)
+        if shard is None:
+            raise FileNotFoundError(f"No shard for {Path(pdf_file).name}")
+        if shard['encoder'] != self.encoder:
+            raise ValueError(
+                f"Shard for {shard['document']} was encoded with {shard['encoder']}, expected {self.encoder}"
+            )
+        sections = SectionStore.from_dicts(shard['sections'])
+        if not sections:
+            return sections, None
+        embeddings = np.load(self.shards_dir / f"{self.key(pdf_file)}.npy")
+        if len(embeddings) != len(sections):
+            raise ValueError(f"Shard for {shard['document']} has {len(embeddings)} embeddings "
+                             f"for {len(sections)} sections")
+        return sections, embeddings
+    
+    def _read_shard_meta(self, pdf_file: Path) -> Optional[Dict[str, Any]]:
+        path = self.shards_dir / f"{self.key(pdf_file)}.json"
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"Ignoring unreadable shard {path.name}: {e}")
+            return None
+    
+    def fingerprint(self, pdf_file: Path) -> List[int]:
+        """Size and mtime of a document, as recorded in its shard."""
+        stat = Path(pdf_file).stat()
+        return [stat.st_size, stat.st_mtime_ns]
+    
+    def collect(self, pdf_files: List[Path], timeout: Optional[float] = None,
+                poll_interval: float = 2.0) -> Tuple[SectionStore, np.ndarray]:
+        """Wait for every document's shard, then merge them in file order.
+        
+        Documents whose workers failed are logged and skipped, as in a single
+        process run.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        reported = None
+        with current_profiler().stage('queue_wait', documents=len(pdf_files)):
+            while True:
+                pending = [pdf_file for pdf_file in pdf_files if not self.is_done(pdf_file)]
+                if not pending:
+                    break
+                if len(pending) != reported:
+                    self.logger.info(f"Waiting for {len(pending)} of {len(pdf_files)} documents")
+                    reported = len(pending)
+                if deadline is not None and time.monotonic() > deadline:
+                    raise TimeoutError(f"{len(pending)} documents still unprocessed, e.g. {pending[0].name}")
+                time.sleep(poll_interval)
+        
+        sections = SectionStore()
+        parts = []
+        with current_profiler().stage('shard_merge', documents=len(pdf_files)) as stats:
+            for pdf_file in pdf_files:
+                shard = self._read_shard_meta(pdf_file)
+                if shard is None or shard.get('error'):
+                    # A done marker whose shard is gone or unreadable counts as a failed document
+                    error = shard['error'] if shard else "shard missing or unreadable"
+                    self.logger.warning(f"Failed to process {pdf_file.name}: {error}")
+                    continue
+                document_sections, embeddings = self.read_shard(pdf_file)
+                if embeddings is not None:
+                    sections.extend_store(document_sections)
+                    parts.append(embeddings)
+            stats.update(sections=len(sections))
+        self.logger.info(f"Merged {len(sections)} sections from {len(pdf_files)} document shards")
+        return sections, np.concatenate(parts) if parts else np.zeros((0, 0), dtype=np.float32)
+
+class QueueWorker:
+    """Claims documents from a WorkQueue and extracts and embeds them until none are left."""
+    
+    def __init__(self, queue: WorkQueue, extractor: PDFExtractor, embedder: EmbeddingGenerator,
+                 poll_interval: float = 5.0):
+        self.logger = logging.getLogger(__name__)
+        self.queue = queue
+        self.extractor = extractor
+        self.embedder = embedder
+        self.poll_interval = poll_interval
+    
+    def run(self, pdf_files: List[Path]) -> int:
+        """Process documents until every one has a shard; returns how many this worker did.
+        
+        When the rest are held by other workers it keeps polling, so it picks up
+        documents whose workers crashed once their leases expire.
+        """
+        processed = 0
+        with self.queue.heartbeats():
+            while True:
+                pending = [pdf_file for pdf_file in pdf_files if not self.queue.is_done(pdf_file)]
+                if not pending:
+                    break
+                claimed = False
+                for pdf_file in pending:
+                    if not self.queue.claim(pdf_file):
+                        continue
+                    claimed = True
+                    try:
+                        # Another worker may have finished it between the scan and the claim
+                        if not self.queue.is_done(pdf_file):
+                            self._process(pdf_file)
+                            processed += 1
+                    finally:
+                        self.queue.release(pdf_file)
+                if not claimed:
+                    time.sleep(self.poll_interval)
+        self.logger.info(f"Worker {self.queue.worker_id} processed {processed} documents")
+        return processed
+    
+    def _process(self, pdf_file: Path) -> None:
+        self.logger.info(f"Processing {pdf_file.name}...")
+        fingerprint = self.queue.fingerprint(pdf_file)
+        sections = SectionStore()
+        try:
+            self.extractor.extract_into(pdf_file, sections)
+        except Exception as e:
+            # Recorded so the coordinator skips the file instead of waiting for it
+            self.logger.warning(f"Failed to process {pdf_file.name}: {e}")
+            self.queue.write_shard(pdf_file, SectionStore(), None, fingerprint, error=str(e))
+            return
+        embeddings = self.embedder.generate_section_embeddings(sections) if sections else None
+        self.queue.write_shard(pdf_file, sections, embeddings, fingerprint)
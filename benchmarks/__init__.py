@@ -0,0 +1 @@
+# Offline benchmarks for the document intelligence pipeline
@@ -0,0 +1,103 @@
+"""Compare encoder backends for throughput and score parity on this host.
+
+Usage: python -m benchmarks.bench_encoders --onnx-model-dir models/minilm-onnx
+                                           [--export] [--threads 1 2 4] [--output report.json]
+
+With --export the model is first exported to ONNX (and int8-quantized) into
+--onnx-model-dir; that needs torch and sentence-transformers. Every available
+backend (torch, onnx, onnx-int8) encodes the same synthetic sections at each
+thread count, and the ONNX variants are checked against torch: cosine scores
+for the benchmark queries should differ by well under 0.01 and keep the same
+top-k before a backend is used in place of the PyTorch model.
+"""
+import argparse
+import json
+import random
+import time
+from pathlib import Path
+from typing import List, Dict, Any
+from app.encoders import check_parity, create_encoder, export_onnx
+from benchmarks.synthetic_pdf import WORDS
+
+QUERIES = [
+    "Travel Planner. Plan a trip of 4 days for a group of 10 college friends.",
+    "HR professional. Create and manage fillable forms for onboarding and compliance.",
+    "Food Contractor. Prepare a vegetarian buffet-style dinner menu for a corporate gathering.",
+    "PhD Researcher. Prepare a literature review focusing on methodologies and benchmarks.",
+]
+
+def make_texts(count: int, seed: int) -> List[str]:
+    """Section-like texts of varied length, so padding behaviour matters."""
+    rng = random.Random(seed)
+    return [
+        " ".join(rng.choice(WORDS) for _ in range(rng.randint(20, 200))) + "."
+        for _ in range(count)
+    ]
+
+def time_encoder(encoder, texts: List[str], batch_size: int, repeat: int) -> Dict[str, Any]:
+    encoder.encode(texts[:batch_size], batch_size=batch_size)  # warm-up
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        encoder.encode(texts, batch_size=batch_size)
+        best = min(best, time.perf_counter() - start)
+    return {'seconds': best, 'texts_per_second': len(texts) / best}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--model', default='all-MiniLM-L6-v2')
+    parser.add_argument('--onnx-model-dir', type=Path, required=True)
+    parser.add_argument('--export', action='store_true', help="Export (and quantize) the model first")
+    parser.add_argument('--threads', type=int, nargs='+', default=[1])
+    parser.add_argument('--texts', type=int, default=512)
+    parser.add_argument('--batch-size', type=int, default=64)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default=None, help="Write the JSON report here instead of stdout")
+    args = parser.parse_args(argv)
+    
+    if args.export:
+        export_onnx(args.model, args.onnx_model_dir, quantize=True)
+    
+    variants = {'torch': {'backend': 'torch'}}
+    if (args.onnx_model_dir / "model.onnx").exists():
+        variants['onnx'] = {'backend': 'onnx', 'model_dir': args.onnx_model_dir}
+    if (args.onnx_model_dir / "model_quantized.onnx").exists():
+        variants['onnx-int8'] = {'backend': 'onnx', 'model_dir': args.onnx_model_dir, 'quantized': True}
+    
+    texts = make_texts(args.texts, args.seed)
+    report = {
+        'config': {key: str(value) if isinstance(value, Path) else value
+                   for key, value in vars(args).items() if key != 'output'},
+        'throughput': {},
+        'parity': {}
+    }
+    
+    for threads in args.threads:
+        encoders = {name: create_encoder(model_name=args.model, threads=threads, **options)
+                    for name, options in variants.items()}
+        report['throughput'][str(threads)] = {
+            name: time_encoder(encoder, texts, args.batch_size, args.repeat)
+            for name, encoder in encoders.items()
+        }
+        if not report['parity']:
+            report['parity'] = {
+                name: check_parity(encoders['torch'], encoder, texts, QUERIES)
+                for name, encoder in encoders.items() if name != 'torch'
+            }
+    
+    # Fastest variant at each thread count, so a host can pick its backend
+    report['fastest'] = {
+        threads: max(results, key=lambda name: results[name]['texts_per_second'])
+        for threads, results in report['throughput'].items()
+    }
+    
+    output = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""Compare PDF text backends for speed, memory and output agreement.
+
+Usage: python -m benchmarks.bench_extractors [--pages N] [--pdf FILE ...] [--max-pages N] [--output report.json]
+
+Each backend extracts the same PDFs (a synthetic document of --pages pages
+unless --pdf is given) in a fresh process, so peak RSS is its own. The
+pdfplumber-unflushed row reads pages the way extraction did before page
+caches were released, as the memory baseline. Sections are compared with
+pdfplumber's by exact match and by word overlap.
+"""
+import argparse
+import json
+import multiprocessing
+import re
+import tempfile
+import time
+from pathlib import Path
+from typing import List, Dict, Any, Optional
+from app.extractor import PDFExtractor
+from app.profiler import get_peak_rss_mb, get_rss_mb
+from app.section_store import SectionStore
+from benchmarks.synthetic_pdf import generate_corpus
+
+BACKENDS = ('pdfplumber-unflushed', 'pdfplumber', 'pdfminer')
+
+def _extract(backend: str, pdf_files: List[str], max_pages: Optional[int]) -> Dict[str, Any]:
+    """Run in a child process: extract every file and report time, memory and the section texts."""
+    start_rss = get_rss_mb()
+    start = time.perf_counter()
+    pages = 0
+    texts = []
+    
+    if backend == 'pdfplumber-unflushed':
+        import pdfplumber
+        extractor = PDFExtractor()
+        for pdf_file in pdf_files:
+            with pdfplumber.open(pdf_file) as pdf:
+                for page_num, page in enumerate(pdf.pages[:max_pages], 1):
+                    text = page.extract_text()
+                    pages += 1
+                    if text:
+                        texts.extend(section for _, section in extractor._segment_page(text, page_num))
+    else:
+        extractor = PDFExtractor(backend=backend, max_pages=max_pages)
+        store = SectionStore()
+        for pdf_file in pdf_files:
+            extractor.extract_into(Path(pdf_file), store)
+            pages += extractor.get_page_count(Path(pdf_file))
+        texts = [store.text(i) for i in range(len(store))]
+    
+    seconds = time.perf_counter() - start
+    return {
+        'seconds': seconds,
+        'pages': pages,
+        'pages_per_second': pages / seconds,
+        'sections': len(texts),
+        'rss_growth_mb': get_rss_mb() - start_rss,
+        'peak_rss_mb': get_peak_rss_mb(),
+        'texts': texts
+    }
+
+def word_overlap(texts: List[str], reference: List[str]) -> float:
+    """Jaccard similarity of the two outputs' word multisets, ignoring section boundaries."""
+    def counts(values):
+        result = {}
+        for word in re.findall(r'\w+', ' '.join(values).lower()):
+            result[word] = result.get(word, 0) + 1
+        return result
+    
+    ours, theirs = counts(texts), counts(reference)
+    shared = sum(min(count, theirs.get(word, 0)) for word, count in ours.items())
+    total = sum(ours.values()) + sum(theirs.values()) - shared
+    return shared / total if total else 1.0
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pages', type=int, default=500, help="Pages in the synthetic PDF")
+    parser.add_argument('--pdf', type=Path, nargs='*', default=None, help="Benchmark these PDFs instead")
+    parser.add_argument('--max-pages', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default=None, help="Write the JSON report here instead of stdout")
+    args = parser.parse_args(argv)
+    
+    report: Dict[str, Any] = {
+        'config': {key: str(value) if isinstance(value, list) else value
+                   for key, value in vars(args).items() if key != 'output'},
+        'backends': {}
+    }
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.pdf:
+            pdf_files = [str(path) for path in args.pdf]
+        else:
+            corpus = generate_corpus(Path(tmp), documents=1, pages=args.pages, seed=args.seed)
+            pdf_files = [str(path) for path in corpus['pdf_files']]
+        
+        # A fresh process per backend keeps peak RSS comparable
+        context = multiprocessing.get_context('spawn')
+        for backend in BACKENDS:
+            with context.Pool(processes=1, maxtasksperchild=1) as pool:
+                report['backends'][backend] = pool.apply(_extract, (backend, pdf_files, args.max_pages))
+    
+    reference = report['backends']['pdfplumber']['texts']
+    for result in report['backends'].values():
+        texts = result.pop('texts')
+        result['same_sections_as_pdfplumber'] = texts == reference
+        result['word_overlap_with_pdfplumber'] = word_overlap(texts, reference)
+        result['speedup'] = report['backends']['pdfplumber']['seconds'] / result['seconds']
+    
+    output = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+"""Time each pipeline component and the full pipeline on synthetic PDF corpora.
+
+Usage: python -m benchmarks.bench_pipeline [--documents 1 5 10] [--pages N]
+                                           [--encoder stub|model] [--output report.json]
+
+Corpora are generated deterministically (see benchmarks.synthetic_pdf), caches
+are disabled and every measurement is repeated, so reports from two commits
+on the same machine can be diffed directly. The stub encoder runs without
+model weights; use --encoder model to include real encoding cost.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List, Dict, Any, Callable
+import numpy as np
+from app.embedder import EmbeddingGenerator
+from app.extractor import PDFExtractor
+from app.job_parser import JobParser
+from app.parallel import ParallelExtractor
+from app.persona_parser import PersonaParser
+from app.pipeline import DocumentPipeline
+from app.profiler import Profiler
+from app.ranker import DocumentRanker
+from app.section_store import SectionStore
+from benchmarks.stub_encoder import HashingEncoder
+from benchmarks.synthetic_pdf import generate_corpus
+
+def measure(fn: Callable[[], Any], repeat: int) -> Dict[str, Any]:
+    """Run fn repeat times; report min/median wall and CPU seconds and the last result."""
+    walls, cpus = [], []
+    result = None
+    for _ in range(repeat):
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        result = fn()
+        walls.append(time.perf_counter() - wall_start)
+        cpus.append(time.process_time() - cpu_start)
+    return {
+        'min_seconds': min(walls),
+        'median_seconds': statistics.median(walls),
+        'cpu_seconds': statistics.median(cpus),
+        'result': result
+    }
+
+def extract_sequential(extractor: PDFExtractor, pdf_files: List[Path]) -> SectionStore:
+    store = SectionStore()
+    for pdf_file in pdf_files:
+        extractor.extract_into(pdf_file, store)
+    return store
+
+def environment() -> Dict[str, Any]:
+    """Machine and code version the numbers belong to."""
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'commit': commit
+    }
+
+def bench_corpus(corpus: Dict[str, Any], embedder: EmbeddingGenerator,
+                 workers: int, repeat: int) -> Dict[str, Any]:
+    """Time extraction, parsing, embedding, ranking and the end-to-end run on one corpus."""
+    pdf_files = corpus['pdf_files']
+    persona_parser = PersonaParser()
+    job_parser = JobParser()
+    ranker = DocumentRanker(embedder)
+    
+    extraction = measure(lambda: extract_sequential(PDFExtractor(), pdf_files), repeat)
+    sections = extraction.pop('result')
+    pages = corpus['documents'] * corpus['pages_per_document']
+    
+    persona = measure(lambda: persona_parser.parse(corpus['persona_file']), repeat)
+    job = measure(lambda: job_parser.parse(corpus['job_file']), repeat)
+    persona_data, job_data = persona.pop('result'), job.pop('result')
+    
+    embedding = measure(lambda: embedder.generate_section_embeddings(sections), repeat)
+    embedding.pop('result')
+    
+    # rank_sections embeds too; its profiler isolates the scoring step
+    ranking_profiles = []
+    
+    def rank():
+        profiler = Profiler()
+        with profiler.activate():
+            ranked = ranker.rank_sections(sections, persona_data, job_data)
+        ranking_profiles.append(profiler.summary()['ranking_computation']['wall_time'])
+        return ranked
+    ranking = measure(rank, repeat)
+    ranking.pop('result')
+    ranking['scoring_min_seconds'] = min(ranking_profiles)
+    
+    pipeline = DocumentPipeline(
+        ParallelExtractor(PDFExtractor(), workers=workers),
+        persona_parser, job_parser, embedder, ranker
+    )
+    stage_profiles = []
+    
+    def run():
+        profiler = Profiler()
+        with profiler.activate():
+            ranked = pipeline.run(corpus['persona_file'], corpus['job_file'], pdf_files)
+        stage_profiles.append({
+            name: stage['wall_time'] for name, stage in profiler.summary().items()
+            if 'peak_rss_mb' in stage
+        })
+        return ranked
+    end_to_end = measure(run, repeat)
+    end_to_end.pop('result')
+    end_to_end['stages'] = {
+        name: min(profile.get(name, 0.0) for profile in stage_profiles) for name in stage_profiles[0]
+    }
+    end_to_end['workers'] = workers
+    
+    extraction['pages_per_second'] = pages / extraction['min_seconds']
+    embedding['sections_per_second'] = len(sections) / embedding['min_seconds']
+    return {
+        'documents': corpus['documents'],
+        'pages': pages,
+        'sections': len(sections),
+        'sections_with_title': sum(1 for i in range(len(sections)) if sections.title(i)),
+        'extraction': extraction,
+        'persona_parsing': persona,
+        'jtbd_processing': job,
+        'embedding': embedding,
+        'ranking': ranking,
+        'end_to_end': end_to_end,
+        'seconds_per_document': end_to_end['min_seconds'] / corpus['documents']
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--documents', type=int, nargs='+', default=[1, 5, 10],
+                        help="Corpus sizes to run; several sizes show how runtime scales")
+    parser.add_argument('--pages', type=int, default=10, help="Pages per document")
+    parser.add_argument('--sections-per-page', type=int, default=3)
+    parser.add_argument('--heading-density', type=float, default=0.8)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--encoder', choices=['stub', 'model'], default='stub')
+    parser.add_argument('--model', default='all-MiniLM-L6-v2')
+    parser.add_argument('--workers', type=int, default=1, help="Extraction workers for the end-to-end run")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--corpus-dir', type=Path, default=None,
+                        help="Keep generated corpora here instead of a temporary directory")
+    parser.add_argument('--output', default=None, help="Write the JSON report here instead of stdout")
+    args = parser.parse_args(argv)
+    
+    model = HashingEncoder() if args.encoder == 'stub' else None
+    load_start = time.perf_counter()
+    embedder = EmbeddingGenerator(args.model, model=model)
+    load_seconds = time.perf_counter() - load_start
+    
+    report = {
+        'environment': environment(),
+        'config': {
+            'pages_per_document': args.pages,
+            'sections_per_page': args.sections_per_page,
+            'heading_density': args.heading_density,
+            'seed': args.seed,
+            'encoder': args.encoder,
+            'model': args.model if args.encoder == 'model' else None,
+            'repeat': args.repeat
+        },
+        'model_load_seconds': load_seconds,
+        'results': []
+    }
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        root = args.corpus_dir or Path(tmp)
+        for documents in args.documents:
+            corpus = generate_corpus(
+                root / f"corpus_{documents}", documents, args.pages,
+                args.sections_per_page, args.heading_density, args.seed
+            )
+            result = bench_corpus(corpus, embedder, args.workers, args.repeat)
+            print(f"{documents} documents: {result['end_to_end']['min_seconds']:.2f}s end to end",
+                  file=sys.stderr)
+            report['results'].append(result)
+    
+    output = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+if __name__ == "__main__":
+    main()
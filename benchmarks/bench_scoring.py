@@ -0,0 +1,87 @@
+"""Measure sharded scoring throughput against in-process scoring.
+
+Usage: python -m benchmarks.bench_scoring [--rows N] [--dim D] [--workers 1 2 4 8] [--output report.json]
+
+A random section matrix is written once to a memmap (as pipelines produce
+with out_path) and scored against one persona/job pair with top_k selection,
+first in-process with EmbeddingGenerator.compute_section_scores and then with
+ShardedScorer at each worker count. Selections are checked to match.
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, Any
+import numpy as np
+from app.embedder import EmbeddingGenerator
+from app.sharded_scoring import ShardedScorer, select_top
+from benchmarks.stub_encoder import HashingEncoder
+
+def best_of(fn, repeat: int):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--dim', type=int, default=384)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--top-k', type=int, default=10)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default=None, help="Write the JSON report here instead of stdout")
+    args = parser.parse_args(argv)
+    
+    rng = np.random.default_rng(args.seed)
+    persona, job = rng.standard_normal((2, args.dim)).astype(np.float32)
+    embedder = EmbeddingGenerator(model=HashingEncoder(args.dim))
+    report: Dict[str, Any] = {
+        'config': {key: value for key, value in vars(args).items() if key != 'output'},
+        'cpu_count': os.cpu_count(),
+        'sharded': {}
+    }
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        matrix = np.memmap(Path(tmp) / "sections.f32", dtype=np.float32, mode='w+', shape=(args.rows, args.dim))
+        for start in range(0, args.rows, 65536):
+            end = min(start + 65536, args.rows)
+            matrix[start:end] = rng.standard_normal((end - start, args.dim), dtype=np.float32)
+        matrix.flush()
+        
+        def in_process():
+            scores = embedder.compute_section_scores(matrix, persona, job)
+            return select_top(scores['combined'], args.top_k)
+        
+        seconds, expected = best_of(in_process, args.repeat)
+        report['in_process'] = {'seconds': seconds, 'rows_per_second': args.rows / seconds}
+        
+        for workers in args.workers:
+            # The pool outlives each call, so best_of measures scoring rather than worker startup
+            with ShardedScorer(workers, min_rows=0) as scorer:
+                seconds, (selected, _) = best_of(
+                    lambda: scorer.select(matrix, persona, job, top_k=args.top_k), args.repeat
+                )
+            report['sharded'][str(workers)] = {
+                'seconds': seconds,
+                'rows_per_second': args.rows / seconds,
+                'speedup': report['in_process']['seconds'] / seconds,
+                'matches_in_process': bool(np.array_equal(selected, expected))
+            }
+        del matrix
+    
+    output = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""Measure page segmentation throughput on large synthetic pages.
+
+Usage: python -m benchmarks.bench_segmentation [--lines N] [--pages N] [--output report.json]
+
+Compares the current PDFExtractor segmentation and heading check with the
+previous implementation (uncompiled per-line patterns, whitespace collapsed
+before splitting) on the same text, then times text-pattern and
+font-metadata heading detection end to end on a synthetic PDF.
+"""
+import argparse
+import json
+import random
+import re
+import tempfile
+import time
+from pathlib import Path
+from typing import List, Optional, Tuple
+from app.extractor import PDFExtractor
+from benchmarks.synthetic_pdf import WORDS, generate_corpus
+
+def legacy_is_heading(line: str) -> bool:
+    """The heading check PDFExtractor used before the single-pass rewrite."""
+    if len(line) > 100:
+        return False
+    heading_patterns = [
+        r'^[A-Z][A-Z\s]{2,}$',
+        r'^\d+\.\s*[A-Z]',
+        r'^[A-Z][a-z]*\s*:',
+        r'^Chapter\s+\d+',
+        r'^Section\s+\d+',
+    ]
+    for pattern in heading_patterns:
+        if re.match(pattern, line):
+            return True
+    return len(line) < 50 and line.isupper() and len(line.split()) > 1
+
+def legacy_segment_page(text: str, page_number: int) -> List[Tuple[Optional[str], str]]:
+    """The segmentation PDFExtractor used before the single-pass rewrite.
+    
+    Whitespace is collapsed before the line split, so a page is one "line".
+    """
+    cleaned_text = re.sub(r'\s+', ' ', text)
+    cleaned_text = re.sub(r'[^\w\s\.,;:!?\-()[\]{}"]', ' ', cleaned_text)
+    cleaned_text = re.sub(r'\n\s*\n', '\n', cleaned_text).strip()
+    
+    sections = []
+    current_section = []
+    current_title = None
+    for line in cleaned_text.split('\n'):
+        line = line.strip()
+        if not line:
+            continue
+        if legacy_is_heading(line):
+            if current_section:
+                section_text = '\n'.join(current_section).strip()
+                if len(section_text) > 50:
+                    sections.append((current_title, section_text))
+            current_title = line
+            current_section = []
+        else:
+            current_section.append(line)
+    if current_section:
+        section_text = '\n'.join(current_section).strip()
+        if len(section_text) > 50:
+            sections.append((current_title, section_text))
+    if not sections and len(cleaned_text) > 50:
+        sections.append((f"Page {page_number}", cleaned_text))
+    return sections
+
+def make_page(rng: random.Random, lines: int, heading_every: int) -> str:
+    """Page text in extract_text() form: one line per row, headings every few rows."""
+    rows = []
+    for i in range(lines):
+        if i % heading_every == 0:
+            rows.append(f"{i // heading_every + 1}. {rng.choice(WORDS).title()} {rng.choice(WORDS).title()}")
+        else:
+            rows.append(" ".join(rng.choice(WORDS) for _ in range(14)) + ".")
+    return "\n".join(rows)
+
+def time_segmenter(segment, pages: List[str], repeat: int) -> dict:
+    best = float('inf')
+    sections = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        sections = sum(len(segment(page, number)) for number, page in enumerate(pages, 1))
+        best = min(best, time.perf_counter() - start)
+    chars = sum(len(page) for page in pages)
+    lines = sum(page.count('\n') + 1 for page in pages)
+    return {
+        'seconds': best,
+        'sections': sections,
+        'mb_per_second': chars / best / 1e6,
+        'lines_per_second': lines / best
+    }
+
+def time_classifier(is_heading, lines: List[str], repeat: int) -> dict:
+    best = float('inf')
+    headings = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        headings = sum(1 for line in lines if is_heading(line))
+        best = min(best, time.perf_counter() - start)
+    return {'seconds': best, 'headings': headings, 'lines_per_second': len(lines) / best}
+
+def time_pdf(pdf_file: Path, use_font_metadata: bool) -> dict:
+    extractor = PDFExtractor(use_font_metadata=use_font_metadata)
+    start = time.perf_counter()
+    sections = extractor.extract_sections(pdf_file)
+    elapsed = time.perf_counter() - start
+    return {
+        'seconds': elapsed,
+        'sections': len(sections),
+        'titled_sections': sum(1 for s in sections if s['section_title'] and not s['section_title'].startswith('Page ')),
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pages', type=int, default=50)
+    parser.add_argument('--lines', type=int, default=2000, help="Lines per synthetic page")
+    parser.add_argument('--heading-every', type=int, default=10)
+    parser.add_argument('--pdf-pages', type=int, default=20, help="Pages in the synthetic PDF")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default=None, help="Write the JSON report here instead of stdout")
+    args = parser.parse_args(argv)
+    
+    rng = random.Random(args.seed)
+    pages = [make_page(rng, args.lines, args.heading_every) for _ in range(args.pages)]
+    extractor = PDFExtractor()
+    
+    report = {
+        'config': {key: value for key, value in vars(args).items() if key != 'output'},
+        'expected_sections': args.pages * -(-args.lines // args.heading_every),
+        'text': {
+            'legacy': time_segmenter(legacy_segment_page, pages, args.repeat),
+            'current': time_segmenter(extractor._segment_page, pages, args.repeat)
+        }
+    }
+    report['text']['speedup'] = report['text']['legacy']['seconds'] / report['text']['current']['seconds']
+    
+    # Per-line heading checks, the cost the old code would pay once lines survive cleaning
+    lines = [line for page in pages for line in page.split('\n')]
+    report['heading_classifier'] = {
+        'legacy': time_classifier(legacy_is_heading, lines, args.repeat),
+        'current': time_classifier(extractor._is_heading, lines, args.repeat)
+    }
+    report['heading_classifier']['speedup'] = (
+        report['heading_classifier']['legacy']['seconds'] / report['heading_classifier']['current']['seconds']
+    )
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        corpus = generate_corpus(Path(tmp), documents=1, pages=args.pdf_pages, seed=args.seed)
+        pdf_file = corpus['pdf_files'][0]
+        report['pdf'] = {
+            'pages': args.pdf_pages,
+            'text_patterns': time_pdf(pdf_file, use_font_metadata=False),
+            'font_metadata': time_pdf(pdf_file, use_font_metadata=True)
+        }
+    
+    output = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Compare exact and IVF vector search on synthetic section embeddings.
+
+Usage: python -m benchmarks.bench_vector_index [--sections N] [--output report.json]
+"""
+import argparse
+import json
+import time
+import numpy as np
+from app.vector_index import FlatIndex, IVFIndex
+
+def make_embeddings(n: int, dim: int, clusters: int, seed: int) -> np.ndarray:
+    """Clustered unit vectors, roughly shaped like sentence embeddings of a topical corpus."""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim))
+    labels = rng.integers(0, clusters, size=n)
+    vectors = centers[labels] + 0.6 * rng.normal(size=(n, dim))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+def time_search(index, queries: np.ndarray, k: int):
+    """Run every query and return (ids, mean latency in ms)."""
+    start = time.perf_counter()
+    ids, _ = index.search(queries, k)
+    return ids, (time.perf_counter() - start) * 1000 / len(queries)
+
+def recall(found: np.ndarray, truth: np.ndarray) -> float:
+    """Fraction of exact top-k ids returned by the approximate search."""
+    hits = sum(len(set(f[f >= 0]) & set(t)) for f, t in zip(found, truth))
+    return hits / truth.size
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sections', type=int, default=50000)
+    parser.add_argument('--dim', type=int, default=384)
+    parser.add_argument('--clusters', type=int, default=200)
+    parser.add_argument('--queries', type=int, default=50)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--nprobe', type=int, nargs='+', default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default=None, help="Write the JSON report here instead of stdout")
+    args = parser.parse_args(argv)
+    
+    embeddings = make_embeddings(args.sections, args.dim, args.clusters, args.seed)
+    queries = make_embeddings(args.queries, args.dim, args.clusters, args.seed + 1)
+    
+    report = {'sections': args.sections, 'dim': args.dim, 'k': args.k, 'results': []}
+    
+    start = time.perf_counter()
+    flat = FlatIndex().build(embeddings)
+    flat_build = time.perf_counter() - start
+    truth, flat_latency = time_search(flat, queries, args.k)
+    report['results'].append({
+        'index': 'flat', 'build_seconds': flat_build, 'query_ms': flat_latency, 'recall': 1.0
+    })
+    
+    start = time.perf_counter()
+    ivf = IVFIndex(seed=args.seed).build(embeddings)
+    ivf_build = time.perf_counter() - start
+    for nprobe in args.nprobe:
+        ivf.nprobe = nprobe
+        found, latency = time_search(ivf, queries, args.k)
+        report['results'].append({
+            'index': 'ivf', 'n_lists': ivf.n_lists, 'nprobe': nprobe,
+            'build_seconds': ivf_build, 'query_ms': latency, 'recall': recall(found, truth)
+        })
+    
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text)
+    else:
+        print(text)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+"""Deterministic stand-in for a SentenceTransformer, for benchmarking without model weights."""
+import hashlib
+import re
+from typing import List, Union
+import numpy as np
+
+class HashingEncoder:
+    """Feature-hashed bag of words with the SentenceTransformer.encode interface.
+    
+    Similarity between outputs tracks word overlap, so ranking still does
+    meaningful work, but the encode cost is not representative of a real
+    model; benchmark encoder throughput with the real model.
+    """
+    
+    def __init__(self, dimension: int = 384):
+        self.dimension = dimension
+        self._token_pattern = re.compile(r'\w+')
+        self._buckets = {}
+    
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dimension
+    
+    def encode(self, sentences: Union[str, List[str]], batch_size: int = 32, **kwargs) -> np.ndarray:
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        embeddings = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        
+        for row, text in enumerate(texts):
+            for token in self._token_pattern.findall(text.lower()):
+                bucket = self._buckets.get(token)
+                if bucket is None:
+                    digest = hashlib.md5(token.encode('utf-8')).digest()
+                    bucket = self._buckets[token] = (
+                        int.from_bytes(digest[:4], 'little') % self.dimension,
+                        1.0 if digest[4] & 1 else -1.0
+                    )
+                embeddings[row, bucket[0]] += bucket[1]
+        
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        embeddings /= np.where(norms == 0, 1.0, norms)
+        return embeddings[0] if single else embeddings
@@ -0,0 +1,165 @@
+"""Deterministic synthetic PDF corpora for benchmarks.
+
+Pages are written directly as PDF 1.4 text objects (no extra dependencies),
+so the same arguments always produce byte-identical files.
+
+Usage: python -m benchmarks.synthetic_pdf OUTPUT_DIR [--documents N] [--pages N] ...
+"""
+import argparse
+import json
+import random
+from pathlib import Path
+from typing import List, Dict, Any, Tuple
+
+WORDS = (
+    "data analysis machine learning model training evaluation pipeline feature engineering "
+    "statistics regression classification clustering deployment monitoring latency throughput "
+    "scalability architecture database query index storage network security compliance report "
+    "customer revenue market strategy forecast budget process workflow quality testing review "
+    "research method experiment result discussion benchmark dataset baseline accuracy precision"
+).split()
+
+# Heading styles the extractor recognises: numbered, ALL CAPS, "Title:" and chapter/section
+HEADING_STYLES = ('numbered', 'caps', 'colon', 'chapter')
+
+PAGE_WIDTH = 612
+PAGE_HEIGHT = 792
+LINE_HEIGHT = 14
+TOP_MARGIN = 60
+LINES_PER_PAGE = (PAGE_HEIGHT - 2 * TOP_MARGIN) // LINE_HEIGHT
+
+def _escape(text: str) -> str:
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+def write_pdf(path: Path, pages: List[List[Tuple[str, bool]]]) -> None:
+    """Write pages of (line, is_heading) pairs; headings use a larger bold font."""
+    objects = []
+    
+    def add(body: bytes) -> int:
+        objects.append(body)
+        return len(objects)
+    
+    regular = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    bold = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold >>")
+    # Each page takes a content and a page object; the page tree follows them
+    pages_id = len(objects) + 2 * len(pages) + 1
+    
+    kids = []
+    for lines in pages:
+        ops = [f"BT {LINE_HEIGHT} TL 50 {PAGE_HEIGHT - TOP_MARGIN} Td"]
+        for line, is_heading in lines:
+            font = "/F2 13 Tf" if is_heading else "/F1 10 Tf"
+            ops.append(f"{font} ({_escape(line)}) Tj T*")
+        ops.append("ET")
+        data = "\n".join(ops).encode('latin-1')
+        content = add(b"<< /Length %d >>\nstream\n" % len(data) + data + b"\nendstream")
+        kids.append(add(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %d %d] "
+            b"/Resources << /Font << /F1 %d 0 R /F2 %d 0 R >> >> /Contents %d 0 R >>"
+            % (pages_id, PAGE_WIDTH, PAGE_HEIGHT, regular, bold, content)
+        ))
+    
+    add(b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(b"%d 0 R" % k for k in kids), len(kids)))
+    catalog = add(b"<< /Type /Catalog /Pages %d 0 R >>" % pages_id)
+    
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, catalog, xref)
+    
+    with open(path, 'wb') as f:
+        f.write(bytes(out))
+
+def _heading(rng: random.Random, style: str, number: int) -> str:
+    topic = " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 3)))
+    if style == 'numbered':
+        return f"{number}. {topic.title()}"
+    if style == 'caps':
+        return topic.upper()
+    if style == 'colon':
+        return f"{topic.split()[0].title()}: {topic}"
+    return f"Chapter {number} {topic.title()}"
+
+def _paragraph(rng: random.Random, words_per_line: int = 12) -> List[str]:
+    return [
+        " ".join(rng.choice(WORDS) for _ in range(words_per_line)) + "."
+        for _ in range(rng.randint(3, 6))
+    ]
+
+def generate_document(seed: int, pages: int, sections_per_page: int,
+                      heading_density: float) -> List[List[Tuple[str, bool]]]:
+    """Lay out one document; heading_density is the share of sections that get a heading."""
+    rng = random.Random(seed)
+    layout = []
+    number = 1
+    for _ in range(pages):
+        lines = []
+        for _ in range(sections_per_page):
+            if rng.random() < heading_density:
+                lines.append((_heading(rng, rng.choice(HEADING_STYLES), number), True))
+                number += 1
+            lines.extend((line, False) for line in _paragraph(rng))
+        layout.append(lines[:LINES_PER_PAGE])
+    return layout
+
+def generate_corpus(output_dir: Path, documents: int = 10, pages: int = 10,
+                    sections_per_page: int = 3, heading_density: float = 0.8,
+                    seed: int = 0) -> Dict[str, Any]:
+    """Write an input directory (documents/, persona.json, job_to_be_done.txt) and describe it."""
+    output_dir = Path(output_dir)
+    documents_dir = output_dir / "documents"
+    documents_dir.mkdir(parents=True, exist_ok=True)
+    
+    pdf_files = []
+    for i in range(documents):
+        pdf_file = documents_dir / f"doc{i:04d}.pdf"
+        write_pdf(pdf_file, generate_document(seed * 100003 + i, pages, sections_per_page, heading_density))
+        pdf_files.append(pdf_file)
+    
+    persona = {
+        "role": "Senior Data Scientist",
+        "experience_level": "Senior",
+        "attributes": {"technical_background": "Machine Learning, Statistics, Python"},
+        "needs": ["Implementation examples", "Performance benchmarks"],
+        "interests": ["Model deployment", "Data pipeline optimization"],
+        "keywords": ["machine learning", "pipeline", "benchmark"]
+    }
+    with open(output_dir / "persona.json", 'w', encoding='utf-8') as f:
+        json.dump(persona, f, indent=2)
+    with open(output_dir / "job_to_be_done.txt", 'w', encoding='utf-8') as f:
+        f.write("Find the best practices for deploying and monitoring machine learning models "
+                "and evaluate pipeline throughput, latency and scalability.\n")
+    
+    return {
+        'documents': documents,
+        'pages_per_document': pages,
+        'sections_per_page': sections_per_page,
+        'heading_density': heading_density,
+        'seed': seed,
+        'pdf_files': pdf_files,
+        'persona_file': output_dir / "persona.json",
+        'job_file': output_dir / "job_to_be_done.txt"
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('output_dir', type=Path)
+    parser.add_argument('--documents', type=int, default=10)
+    parser.add_argument('--pages', type=int, default=10)
+    parser.add_argument('--sections-per-page', type=int, default=3)
+    parser.add_argument('--heading-density', type=float, default=0.8)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+    
+    corpus = generate_corpus(args.output_dir, args.documents, args.pages,
+                             args.sections_per_page, args.heading_density, args.seed)
+    print(f"Wrote {len(corpus['pdf_files'])} PDFs to {args.output_dir / 'documents'}")
+
+if __name__ == "__main__":
+    main()
@@ -1,103 +1,481 @@
-import os
-import json
 import time
 import logging
+import argparse
+import sys
 from pathlib import Path
-from app.extractor import PDFExtractor
+from typing import Optional, TYPE_CHECKING
+from app.embedder import EmbeddingGenerator
+from app.encoders import ENCODER_BACKENDS, encoder_id
+from app.output_writer import write_results, OUTPUT_FORMATS
+from app.pdf_backends import PDF_BACKENDS
 from app.persona_parser import PersonaParser
 from app.job_parser import JobParser
-from app.embedder import EmbeddingGenerator
-from app.ranker import DocumentRanker
-from app.utils import setup_logging, validate_inputs
+from app.profiler import Profiler
+from app.utils import setup_logging, validate_inputs, find_persona_file, load_batch_manifest
 
-def main():
-    """Main entry point for the persona-driven document intelligence system."""
+# Extraction, ranking and serving modules (pdfplumber, the pipeline) are imported
+# where they are used, so --check and input errors report without loading them
+if TYPE_CHECKING:
+    from app.pipeline import DocumentPipeline
+    from app.work_queue import WorkQueue
+
+def parse_args(argv=None) -> argparse.Namespace:
+    """Parse command line options."""
+    parser = argparse.ArgumentParser(description="Persona-Driven Document Intelligence System")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Extraction worker processes (default: CPU count, 1 disables the pool)")
+    parser.add_argument('--timeout', type=float, default=300.0,
+                        help="Per-document extraction timeout in seconds")
+    parser.add_argument('--pages-per-task', type=int, default=50,
+                        help="Split PDFs larger than this into page-range tasks")
+    parser.add_argument('--model', default='all-MiniLM-L6-v2',
+                        help="Sentence transformer model name or path")
+    parser.add_argument('--encoder-backend', choices=ENCODER_BACKENDS, default='torch',
+                        help="Inference backend: PyTorch SentenceTransformer or an exported ONNX Runtime model")
+    parser.add_argument('--onnx-model-dir', type=Path, default=None,
+                        help="Directory written by export_onnx (model.onnx, tokenizer.json, encoder_config.json)")
+    parser.add_argument('--quantized', action='store_true',
+                        help="Use the int8 dynamic-quantized ONNX model")
+    parser.add_argument('--threads', type=int, default=None,
+                        help="Intra-op threads for model inference (default: the backend's own choice)")
+    parser.add_argument('--cache-dir', type=Path, default=Path(".cache"),
+                        help="Directory for persistent caches")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="Disable persistent caches")
+    parser.add_argument('--embed-batch-size', type=int, default=64,
+                        help="Sections encoded per model batch")
+    parser.add_argument('--embedding-dtype', choices=EmbeddingGenerator.EMBEDDING_DTYPES, default='float32',
+                        help="Storage type for section embeddings (int8 stores quantized unit vectors)")
+    parser.add_argument('--chunking', action='store_true',
+                        help="Split sections longer than the model's sequence limit into token windows "
+                             "and pool them, instead of letting the model truncate")
+    parser.add_argument('--chunk-overlap', type=int, default=32,
+                        help="Tokens shared by consecutive windows of a chunked section")
+    parser.add_argument('--extraction-cache-key', choices=['stat', 'hash'], default='stat',
+                        help="Detect changed PDFs by size+mtime or by content hash")
+    parser.add_argument('--per-page-cache', action='store_true',
+                        help="Store extraction cache entries per page")
+    parser.add_argument('--font-headings', action='store_true',
+                        help="Detect headings from font size and weight instead of text patterns alone")
+    parser.add_argument('--pdf-backend', choices=PDF_BACKENDS + ('auto',), default='pdfplumber',
+                        help="Text extraction library; auto reads very long documents with the lighter "
+                             "text-only pdfminer path")
+    parser.add_argument('--max-pages', type=int, default=None,
+                        help="Only extract the first N pages of each PDF")
+    parser.add_argument('--max-rss-mb', type=float, default=None,
+                        help="Fail a document (instead of growing further) when extraction pushes "
+                             "process memory past this many MB")
+    parser.add_argument('--embedding-cache-size', type=int, default=100000,
+                        help="Maximum number of cached section embeddings")
+    parser.add_argument('--top-k', type=int, default=None,
+                        help="Only output the K most relevant sections")
+    parser.add_argument('--min-score', type=float, default=None,
+                        help="Drop sections with a relevance score below this threshold")
+    parser.add_argument('--output-format', choices=OUTPUT_FORMATS, default='json',
+                        help="Write result.json as an indented list or result.jsonl as JSON lines")
+    parser.add_argument('--index', choices=['none', 'flat', 'ivf'], default='none',
+                        help="Vector index used to preselect candidates when --top-k is set")
+    parser.add_argument('--nprobe', type=int, default=8,
+                        help="IVF lists searched per query (higher = better recall, slower)")
+    parser.add_argument('--index-lists', type=int, default=None,
+                        help="IVF list count (default: sqrt of section count)")
+    parser.add_argument('--lexical-candidates', type=int, default=None, metavar='N',
+                        help="Only embed and score the N best BM25 keyword matches per query "
+                             "(falls back to all sections when too few match)")
+    parser.add_argument('--dedup', choices=['off', 'fanout', 'collapse'], default='off',
+                        help="Encode one section per duplicate group and share its score (fanout), "
+                             "or output each group once with its other locations (collapse)")
+    parser.add_argument('--dedup-distance', type=int, default=4,
+                        help="SimHash bits two sections may differ by and still count as duplicates "
+                             "(0 keeps exact duplicates only)")
+    parser.add_argument('--scoring-workers', type=int, default=1,
+                        help="Processes that score shards of a shared section matrix (1 scores in-process)")
+    parser.add_argument('--shard-min-rows', type=int, default=100000,
+                        help="Only shard scoring when at least this many sections are scored")
+    parser.add_argument('--pipelined', action='store_true',
+                        help="Encode sections while PDFs are still being extracted")
+    parser.add_argument('--queue-size', type=int, default=32,
+                        help="Extracted page chunks allowed to wait for encoding in pipelined mode")
+    parser.add_argument('--input-dir', type=Path, default=Path("input"),
+                        help="Directory with persona/job files and a documents/ folder of PDFs")
+    parser.add_argument('--output-dir', type=Path, default=Path("output"),
+                        help="Directory the results are written to")
+    parser.add_argument('--queue-dir', type=Path, default=None,
+                        help="Shared work queue directory (e.g. on NFS) for --role worker/coordinator")
+    parser.add_argument('--role', choices=['worker', 'coordinator'], default=None,
+                        help="worker: claim PDFs from the queue and write per-document shards; "
+                             "coordinator: wait for all shards, merge them and rank")
+    parser.add_argument('--worker-id', default=None,
+                        help="Name recorded in queue claims (default: hostname-pid)")
+    parser.add_argument('--lease', type=float, default=60.0,
+                        help="Seconds without a heartbeat before a worker's claims are taken over")
+    parser.add_argument('--queue-timeout', type=float, default=None,
+                        help="Seconds the coordinator waits for shards before giving up (default: no limit)")
+    parser.add_argument('--batch', type=Path, default=None, metavar='MANIFEST',
+                        help="Rank the documents against every persona/job pair in a JSON manifest")
+    parser.add_argument('--serve', action='store_true',
+                        help="Run as an HTTP service that keeps the model loaded")
+    parser.add_argument('--host', default='127.0.0.1', help="Service bind address")
+    parser.add_argument('--port', type=int, default=8080, help="Service port")
+    parser.add_argument('--watch', action='store_true',
+                        help="Keep running and re-rank whenever PDFs in input/documents are added, changed or removed")
+    parser.add_argument('--poll-interval', type=float, default=1.0,
+                        help="Seconds between directory scans in watch mode")
+    parser.add_argument('--debounce', type=float, default=2.0,
+                        help="Seconds the documents directory must stay unchanged before an update in watch mode")
+    parser.add_argument('--check', action='store_true',
+                        help="Validate inputs (queries, manifest, PDFs) without loading the model, then exit")
+    parser.add_argument('--profile-output', type=Path, default=None, metavar='PATH',
+                        help="Write per-stage, per-document and per-page timings as a Chrome trace")
+    return parser.parse_args(argv)
+
+def encoder_options(args: argparse.Namespace) -> dict:
+    """Backend-specific arguments for create_encoder."""
+    options = {'threads': args.threads}
+    if args.encoder_backend == 'onnx':
+        if args.onnx_model_dir is None:
+            raise ValueError("--encoder-backend onnx requires --onnx-model-dir")
+        options.update(model_dir=args.onnx_model_dir, quantized=args.quantized)
+    return options
+
+def extraction_variant(args: argparse.Namespace) -> Optional[str]:
+    """Name the extractor settings that change its output, for the extraction cache."""
+    parts = []
+    if args.font_headings:
+        parts.append('font-headings')
+    if args.pdf_backend != 'pdfplumber':
+        parts.append(args.pdf_backend)
+    if args.max_pages:
+        parts.append(f"first-{args.max_pages}-pages")
+    return '+'.join(parts) or None
+
+def build_pipeline(args: argparse.Namespace) -> 'DocumentPipeline':
+    """Construct the extraction, parsing, embedding and ranking components.
     
-    # Setup logging
-    setup_logging()
+    The model loads in a background thread; the pipeline waits for it at the
+    first encode, after queries are parsed and PDFs extracted.
+    """
+    from app.dedup import SectionDeduplicator
+    from app.embedding_cache import EmbeddingCache
+    from app.extraction_cache import ExtractionCache
+    from app.extractor import PDFExtractor
+    from app.parallel import ParallelExtractor
+    from app.pipeline import DocumentPipeline
+    from app.query_cache import QueryCache
+    from app.ranker import DocumentRanker
+    from app.sharded_scoring import ShardedScorer
+    
+    extraction_cache = None
+    embedding_cache = None
+    if not args.no_cache:
+        extraction_cache = ExtractionCache(
+            args.cache_dir / "extraction",
+            key_mode=args.extraction_cache_key,
+            per_page=args.per_page_cache,
+            variant=extraction_variant(args)
+        )
+        embedding_cache = EmbeddingCache(
+            args.cache_dir / "embeddings",
+            encoder_id(args.model, args.encoder_backend, args.quantized),
+            max_entries=args.embedding_cache_size
+        )
+    
+    pdf_extractor = ParallelExtractor(
+        PDFExtractor(
+            cache=extraction_cache,
+            use_font_metadata=args.font_headings,
+            backend=args.pdf_backend,
+            max_pages=args.max_pages,
+            max_rss_mb=args.max_rss_mb
+        ),
+        workers=args.workers,
+        timeout=args.timeout,
+        pages_per_task=args.pages_per_task
+    )
+    embedding_generator = EmbeddingGenerator(
+        args.model,
+        cache=embedding_cache,
+        batch_size=args.embed_batch_size,
+        dtype=args.embedding_dtype,
+        backend=args.encoder_backend,
+        backend_options=encoder_options(args),
+        background=True,
+        chunking=args.chunking,
+        chunk_overlap=args.chunk_overlap
+    )
+    
+    index_params = {}
+    if args.index == 'ivf':
+        index_params = {'nprobe': args.nprobe, 'n_lists': args.index_lists}
+    ranker = DocumentRanker(
+        embedding_generator,
+        index_type=None if args.index == 'none' else args.index,
+        index_params=index_params,
+        index_dir=None if args.no_cache else args.cache_dir / "index",
+        lexical_candidates=args.lexical_candidates,
+        collapse_duplicates=args.dedup == 'collapse',
+        scorer=ShardedScorer(args.scoring_workers, min_rows=args.shard_min_rows) if args.scoring_workers > 1 else None
+    )
+    
+    return DocumentPipeline(
+        pdf_extractor,
+        PersonaParser(),
+        JobParser(),
+        embedding_generator,
+        ranker,
+        pipelined=args.pipelined,
+        queue_size=args.queue_size,
+        # Without a cache directory, queries are still reused in memory by long-lived processes
+        deduplicator=None if args.dedup == 'off' else SectionDeduplicator(max_distance=args.dedup_distance),
+        query_cache=QueryCache(
+            None if args.no_cache else args.cache_dir / "queries",
+            encoder_id(args.model, args.encoder_backend, args.quantized)
+        )
+    )
+
+def check_inputs(args: argparse.Namespace, input_dir: Path, documents_dir: Path) -> bool:
+    """Parse the queries and open every PDF, without building the pipeline or loading the model."""
+    import pdfplumber
     logger = logging.getLogger(__name__)
     
-    start_time = time.time()
-    logger.info("Starting Persona-Driven Document Intelligence System")
+    if not validate_inputs(input_dir, documents_dir, require_queries=args.batch is None):
+        return False
     
     try:
-        # Define paths
-        input_dir = Path("input")
-        output_dir = Path("output")
-        documents_dir = input_dir / "documents"
-        
-        # Validate inputs
-        if not validate_inputs(input_dir, documents_dir):
-            logger.error("Input validation failed")
+        encoder_options(args)
+        if args.batch:
+            query_files = [(query['persona_file'], query['job_file']) for query in load_batch_manifest(args.batch)]
+        else:
+            query_files = [(find_persona_file(input_dir), input_dir / "job_to_be_done.txt")]
+        persona_parser, job_parser = PersonaParser(), JobParser()
+        for persona_file, job_file in query_files:
+            persona_parser.parse(persona_file)
+            job_parser.parse(job_file)
+    except Exception as e:
+        logger.error(f"Query check failed: {e}")
+        return False
+    
+    failed = 0
+    pdf_files = sorted(documents_dir.glob("*.pdf"))
+    for pdf_file in pdf_files:
+        try:
+            with pdfplumber.open(pdf_file) as pdf:
+                if not pdf.pages:
+                    raise ValueError("no pages")
+        except Exception as e:
+            logger.error(f"Cannot open {pdf_file.name}: {e}")
+            failed += 1
+    
+    if failed:
+        logger.error(f"{failed} of {len(pdf_files)} PDFs failed to open")
+        return False
+    logger.info(f"Check passed: {len(query_files)} queries, {len(pdf_files)} PDFs")
+    return True
+
+def run_batch(pipeline: 'DocumentPipeline', args: argparse.Namespace,
+              documents_dir: Path, output_dir: Path, profiler: Profiler, start_time: float) -> None:
+    """Rank the document set against every manifest entry, one output file per pair."""
+    logger = logging.getLogger(__name__)
+    
+    queries = load_batch_manifest(args.batch)
+    logger.info(f"Loaded {len(queries)} persona/job pairs from {args.batch}")
+    
+    pdf_files = sorted(documents_dir.glob("*.pdf"))
+    results = pipeline.run_batch(
+        [(query['persona_file'], query['job_file']) for query in queries],
+        pdf_files, top_k=args.top_k, min_score=args.min_score
+    )
+    
+    # Stages are shared by all pairs, so every output carries the batch totals
+    output_dir.mkdir(exist_ok=True)
+    for query, ranked_sections in zip(queries, results):
+        output_file = output_dir / f"{query['name']}.{args.output_format}"
+        metadata = pipeline.build_metadata(profiler, ranked_sections, time.time() - start_time)
+        result_count = write_results(ranked_sections, output_file, args.output_format, metadata=metadata)
+        logger.info(f"Saved {result_count} ranked sections to {output_file}")
+
+def run_pipeline(args: argparse.Namespace, input_dir: Path, documents_dir: Path, output_dir: Path,
+                 profiler: Profiler, start_time: float) -> None:
+    """Run one profiled pipeline invocation (single or batch)."""
+    logger = logging.getLogger(__name__)
+    
+    # Initialize components
+    logger.info("Initializing system components...")
+    with profiler.stage('pipeline_setup'):
+        pipeline = build_pipeline(args)
+    
+    with pipeline:
+        if args.batch:
+            run_batch(pipeline, args, documents_dir, output_dir, profiler, start_time)
+            logger.info(f"Processing completed in {time.time() - start_time:.2f} seconds")
             return
         
-        # Initialize components
-        logger.info("Initializing system components...")
-        pdf_extractor = PDFExtractor()
-        persona_parser = PersonaParser()
-        job_parser = JobParser()
-        embedding_generator = EmbeddingGenerator()
-        ranker = DocumentRanker(embedding_generator)
-        
-        # Parse persona
-        logger.info("Parsing persona...")
-        persona_file = None
-        for ext in ['.json', '.txt']:
-            persona_path = input_dir / f"persona{ext}"
-            if persona_path.exists():
-                persona_file = persona_path
-                break
-        
+        # Parse persona and job to be done
+        persona_file = find_persona_file(input_dir)
         if not persona_file:
             logger.error("No persona file found")
             return
-            
-        persona_data = persona_parser.parse(persona_file)
         
-        # Parse job to be done
-        logger.info("Parsing job to be done...")
         job_file = input_dir / "job_to_be_done.txt"
-        job_data = job_parser.parse(job_file)
+        queries, query_keys = pipeline.load_queries([(persona_file, job_file)])
+        persona_data, job_data = queries[0]
         
         # Extract content from PDFs
-        logger.info("Extracting content from PDFs...")
-        all_sections = []
-        pdf_files = list(documents_dir.glob("*.pdf"))
-        
-        for pdf_file in pdf_files:
-            logger.info(f"Processing {pdf_file.name}...")
-            try:
-                sections = pdf_extractor.extract_sections(pdf_file)
-                all_sections.extend(sections)
-            except Exception as e:
-                logger.warning(f"Failed to process {pdf_file.name}: {e}")
-                continue
+        pdf_files = sorted(documents_dir.glob("*.pdf"))
+        signatures = pipeline.document_signatures(pdf_files)
+        section_embeddings = None
+        if args.role == 'coordinator':
+            all_sections, section_embeddings = build_queue(args).collect(pdf_files, timeout=args.queue_timeout)
+        elif args.pipelined:
+            all_sections, section_embeddings = pipeline.extract_and_embed(pdf_files)
+        else:
+            all_sections = pipeline.extract(pdf_files)
         
         if not all_sections:
             logger.error("No sections extracted from PDFs")
             return
         
-        logger.info(f"Extracted {len(all_sections)} sections from {len(pdf_files)} PDFs")
-        
         # Rank sections
-        logger.info("Ranking sections based on persona and job relevance...")
-        ranked_sections = ranker.rank_sections(all_sections, persona_data, job_data)
+        ranked_sections = pipeline.rank(
+            all_sections, persona_data, job_data, top_k=args.top_k, min_score=args.min_score,
+            section_embeddings=section_embeddings, lexical_index=pipeline.build_lexical_index(all_sections),
+            query_embeddings=pipeline.embed_queries(queries, query_keys), duplicates=pipeline.deduplicate(all_sections),
+            corpus_key=pipeline.corpus_key(signatures, all_sections)
+        )
         
         # Generate output
         logger.info("Generating output...")
         output_dir.mkdir(exist_ok=True)
-        output_file = output_dir / "result.json"
-        
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(ranked_sections, f, indent=2, ensure_ascii=False)
-        
-        end_time = time.time()
-        processing_time = end_time - start_time
+        output_file = output_dir / f"result.{args.output_format}"
+        processing_time = time.time() - start_time
+        metadata = pipeline.build_metadata(profiler, ranked_sections, processing_time)
+        result_count = write_results(ranked_sections, output_file, args.output_format, metadata=metadata)
         
         logger.info(f"Processing completed in {processing_time:.2f} seconds")
-        logger.info(f"Generated {len(ranked_sections)} ranked sections")
+        logger.info(f"Generated {result_count} ranked sections")
         logger.info(f"Results saved to {output_file}")
+
+def build_queue(args: argparse.Namespace) -> 'WorkQueue':
+    """The shared work queue, tied to the encoder so shards from another model are rejected."""
+    from app.work_queue import WorkQueue
+    return WorkQueue(
+        args.queue_dir,
+        encoder=f"{encoder_id(args.model, args.encoder_backend, args.quantized)}/{args.embedding_dtype}"
+                + ("/chunked" if args.chunking else ""),
+        worker_id=args.worker_id,
+        lease=args.lease
+    )
+
+def run_worker(args: argparse.Namespace, documents_dir: Path) -> None:
+    """Extract and embed queued documents until every one has a shard."""
+    from app.work_queue import QueueWorker
+    pipeline = build_pipeline(args)
+    worker = QueueWorker(build_queue(args), pipeline.pdf_extractor.extractor, pipeline.embedder)
+    worker.run(sorted(documents_dir.glob("*.pdf")))
+
+def run_watch(args: argparse.Namespace, input_dir: Path, documents_dir: Path, output_dir: Path) -> None:
+    """Rewrite the result file each time the documents directory settles after a change."""
+    from app.watcher import DocumentWatcher
+    logger = logging.getLogger(__name__)
+    
+    pipeline = build_pipeline(args)
+    persona_file = find_persona_file(input_dir)
+    queries, query_keys = pipeline.load_queries([(persona_file, input_dir / "job_to_be_done.txt")])
+    persona_data, job_data = queries[0]
+    query_embeddings = pipeline.embed_queries(queries, query_keys)
+    output_dir.mkdir(exist_ok=True)
+    output_file = output_dir / f"result.{args.output_format}"
+    
+    def on_update(sections, section_embeddings):
+        start_time = time.time()
+        profiler = Profiler()
+        with profiler.activate():
+            ranked_sections = []
+            if sections:
+                ranked_sections = pipeline.rank(
+                    sections, persona_data, job_data, top_k=args.top_k, min_score=args.min_score,
+                    section_embeddings=section_embeddings, lexical_index=pipeline.build_lexical_index(sections),
+                    query_embeddings=query_embeddings, duplicates=pipeline.deduplicate(sections),
+                    corpus_key=pipeline.corpus_key(watcher.indexed_signatures(), sections)
+                )
         
+        metadata = pipeline.build_metadata(profiler, ranked_sections, time.time() - start_time)
+        # Extraction stats only cover the changed files; report the whole corpus
+        metadata['total_documents_processed'] = len(sections.document_names)
+        metadata['total_sections_analyzed'] = len(sections)
+        result_count = write_results(ranked_sections, output_file, args.output_format, metadata=metadata)
+        logger.info(f"Saved {result_count} ranked sections to {output_file} "
+                    f"in {time.time() - start_time:.2f} seconds")
+    
+    watcher = DocumentWatcher(pipeline, documents_dir, poll_interval=args.poll_interval, debounce=args.debounce)
+    logger.info(f"Watching {documents_dir} for PDF changes (Ctrl-C to stop)")
+    try:
+        watcher.run(on_update)
+    except KeyboardInterrupt:
+        logger.info("Watch mode stopped")
+    finally:
+        pipeline.close()
+
+def main(argv=None):
+    """Main entry point for the persona-driven document intelligence system."""
+    
+    args = parse_args(argv)
+    
+    # Setup logging
+    setup_logging()
+    logger = logging.getLogger(__name__)
+    
+    start_time = time.time()
+    logger.info("Starting Persona-Driven Document Intelligence System")
+    profiler = Profiler()
+    
+    try:
+        # Define paths
+        input_dir = args.input_dir
+        output_dir = args.output_dir
+        documents_dir = input_dir / "documents"
+        
+        if args.role and args.queue_dir is None:
+            raise ValueError(f"--role {args.role} requires --queue-dir")
+        if args.role == 'coordinator' and (args.batch or args.pipelined):
+            raise ValueError("The coordinator ranks merged shards; --batch and --pipelined do not apply")
+        if args.batch and (args.index != 'none' or args.scoring_workers > 1 or args.pipelined):
+            # Batch ranking scores every query in one dense product over all sections
+            raise ValueError("--index, --scoring-workers and --pipelined do not apply to --batch")
+        
+        if args.check:
+            if not check_inputs(args, input_dir, documents_dir):
+                sys.exit(1)
+            return
+        
+        if args.serve:
+            from app.server import serve
+            with build_pipeline(args) as pipeline:
+                serve(pipeline, host=args.host, port=args.port)
+            return
+        
+        # Validate inputs
+        if not validate_inputs(input_dir, documents_dir,
+                               require_queries=args.batch is None and args.role != 'worker',
+                               require_documents=not args.watch):
+            logger.error("Input validation failed")
+            return
+        
+        if args.role == 'worker':
+            run_worker(args, documents_dir)
+            return
+        
+        if args.watch:
+            run_watch(args, input_dir, documents_dir, output_dir)
+            return
+        
+        with profiler.activate():
+            run_pipeline(args, input_dir, documents_dir, output_dir, profiler, start_time)
+        
+        if args.profile_output:
+            profiler.write_chrome_trace(args.profile_output)
+            logger.info(f"Profile written to {args.profile_output}")
+    
     except Exception as e:
         logger.error(f"System error: {e}", exc_info=True)
         raise